@@ -0,0 +1,122 @@
+"""
+Storage of the evaluation logs.
+
+The logs are written as JSON Lines, one test case per line, appended as soon as the
+test case ends. A crash can only lose the last, partially written line.
+The logs of the first evaluations, saved as a single JSON array (e.g. logs/*/final.json),
+can still be read.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, Set
+
+# The log files are fsynced every EVALUATION_LOG_FSYNC_EVERY records or
+# EVALUATION_LOG_FSYNC_INTERVAL seconds, whichever comes first
+EVALUATION_LOG_FSYNC_EVERY = int(os.environ.get("EVALUATION_LOG_FSYNC_EVERY", 10))
+EVALUATION_LOG_FSYNC_INTERVAL = float(
+    os.environ.get("EVALUATION_LOG_FSYNC_INTERVAL", 5))
+
+
+class JsonlWriter:
+    """
+    Append-only JSON Lines file, shared by the loggers of the test cases executed in parallel.
+
+    Every record is flushed to the OS as soon as it's written, so it survives a crash of
+    the evaluator. The fsync, which protects from a crash of the machine, is batched.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fsync_every: int = EVALUATION_LOG_FSYNC_EVERY,
+        fsync_interval: float = EVALUATION_LOG_FSYNC_INTERVAL
+    ) -> None:
+        if path.endswith(".json"):
+            raise ValueError(
+                f"{path} is a JSON log, only JSON Lines logs (.jsonl) can be appended to")
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.unsynced_records = 0
+        self.last_fsync = time.monotonic()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, "a+", encoding="utf-8")
+        # The last line is incomplete if the previous run crashed while writing it:
+        # terminate it, so that it doesn't corrupt the first new record
+        if self.file.tell() > 0:
+            self.file.seek(self.file.tell() - 1)
+            if self.file.read(1) != "\n":
+                self.file.write("\n")
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            self.unsynced_records += 1
+            if (self.unsynced_records >= self.fsync_every
+                    or time.monotonic() - self.last_fsync >= self.fsync_interval):
+                self.__fsync()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.flush()
+            self.__fsync()
+            self.file.close()
+
+    def __fsync(self) -> None:
+        os.fsync(self.file.fileno())
+        self.unsynced_records = 0
+        self.last_fsync = time.monotonic()
+
+
+def iter_logs(logfile: str) -> Iterator[dict]:
+    """
+    Yields the logs of logfile one at a time, without loading the whole file.
+    Lines that cannot be parsed, i.e. truncated by a crash, are skipped.
+    """
+    if not os.path.exists(logfile):
+        return
+
+    if logfile.endswith(".json"):
+        with open(logfile, encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+
+    with open(logfile, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(
+                    f"Skipping the malformed line {line_number} of {logfile}")
+
+
+def iter_latest_logs(logfile: str) -> Iterator[dict]:
+    """
+    Yields the last log of every test case, without their messages.
+    A test case executed again on resume has more than one log.
+    """
+    latest: Dict[int, dict] = {}
+    for log in iter_logs(logfile):
+        latest[log["id"]] = {
+            key: value for key, value in log.items() if key != "messages"
+        }
+    yield from latest.values()
+
+
+def get_completed_ids(logfile: str) -> Set[int]:
+    """Ids of the test cases with a result in logfile, to resume an interrupted run."""
+    return {
+        log["id"] for log in iter_latest_logs(logfile)
+        if log.get("result")
+    }
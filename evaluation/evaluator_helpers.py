@@ -1,12 +1,17 @@
 import json
 import os
+import threading
+import time
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from langchain.agents.output_parsers.openai_tools import OpenAIToolAgentAction
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 
+from evaluation_logs import JsonlWriter
+
 from wizard_ai.conversational_engine.form_agent.form_agent_executor import \
     FormAgentExecutor
 
@@ -58,12 +63,40 @@ def normalize_json(json_data):
     return json_data
 
 
+class RateLimiter(BaseCallbackHandler):
+    """
+    Callback handler that limits the LLM calls of all the threads using it
+    to requests_per_minute, spacing them evenly.
+    The calls wait in on_llm_start/on_chat_model_start, before the request is sent.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60 / requests_per_minute
+        self.next_request_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            request_time = max(now, self.next_request_time)
+            self.next_request_time = request_time + self.interval
+        if request_time > now:
+            time.sleep(request_time - now)
+
+    def on_llm_start(self, *args, **kwargs):
+        self.wait()
+
+    def on_chat_model_start(self, *args, **kwargs):
+        self.wait()
+
+
 class UserLLMForEvaluation:
-    def __init__(self):
+    def __init__(self, callbacks: Optional[List[BaseCallbackHandler]] = None):
         self.llm = ChatOpenAI(
             model=LLM_MODEL,
             temperature=0,
-            verbose=True
+            verbose=True,
+            callbacks=callbacks
         )
         self.history = []
 
@@ -92,12 +125,16 @@ class ExecutorForEvaluation:
         self,
         tools: list,
         target_tool_call: Dict[str, Any] = None,
+        callbacks: Optional[List[BaseCallbackHandler]] = None
     ):
         self.target_tool_call = target_tool_call
+        self.callbacks = callbacks
         self.max_iterations = 10
         self.current_iteration = 1
         self.tools = tools
-        self.graph = FormAgentExecutor(tools=self.tools)
+        # The evaluation measures the tool calls of the LLM, so the form fields
+        # are never filled by the local extractors
+        self.graph = FormAgentExecutor(tools=self.tools, field_extractors=())
         self.state = {
             "input": "",
             "chat_history": [],
@@ -114,8 +151,13 @@ class ExecutorForEvaluation:
             "active_form_tool": self.state["active_form_tool"]
         }
 
-        for output in self.graph.app.stream(inputs, config={"recursion_limit": 25}):
+        config = {"recursion_limit": 25, "callbacks": self.callbacks}
+        for output in self.graph.app.stream(inputs, config=config):
             for key, value in output.items():
+                # The active form tool is a copy owned by the conversation,
+                # so it is tracked from the graph output
+                if isinstance(value, dict) and "active_form_tool" in value:
+                    self.state["active_form_tool"] = value["active_form_tool"]
                 self.check_successful_execution(key, value)
         output = self.graph.parse_output(output)
 
@@ -175,10 +217,9 @@ class FormAgentExecutorForEvaluation(ExecutorForEvaluation):
         if not agent_outcome.tool_input == {'confirm': True}:
             return
 
-        target_tool = next(filter(
-            lambda tool: tool.name == target_tool_name,
-            self.graph._tools
-        ))
+        target_tool = self.state["active_form_tool"]
+        if not target_tool or target_tool.name != target_tool_name:
+            return
 
         normalized_expected_output = normalize_json(
             self.target_tool_call['payload'])
@@ -228,14 +269,23 @@ class BasicAgentExecutorForEvaluation(ExecutorForEvaluation):
 
 
 class EvaluationLogger:
+    """
+    Logs the conversation of a test case and appends it to the logfile (JSON Lines).
+    Loggers of test cases executed in parallel can share the same logfile.
+    """
+
+    # One writer per logfile, shared by the loggers
+    writers: Dict[str, JsonlWriter] = {}
+    writers_lock = threading.Lock()
 
     def __init__(
         self,
-        type: str
+        type: str,
+        logfile: Optional[str] = None
     ) -> None:
         self.type = type
-        self.logfile = os.path.join(
-            os.path.dirname(__file__), "logs", self.type, f"{datetime.now().strftime('%Y-%m-%d-%H%M%S')}.json")
+        self.logfile = logfile or os.path.join(
+            os.path.dirname(__file__), "logs", self.type, f"{datetime.now().strftime('%Y-%m-%d-%H%M%S')}.jsonl")
 
         self.log = {
             "id": None,
@@ -271,10 +321,19 @@ class EvaluationLogger:
         self.log["result"] = result
 
     def dump(self):
-        if not os.path.exists(self.logfile):
-            open(self.logfile, "w").write("[]")
-
-        logs = json.loads(open(self.logfile).read())
-        logs.append(self.log)
-        with open(self.logfile, "w") as f:
-            f.write(json.dumps(logs, indent=4))
+        # A resumed test case appends a new log, which supersedes the previous one
+        self.get_writer(self.logfile).write(self.log)
+
+    @classmethod
+    def get_writer(cls, logfile: str) -> JsonlWriter:
+        with cls.writers_lock:
+            if logfile not in cls.writers:
+                cls.writers[logfile] = JsonlWriter(logfile)
+            return cls.writers[logfile]
+
+    @classmethod
+    def close_writers(cls):
+        with cls.writers_lock:
+            for writer in cls.writers.values():
+                writer.close()
+            cls.writers = {}
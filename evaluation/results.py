@@ -0,0 +1,81 @@
+"""
+Success rate of the evaluation runs, overall, by tool and by use case.
+
+The logs are streamed, only the result of each test case is kept in memory,
+so the tables can be computed on long runs without loading the conversations.
+Incomplete test cases (without a result) are not counted.
+
+    python results.py logs/basic/final.json logs/form/2024-03-20-224801.jsonl
+"""
+import argparse
+import json
+import os
+from collections import Counter, defaultdict
+from typing import Dict
+
+from evaluation_logs import iter_latest_logs
+
+TEST_CASES_PATH = os.path.join(
+    os.path.dirname(__file__), "prompts/prompts.json")
+
+SUCCESS = "Success"
+FAILURE = "Failure"
+
+
+def normalize_result(result: str) -> str:
+    # An aborted conversation is a failure, like reaching the max iterations
+    return SUCCESS if result == "Successful execution" else FAILURE
+
+
+def aggregate_results(logfile: str, test_cases_path: str = TEST_CASES_PATH) -> Dict[str, Dict[str, Counter]]:
+    """
+    Counts the successes and failures of the test cases of logfile.
+    Returns {"overall": {"all": counter}, "tool": {tool: counter}, "use_case": {use_case: counter}}.
+    """
+    with open(test_cases_path) as f:
+        tools = {test_case["id"]: test_case["tool"] for test_case in json.load(f)}
+
+    results = {
+        "overall": defaultdict(Counter),
+        "tool": defaultdict(Counter),
+        "use_case": defaultdict(Counter)
+    }
+    for log in iter_latest_logs(logfile):
+        if not log.get("result"):
+            continue
+        result = normalize_result(log["result"])
+        results["overall"]["all"][result] += 1
+        results["tool"][tools.get(log["id"], "unknown")][result] += 1
+        results["use_case"][log["use_case"]][result] += 1
+    return results
+
+
+def format_table(title: str, counters: Dict[str, Counter]) -> str:
+    rows = [f"{title:<32} {SUCCESS:>8} {FAILURE:>8} {'Success %':>10}"]
+    for key in sorted(counters):
+        counter = counters[key]
+        total = counter[SUCCESS] + counter[FAILURE]
+        rows.append(
+            f"{key:<32} {counter[SUCCESS]:>8} {counter[FAILURE]:>8} "
+            f"{counter[SUCCESS] / total * 100:>9.1f}%")
+    return "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("logfiles", nargs="+",
+                        help="Evaluation logs, JSON Lines or JSON")
+    parser.add_argument("--test-cases", default=TEST_CASES_PATH,
+                        help="Test cases of the logs, to group them by tool")
+    args = parser.parse_args()
+
+    for logfile in args.logfiles:
+        results = aggregate_results(logfile, args.test_cases)
+        print(f"== {logfile}")
+        for group, counters in results.items():
+            print(format_table(group, counters))
+            print()
+
+
+if __name__ == "__main__":
+    main()
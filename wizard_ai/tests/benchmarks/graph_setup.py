@@ -0,0 +1,90 @@
+"""
+Micro-benchmark of the per-message setup of the agent, i.e. everything that
+run_agent does before streaming the graph.
+
+- before: the tools are instantiated and the graph is compiled for every message
+- after: the graph compiled once per process is reused, and the per-chat data
+  is passed through the config
+
+Run from the tests folder:
+
+    python -m benchmarks.graph_setup --number 100
+"""
+import argparse
+import os
+import timeit
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-...")
+
+from wizard_ai.constants import MessageQueues
+from wizard_ai.conversational_engine.form_agent import FormAgentExecutor
+from wizard_ai.conversational_engine.message_consumer import \
+    get_form_agent_executor
+from wizard_ai.conversational_engine.tool_callback_handler import \
+    ToolCallbackHandler
+from wizard_ai.conversational_engine.tools import *
+
+CHAT_ID = "benchmark"
+
+
+def setup_before():
+    tools = [
+        GoogleSearch(),
+        GoogleCalendarCreator(chat_id=CHAT_ID),
+        GoogleCalendarRetriever(chat_id=CHAT_ID),
+        GmailRetriever(chat_id=CHAT_ID),
+        GmailSender(chat_id=CHAT_ID),
+        OnlinePurchase(),
+        PythonCodeInterpreter()
+    ]
+    tool_callback_handler = ToolCallbackHandler(
+        chat_id=CHAT_ID,
+        tools=tools,
+        queue=MessageQueues.WIZARD_AI_OUT.value
+    )
+    graph = FormAgentExecutor(
+        tools=tools,
+        on_tool_start=tool_callback_handler.on_tool_start,
+        on_tool_end=tool_callback_handler.on_tool_end
+    )
+    return graph, {"recursion_limit": 25}
+
+
+def setup_after():
+    graph = get_form_agent_executor()
+    tool_callback_handler = ToolCallbackHandler(
+        chat_id=CHAT_ID,
+        queue=MessageQueues.WIZARD_AI_OUT.value
+    )
+    config = {
+        "recursion_limit": 25,
+        "configurable": {
+            "chat_id": CHAT_ID,
+            "on_tool_start": tool_callback_handler.on_tool_start,
+            "on_tool_end": tool_callback_handler.on_tool_end
+        }
+    }
+    return graph, config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--number", type=int, default=100,
+                        help="Number of simulated messages")
+    args = parser.parse_args()
+
+    # Warm up imports and the process-wide graph
+    setup_before()
+    setup_after()
+
+    results = {
+        "before": timeit.timeit(setup_before, number=args.number),
+        "after": timeit.timeit(setup_after, number=args.number),
+    }
+    for name, total in results.items():
+        print(f"{name:>6}: {total / args.number * 1000:.3f} ms/message")
+    print(f"speedup: {results['before'] / results['after']:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
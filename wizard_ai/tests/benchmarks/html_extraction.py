@@ -0,0 +1,104 @@
+"""
+Benchmark of the extraction of the main text from HTML pages (HtmlProcessor.clear_html).
+
+- before: readability, then BeautifulSoup's html.parser to strip the tags
+- after: a single lxml parse, falling back to readability only when little text is found
+
+The corpus is a folder of saved pages (*.html, *.htm), e.g. saved from the browser
+or downloaded with curl. Without a folder, a synthetic corpus of articles and
+newsletters of growing size is generated.
+
+Run from the tests folder:
+
+    python -m benchmarks.html_extraction --corpus path/to/pages --number 5
+"""
+import argparse
+import pathlib
+import timeit
+
+from bs4 import BeautifulSoup
+from readability import Document
+
+from wizard_ai.helpers import HtmlProcessor
+
+
+def clear_html_before(html: str) -> str:
+    doc = Document(html)
+    main_content = doc.summary()
+    soup = BeautifulSoup(main_content, 'html.parser')
+    for script in soup(['script', 'style']):
+        script.decompose()
+    return soup.get_text(separator='\n', strip=True)
+
+
+def generate_page(paragraphs: int, newsletter: bool) -> str:
+    navigation = "".join(
+        f'<li><a href="/section/{idx}">Section {idx}</a></li>' for idx in range(30))
+    if newsletter:
+        # Emails are made of nested tables with inline styles
+        content = "".join(
+            f'<table style="width:100%"><tr><td style="padding:8px;font-family:Arial">'
+            f'<h2>Story {idx}</h2><p>{"Lorem ipsum dolor sit amet, consectetur. " * 8}</p>'
+            f'<a href="https://example.com/{idx}">Read more</a></td></tr></table>'
+            for idx in range(paragraphs)
+        )
+    else:
+        content = "<article><h1>Title</h1>" + "".join(
+            f'<p>{"Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 6}</p>'
+            for _ in range(paragraphs)
+        ) + "</article>"
+    return f"""
+        <html>
+        <head><title>Page</title><style>{"td {{ color: red; }} " * 200}</style></head>
+        <body>
+        <nav><ul>{navigation}</ul></nav>
+        <script>{"var x = 1; " * 500}</script>
+        {content}
+        <footer>{"Unsubscribe - Privacy - Terms " * 20}</footer>
+        </body>
+        </html>
+    """
+
+
+def load_corpus(folder: str) -> dict:
+    if folder:
+        return {
+            path.name: path.read_text(errors="ignore")
+            for path in sorted(pathlib.Path(folder).iterdir())
+            if path.suffix in (".html", ".htm")
+        }
+    return {
+        f"{kind}-{paragraphs}": generate_page(paragraphs, newsletter=kind == "newsletter")
+        for kind in ("article", "newsletter")
+        for paragraphs in (10, 100, 1000)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", default=None,
+                        help="Folder of saved HTML pages")
+    parser.add_argument("--number", type=int, default=5,
+                        help="Number of extractions per page")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    totals = {"before": 0, "after": 0}
+    print(f"{'page':>30} {'size':>10} {'before':>10} {'after':>10}")
+    for name, html in corpus.items():
+        before = timeit.timeit(
+            lambda: clear_html_before(html), number=args.number) / args.number
+        after = timeit.timeit(
+            lambda: HtmlProcessor.clear_html(html), number=args.number) / args.number
+        totals["before"] += before
+        totals["after"] += after
+        print(f"{name[:30]:>30} {len(html):>10} "
+              f"{before * 1000:>8.1f}ms {after * 1000:>8.1f}ms")
+
+    print(f"total: before {totals['before'] * 1000:.1f} ms, "
+          f"after {totals['after'] * 1000:.1f} ms, "
+          f"speedup: {totals['before'] / totals['after']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
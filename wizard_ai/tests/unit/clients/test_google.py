@@ -5,7 +5,8 @@ from google.oauth2.credentials import Credentials
 
 from wizard_ai.clients.google import (CreateCalendarEventPayload,
                                       GetCalendarEventsPayload,
-                                      GetEmailsPayload, GoogleClient)
+                                      GetEmailsPayload, GoogleClient,
+                                      GoogleServiceCache)
 
 
 def test_create_calendar_event():
@@ -212,3 +213,87 @@ def test_get_emails():
     )
 
     assert emails == "\n1. Subject: Test Email\nSender: sender@example.com\nTime: 2022-01-01\nContent: This is a test email\n\n\n\n\n2. Subject: Test Email\nSender: sender@example.com\nTime: 2022-01-01\nContent: This is a test email\n\n\n\n"
+
+
+def create_credentials(refresh_token: str) -> Credentials:
+    return Credentials(
+        token="token",
+        refresh_token=refresh_token,
+        client_id="client_id",
+        client_secret="client_secret",
+        token_uri="https://oauth2.googleapis.com/token"
+    )
+
+
+def test_google_service_cache_reuses_services():
+    cache = GoogleServiceCache()
+
+    with patch('wizard_ai.clients.google.build', side_effect=lambda *args, **kwargs: MagicMock()) as build_mock:
+        # The credentials are loaded from Redis for every call, so they are different objects
+        service = cache.get('gmail', 'v1', create_credentials("user_1"))
+        assert cache.get('gmail', 'v1', create_credentials("user_1")) is service
+        assert cache.get('calendar', 'v3', create_credentials("user_1")) is not service
+        assert cache.get('gmail', 'v1', create_credentials("user_2")) is not service
+
+    assert build_mock.call_count == 3
+    assert build_mock.call_args.kwargs["static_discovery"] is True
+
+
+def test_google_service_cache_evicts_least_recently_used():
+    cache = GoogleServiceCache(max_size=2)
+
+    with patch('wizard_ai.clients.google.build', side_effect=lambda *args, **kwargs: MagicMock()) as build_mock:
+        service_1 = cache.get('gmail', 'v1', create_credentials("user_1"))
+        cache.get('gmail', 'v1', create_credentials("user_2"))
+        cache.get('gmail', 'v1', create_credentials("user_1"))
+        cache.get('gmail', 'v1', create_credentials("user_3"))
+
+        assert cache.get('gmail', 'v1', create_credentials("user_1")) is service_1
+        assert build_mock.call_count == 3
+        cache.get('gmail', 'v1', create_credentials("user_2"))
+        assert build_mock.call_count == 4
+
+
+def test_get_emails_metadata_only():
+    credentials = MagicMock(spec=Credentials)
+    client = GoogleClient(credentials)
+
+    payload = GetEmailsPayload(number_of_emails=3)
+
+    service_mock = MagicMock()
+    messages_mock = service_mock.users.return_value.messages.return_value
+    messages_mock.list.return_value.execute.return_value = {
+        'messages': [{'id': str(idx)} for idx in range(3)]
+    }
+
+    def get_message(userId, id, **kwargs):
+        request = MagicMock()
+        request.execute.return_value = {
+            'payload': {
+                'headers': [
+                    {'name': 'From', 'value': 'sender@example.com'},
+                    {'name': 'Subject', 'value': f'Email {id}'},
+                ]
+            },
+            'snippet': f'Content {id}'
+        }
+        return request
+    messages_mock.get.side_effect = get_message
+
+    with patch('wizard_ai.clients.google.build', return_value=service_mock), \
+            patch('wizard_ai.clients.google.GET_FULL_CONTENT', False):
+        emails = client.get_emails(payload)
+
+    assert messages_mock.get.call_count == 3
+    for idx in range(3):
+        messages_mock.get.assert_any_call(
+            userId='me',
+            id=str(idx),
+            format='metadata',
+            metadataHeaders=['From', 'Date', 'Subject']
+        )
+    # The emails are in the order of the list
+    assert [email['subject'] for email in emails] == [
+        'Email 0', 'Email 1', 'Email 2']
+    assert emails[0]['content'] == 'Content 0'
+    assert emails[0]['time'] is None
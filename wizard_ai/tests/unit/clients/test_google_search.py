@@ -1,7 +1,9 @@
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 import pytest
 
+from parsel import Selector
+
 from wizard_ai.clients.google_search import (GoogleSearchClient,
                                              GoogleSearchClientPayload)
 
@@ -48,6 +50,65 @@ def test_search_with_invalid_payload():
             client.search(payload)
 
 
+def test_search_crawls_results_list():
+    web_crawler = MagicMock()
+    web_crawler.crawl_threadsafe.return_value = {
+        "https://first.com": "first page",
+        "https://second.com": "second page"
+    }
+    client = GoogleSearchClient(web_crawler=web_crawler)
+    payload = GoogleSearchClientPayload(query="pizza", num_expanded_results=2)
+    selector = Selector("""
+        <div id="rso">
+            <div><a href="https://first.com"><h3>First</h3></a></div>
+            <div><a href="https://second.com"><h3>Second</h3></a></div>
+        </div>
+    """)
+
+    result = client.parse_search_results(selector, payload=payload)
+
+    assert "first pagesecond page" in result
+    crawl_kwargs = web_crawler.crawl_threadsafe.call_args.kwargs
+    assert crawl_kwargs["urls"] == ["https://first.com", "https://second.com"]
+    assert crawl_kwargs["max_results"] == 2
+    assert "authority" not in crawl_kwargs["headers"]
+
+
+def test_search_uses_cache():
+    web_crawler = MagicMock()
+    web_crawler.crawl_threadsafe.return_value = {
+        "https://first.com": "first page"}
+    client = GoogleSearchClient(web_crawler=web_crawler)
+    response = create_mock_response()
+    response.text = """
+        <div id="rso">
+            <div><a href="https://first.com"><h3>First</h3></a></div>
+            <div><a href="https://second.com"><h3>Second</h3></a></div>
+        </div>
+    """
+
+    with patch.object(client, "make_request", return_value=response) as mock_make_request:
+        first_result = client.search(GoogleSearchClientPayload(
+            query="Pizza  Margherita", num_expanded_results=1))
+        second_result = client.search(GoogleSearchClientPayload(
+            query="pizza margherita ", num_expanded_results=1))
+
+    assert first_result == second_result
+    # The query is normalized, so Google is searched once
+    mock_make_request.assert_called_once()
+    # The content of the first page is cached as well
+    web_crawler.crawl_threadsafe.assert_called_once()
+
+    with patch.object(client, "make_request", return_value=response):
+        client.search(GoogleSearchClientPayload(
+            query="pizza margherita", num_expanded_results=2))
+
+    # Only the page missing from the cache is downloaded
+    assert web_crawler.crawl_threadsafe.call_args.kwargs["urls"] == [
+        "https://second.com"]
+    assert web_crawler.crawl_threadsafe.call_args.kwargs["max_results"] == 1
+
+
 def create_mock_response():
     class MockResponse:
         def __init__(self):
@@ -0,0 +1,96 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from wizard_ai.clients.rabbitmq import RabbitMQConsumer
+
+
+class MockIncomingMessage:
+    def __init__(self, body: dict):
+        self.body = json.dumps(body).encode()
+
+    @asynccontextmanager
+    async def process(self):
+        yield self
+
+
+def run_messages(consumer: RabbitMQConsumer, bodies: list):
+    async def run():
+        # Deliveries are dispatched as separate tasks, as aio_pika does
+        await asyncio.gather(*[
+            consumer.on_message(MockIncomingMessage(body)) for body in bodies
+        ])
+    asyncio.run(run())
+
+
+def test_same_key_messages_are_processed_in_order():
+    events = []
+
+    async def callback(body):
+        events.append(("start", body["content"]))
+        await asyncio.sleep(0.01)
+        events.append(("end", body["content"]))
+
+    consumer = RabbitMQConsumer(
+        on_message_callback=callback,
+        queue_name="queue",
+        concurrency_key=lambda body: body["chat_id"]
+    )
+    run_messages(consumer, [
+        {"chat_id": "1", "content": "a"},
+        {"chat_id": "1", "content": "b"},
+        {"chat_id": "1", "content": "c"},
+    ])
+
+    assert events == [
+        ("start", "a"), ("end", "a"),
+        ("start", "b"), ("end", "b"),
+        ("start", "c"), ("end", "c"),
+    ]
+    assert consumer.locks == {}
+
+
+def test_different_keys_are_processed_concurrently():
+    running = 0
+    max_running = 0
+
+    async def callback(body):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    consumer = RabbitMQConsumer(
+        on_message_callback=callback,
+        queue_name="queue",
+        concurrency_key=lambda body: body["chat_id"],
+        max_concurrency=2
+    )
+    run_messages(consumer, [
+        {"chat_id": str(chat_id), "content": "a"} for chat_id in range(5)
+    ])
+
+    assert max_running == 2
+
+
+def test_no_concurrency_key_processes_one_message_at_a_time():
+    running = 0
+    max_running = 0
+
+    async def callback(body):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    consumer = RabbitMQConsumer(
+        on_message_callback=callback,
+        queue_name="queue"
+    )
+    run_messages(consumer, [
+        {"chat_id": str(chat_id), "content": "a"} for chat_id in range(3)
+    ])
+
+    assert max_running == 1
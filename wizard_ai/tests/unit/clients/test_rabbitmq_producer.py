@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from wizard_ai.clients.rabbitmq import RabbitMQProducer
+
+
+class MockChannel:
+    # aio_pika's pool inspects the close method, so a MagicMock can't be used here
+    def __init__(self):
+        self.declare_queue = AsyncMock()
+        self.default_exchange = MagicMock()
+        self.default_exchange.publish = AsyncMock()
+        self.is_closed = False
+
+    async def close(self):
+        self.is_closed = True
+
+
+def create_mock_connection():
+    channel = MockChannel()
+    connection = MagicMock()
+    connection.channel = AsyncMock(return_value=channel)
+    connection.close = AsyncMock()
+    return connection, channel
+
+
+def create_producer(**kwargs):
+    return RabbitMQProducer(
+        host="localhost",
+        port=5672,
+        user="user",
+        password="password",
+        **kwargs
+    )
+
+
+def published_bodies(channel):
+    return [
+        call.args[0].body.decode()
+        for call in channel.default_exchange.publish.call_args_list
+    ]
+
+
+def test_publish_reuses_connection_and_declares_queue_once():
+    connection, channel = create_mock_connection()
+    producer = create_producer()
+
+    async def run():
+        await producer.publish(queue="queue", message="first")
+        await producer.publish(queue="queue", message="second")
+        await producer.close()
+
+    with patch("aio_pika.connect_robust", AsyncMock(return_value=connection)) as connect_robust:
+        asyncio.run(run())
+
+    connect_robust.assert_called_once()
+    connection.channel.assert_called_once_with(publisher_confirms=True)
+    channel.declare_queue.assert_called_once_with("queue", durable=True)
+    assert published_bodies(channel) == ["first", "second"]
+
+
+def test_publish_batch():
+    connection, channel = create_mock_connection()
+    producer = create_producer(batch_size=10, batch_interval=0.01)
+
+    async def run():
+        await asyncio.gather(*[
+            producer.publish(queue="queue", message=str(idx)) for idx in range(3)
+        ])
+        await producer.close()
+
+    with patch("aio_pika.connect_robust", AsyncMock(return_value=connection)):
+        asyncio.run(run())
+
+    assert published_bodies(channel) == ["0", "1", "2"]
+
+
+def test_publish_threadsafe():
+    connection, channel = create_mock_connection()
+    producer = create_producer()
+
+    async def run():
+        await producer.connect()
+        thread = threading.Thread(
+            target=producer.publish_threadsafe,
+            kwargs={"queue": "queue", "message": "from thread"}
+        )
+        thread.start()
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+        await producer.close()
+
+    with patch("aio_pika.connect_robust", AsyncMock(return_value=connection)):
+        asyncio.run(run())
+
+    assert published_bodies(channel) == ["from thread"]
+
+
+def test_publish_threadsafe_without_waiting():
+    connection, channel = create_mock_connection()
+    producer = create_producer()
+
+    async def run():
+        await producer.connect()
+        future = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: producer.publish_threadsafe(
+                queue="queue", message="from thread", wait=False))
+        await asyncio.wrap_future(future)
+        await producer.close()
+
+    with patch("aio_pika.connect_robust", AsyncMock(return_value=connection)):
+        asyncio.run(run())
+
+    assert published_bodies(channel) == ["from thread"]
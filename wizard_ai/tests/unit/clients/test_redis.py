@@ -0,0 +1,17 @@
+from wizard_ai.clients.redis import get_async_redis_client, get_redis_client
+
+
+def test_get_redis_client_is_shared():
+    redis_client = get_redis_client()
+
+    assert get_redis_client() is redis_client
+    assert redis_client.connection_pool.max_connections == 100
+    assert redis_client.connection_pool.connection_kwargs["health_check_interval"] == 30
+
+
+def test_get_async_redis_client_is_shared():
+    redis_client = get_async_redis_client()
+
+    assert get_async_redis_client() is redis_client
+    assert redis_client.connection_pool.max_connections == 100
+    assert redis_client.connection_pool.connection_kwargs["socket_timeout"] == 5
@@ -0,0 +1,100 @@
+import json
+from unittest.mock import patch
+
+import redis
+
+from wizard_ai.clients.search_cache import TTLCache, normalize_query
+
+
+class MockRedis:
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    def pipeline(self):
+        return MockPipeline(self)
+
+    def get(self, name):
+        return self.values.get(name)
+
+    def ttl(self, name):
+        return self.ttls.get(name, -2)
+
+    def set(self, name, value, ex=None):
+        self.values[name] = value.encode()
+        self.ttls[name] = ex
+
+
+class MockPipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.queued = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.queued.append((name, args))
+        return queue
+
+    def execute(self):
+        return [getattr(self.redis_client, name)(*args) for name, args in self.queued]
+
+
+def test_ttl_cache_expiration():
+    cache = TTLCache(name="TEST", ttl=10, max_size=10)
+
+    with patch("wizard_ai.clients.search_cache.time.monotonic", return_value=100):
+        cache.set("key", {"value": 1})
+    with patch("wizard_ai.clients.search_cache.time.monotonic", return_value=109):
+        assert cache.get("key") == {"value": 1}
+    with patch("wizard_ai.clients.search_cache.time.monotonic", return_value=111):
+        assert cache.get("key") is None
+    assert "key" not in cache.entries
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(name="TEST", ttl=10, max_size=2)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+
+
+def test_ttl_cache_redis():
+    redis_client = MockRedis()
+    cache = TTLCache(name="TEST", ttl=60, max_size=10, redis_client=redis_client)
+    cache.set("key", ["value"])
+
+    [(redis_key, serialized)] = redis_client.values.items()
+    assert redis_key.startswith("TEST:")
+    assert json.loads(serialized) == ["value"]
+    assert redis_client.ttls[redis_key] == 60
+
+    # Another replica finds the value in Redis
+    other_cache = TTLCache(
+        name="TEST", ttl=60, max_size=10, redis_client=redis_client)
+    assert other_cache.get("key") == ["value"]
+    assert "key" in other_cache.entries
+
+
+def test_ttl_cache_redis_errors_are_misses():
+    redis_client = MockRedis()
+    cache = TTLCache(name="TEST", ttl=60, max_size=10, redis_client=redis_client)
+
+    with patch.object(redis_client, "set", side_effect=redis.ConnectionError):
+        cache.set("key", "value")
+    cache.clear()
+
+    assert cache.get("key") is None
+
+
+def test_normalize_query():
+    assert normalize_query("  EUR to  USD ") == "eur to usd"
@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+
+from wizard_ai.clients.web_crawler import WebCrawler
+
+PAGES = {
+    "https://slow.com": 5,
+    "https://fast.com": 0,
+    "https://medium.com": 0.1,
+    "https://error.com": 0,
+    "https://other-fast.com": 0,
+}
+
+
+def create_crawler(**kwargs) -> tuple[WebCrawler, list]:
+    requested = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        url = f"{request.url.scheme}://{request.url.host}"
+        requested.append(url)
+        await asyncio.sleep(PAGES[url])
+        if url == "https://error.com":
+            return httpx.Response(500)
+        return httpx.Response(200, text=f"content of {url}")
+
+    return WebCrawler(transport=httpx.MockTransport(handler), **kwargs), requested
+
+
+def test_crawl_keeps_first_results_in_order():
+    crawler, requested = create_crawler()
+
+    try:
+        texts = crawler.crawl_threadsafe(
+            urls=["https://slow.com", "https://error.com", "/relative",
+                  "https://medium.com", "https://fast.com"],
+            max_results=2,
+            extract=lambda html: html.upper()
+        )
+    finally:
+        crawler.close()
+
+    # The slow page is cancelled, the results keep the order of the urls
+    assert list(texts.items()) == [
+        ("https://medium.com", "CONTENT OF HTTPS://MEDIUM.COM"),
+        ("https://fast.com", "CONTENT OF HTTPS://FAST.COM")
+    ]
+    assert sorted(requested) == sorted(
+        ["https://slow.com", "https://error.com", "https://medium.com", "https://fast.com"])
+
+
+def test_crawl_timeout():
+    crawler, _ = create_crawler(timeout=0.5)
+
+    try:
+        texts = crawler.crawl_threadsafe(
+            urls=["https://slow.com", "https://fast.com", "https://other-fast.com"],
+            max_results=3,
+            extract=lambda html: html
+        )
+    finally:
+        crawler.close()
+
+    assert list(texts.values()) == ["content of https://fast.com",
+                                    "content of https://other-fast.com"]
+
+
+def test_crawl_skips_empty_extractions():
+    crawler, _ = create_crawler()
+
+    try:
+        texts = crawler.crawl_threadsafe(
+            urls=["https://fast.com", "https://medium.com"],
+            max_results=1,
+            extract=lambda html: "" if "fast" in html else html
+        )
+    finally:
+        crawler.close()
+
+    assert texts == {"https://medium.com": "content of https://medium.com"}
+
+
+def test_crawl_aborts_pages_too_big(monkeypatch):
+    monkeypatch.setattr("wizard_ai.clients.web_crawler.CRAWL_MAX_PAGE_SIZE", 100)
+    sent_chunks = []
+
+    async def big_page():
+        for _ in range(1000):
+            sent_chunks.append(1)
+            yield b"x" * 50
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "big.com":
+            return httpx.Response(200, content=big_page())
+        return httpx.Response(200, text="small page")
+
+    crawler = WebCrawler(transport=httpx.MockTransport(handler))
+    try:
+        texts = crawler.crawl_threadsafe(
+            urls=["https://big.com", "https://small.com"],
+            max_results=2,
+            extract=lambda html: html
+        )
+    finally:
+        crawler.close()
+
+    assert texts == {"https://small.com": "small page"}
+    # The download stopped as soon as the limit was exceeded
+    assert len(sent_chunks) < 10
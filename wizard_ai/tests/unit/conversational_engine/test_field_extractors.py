@@ -0,0 +1,172 @@
+from datetime import datetime
+from typing import Literal, Optional
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.agents import AgentFinish
+from langchain_core.messages import AIMessage, ToolMessage
+from pydantic import BaseModel, Field
+
+from wizard_ai.conversational_engine.form_agent import (
+    LOCAL_EXTRACTION_LOG, NOT_EXTRACTED, AgentState, BoolExtractor,
+    DateTimeExtractor, EmailExtractor, FormAgentExecutor, FormToolState,
+    IntExtractor, LiteralExtractor, assemble_prompt_inputs)
+from wizard_ai.conversational_engine.form_agent.model_factory import \
+    DEFAULT_PROMPT_TEMPLATE
+from wizard_ai.conversational_engine.tools.online_purchase import \
+    OnlinePurchase
+
+
+class _Payload(BaseModel):
+    quantity: int = Field(description="Quantity of items")
+    ebook: Optional[bool] = Field(description="If true, sends an ebook")
+    item: Literal["watch", "shoes"] = Field(description="Item to purchase")
+    email: Optional[str] = Field(description="Email to send the ebook to")
+    start: datetime = Field(description="Start date of the event")
+
+
+FIELDS = _Payload.model_fields
+# A Wednesday
+NOW = datetime(2024, 3, 20, 9, 30)
+
+
+@pytest.mark.parametrize("extractor, field_name, reply, expected", [
+    (IntExtractor(), "quantity", "5", 5),
+    (IntExtractor(), "quantity", " 3. ", 3),
+    (IntExtractor(), "quantity", "5 or 6", NOT_EXTRACTED),
+    (BoolExtractor(), "ebook", "Yes!", True),
+    (BoolExtractor(), "ebook", "no", False),
+    (BoolExtractor(), "ebook", "yes, but send it tomorrow", NOT_EXTRACTED),
+    (LiteralExtractor(), "item", "The shoes", "shoes"),
+    (LiteralExtractor(), "item", "Watch", "watch"),
+    (LiteralExtractor(), "item", "not the watch", NOT_EXTRACTED),
+    (EmailExtractor(), "email", "john.doe@example.com", "john.doe@example.com"),
+    (EmailExtractor(), "email", "john at example dot com", NOT_EXTRACTED),
+    (IntExtractor(), "item", "5", NOT_EXTRACTED),
+])
+def test_extractors(extractor, field_name, reply, expected):
+    assert extractor.extract(reply, field_name, FIELDS[field_name]) == expected
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ("tomorrow at 3pm", "2024-03-21T15:00:00"),
+    ("Today 18:30", "2024-03-20T18:30:00"),
+    ("friday at noon", "2024-03-22T12:00:00"),
+    ("next friday", NOT_EXTRACTED),
+    ("wednesday", "2024-03-27T00:00:00"),
+    ("2024-04-02 10:00", "2024-04-02T10:00:00"),
+    ("25 March 2024 at 9am", "2024-03-25T09:00:00"),
+    ("tomorrow at 3", NOT_EXTRACTED),
+    ("03/04/2024", NOT_EXTRACTED),
+    ("5", NOT_EXTRACTED),
+    ("whenever you want", NOT_EXTRACTED),
+    ("2024", NOT_EXTRACTED),
+    ("1530", NOT_EXTRACTED),
+    ("may", NOT_EXTRACTED),
+    ("March", NOT_EXTRACTED),
+    ("May 2024", NOT_EXTRACTED),
+])
+def test_datetime_extractor(reply, expected):
+    extractor = DateTimeExtractor(now=lambda: NOW)
+    assert extractor.extract(reply, "start", FIELDS["start"]) == expected
+
+
+def test_form_turn_without_llm():
+    form_tool = OnlinePurchase()
+    form_tool = form_tool.activate().state_update["active_form_tool"]
+    graph = FormAgentExecutor(tools=[OnlinePurchase()])
+    metrics = {}
+    config = {"configurable": {"metrics": metrics}}
+    state = AgentState(
+        input="shoes",
+        intermediate_steps=[],
+        active_form_tool=form_tool
+    )
+
+    response = graph.call_agent(state, config)
+    action = response["agent_outcome"][0]
+    assert action.tool == "OnlinePurchaseUpdate"
+    assert action.tool_input == {"item": "shoes"}
+    assert action.log == LOCAL_EXTRACTION_LOG
+
+    state.update(response)
+    response = graph.call_tool(state)
+    assert response["error"] is None
+    assert form_tool.form.item == "shoes"
+
+    state.update(response)
+    response = graph.call_agent(state, config)
+    assert isinstance(response["agent_outcome"], AgentFinish)
+    assert "quantity" in response["agent_outcome"].return_values["output"].lower()
+    assert metrics["local_agent_steps"] == 2
+
+
+def test_form_turn_falls_back_to_llm():
+    form_tool = OnlinePurchase()
+    form_tool = form_tool.activate().state_update["active_form_tool"]
+    graph = FormAgentExecutor(tools=[OnlinePurchase()])
+    state = AgentState(
+        input="I want 2 pairs of shoes",
+        intermediate_steps=[],
+        active_form_tool=form_tool
+    )
+    assert form_tool.state == FormToolState.ACTIVE
+    assert graph.get_local_agent_outcome(state) is None
+
+
+def test_form_turn_falls_back_to_llm_for_falsy_values():
+    form_tool = OnlinePurchase()
+    form_tool = form_tool.activate().state_update["active_form_tool"]
+    form_tool.update(item="shoes")
+    graph = FormAgentExecutor(tools=[OnlinePurchase()])
+    # A quantity of 0 would be considered missing, and asked again
+    state = AgentState(
+        input="0",
+        intermediate_steps=[],
+        active_form_tool=form_tool
+    )
+    assert graph.get_local_agent_outcome(state) is None
+
+
+class _PromptRecorderFormAgentExecutor(FormAgentExecutor):
+    """Records the inputs of the prompt instead of calling the LLM."""
+
+    def build_model(self, state):
+        def invoke(state, config):
+            self.prompt_inputs = assemble_prompt_inputs(
+                state, DEFAULT_PROMPT_TEMPLATE, [], config)
+            return AgentFinish(return_values={"output": "From the LLM"}, log="")
+        agent = MagicMock()
+        agent.invoke = MagicMock(side_effect=invoke)
+        return agent
+
+
+def test_form_turn_falls_back_to_llm_after_local_step():
+    form_tool = OnlinePurchase()
+    form_tool = form_tool.activate().state_update["active_form_tool"]
+    form_tool.update(item="shoes")
+    graph = _PromptRecorderFormAgentExecutor(tools=[OnlinePurchase()])
+    state = AgentState(
+        input="20",
+        intermediate_steps=[],
+        active_form_tool=form_tool
+    )
+
+    response = graph.call_agent(state)
+    assert response["agent_outcome"][0].tool_input == {"quantity": 20}
+    state.update(response)
+    # Over the maximum quantity: the LLM explains the error to the user
+    state.update(graph.call_tool(state))
+    assert state["error"]
+    state.update(graph.call_agent(state))
+    assert state["agent_outcome"].return_values["output"] == "From the LLM"
+
+    scratchpad = graph.prompt_inputs["agent_scratchpad"]
+    assert len(scratchpad) == 2
+    assert isinstance(scratchpad[0], AIMessage)
+    assert scratchpad[0].content == ""
+    tool_call = scratchpad[0].additional_kwargs["tool_calls"][0]
+    assert tool_call["function"]["name"] == "OnlinePurchaseUpdate"
+    assert isinstance(scratchpad[1], ToolMessage)
+    assert scratchpad[1].tool_call_id == tool_call["id"]
+    assert "Quantity must be between 1 and 10" in scratchpad[1].content
@@ -1,3 +1,4 @@
+import time
 from typing import Any
 from unittest.mock import MagicMock
 
@@ -34,6 +35,23 @@ class MockToolError(MockBaseTool):
         raise Exception("Mocked error")
 
 
+class MockToolEmptyError(MockBaseTool):
+    name = "MockToolEmptyError"
+    description = "Mock tool that raises an error without message"
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        raise ValueError()
+
+
+class MockSlowTool(MockBaseTool):
+    name = "MockSlowTool"
+    description = "Mock tool that takes some time"
+
+    def _run(self, seconds: float = 0.3, output: str = "Slow output") -> Any:
+        time.sleep(seconds)
+        return output
+
+
 class TestFormAgentExecutor:
 
     def test_get_tools_no_active_form_tool(self):
@@ -68,6 +86,32 @@ class TestFormAgentExecutor:
         tool = graph.get_tool_by_name("NonExistingTool", state)
         assert tool is None
 
+    def test_tool_sets_share_the_executors(self):
+        graph = FormAgentExecutor(tools=[MockBaseTool(), MockFormTool()])
+        assert graph.get_tools(AgentState()) is graph.get_tools(AgentState())
+        assert graph.get_tool_executor(
+            AgentState()) is graph.get_tool_executor(AgentState())
+
+        state = AgentState()
+        active_form_tool = MockFormTool()
+        active_form_tool.enter_active_state()
+        state["active_form_tool"] = active_form_tool
+        assert graph.get_tool_by_name(
+            "MockFormToolUpdate", state) is active_form_tool
+
+        active_form_tool.enter_filled_state()
+        assert graph.get_tool_by_name(
+            "MockFormToolFinalize", state) is active_form_tool
+        assert graph.get_tool_by_name("MockFormToolUpdate", state) is None
+
+        # A new copy of the form tool, as restored at every turn, reuses the executor
+        other_state = AgentState(active_form_tool=MockFormTool().copy())
+        other_state["active_form_tool"].enter_active_state()
+        assert graph.get_tool_executor(
+            other_state) is graph.get_tool_executor(state)
+        assert graph.get_tool_by_name(
+            "MockFormToolUpdate", other_state) is other_state["active_form_tool"]
+
     def test_should_continue_error(self):
         graph = FormAgentExecutor()
         state = AgentState()
@@ -165,6 +209,84 @@ class TestFormAgentExecutor:
         assert "error" in response
         assert response["error"] is not None
 
+    def test_call_tool_runs_non_form_tools_concurrently(self):
+        graph = FormAgentExecutor(
+            tools=[MockSlowTool(), MockFormTool()],
+        )
+        state = AgentState()
+        state["agent_outcome"] = [
+            AgentAction(tool="MockSlowTool", tool_input={
+                        "seconds": 0.3, "output": "first"}, log=""),
+            AgentAction(tool="MockFormToolStart", tool_input={}, log=""),
+            AgentAction(tool="MockSlowTool", tool_input={
+                        "seconds": 0.1, "output": "second"}, log=""),
+        ]
+        start = time.monotonic()
+        response = graph.call_tool(state)
+        assert time.monotonic() - start < 0.4
+        assert response["error"] is None
+        outputs = [step[1].content for step in response["intermediate_steps"]]
+        assert outputs[0] == "first"
+        assert outputs[2] == "second"
+        # The form tool was activated
+        assert response["active_form_tool"] is not None
+
+    def test_call_tool_error_keeps_other_results(self):
+        graph = FormAgentExecutor(
+            tools=[MockSlowTool(), MockToolError()],
+        )
+        state = AgentState()
+        state["agent_outcome"] = [
+            AgentAction(tool="MockToolError", tool_input={}, log=""),
+            AgentAction(tool="MockSlowTool", tool_input={
+                        "seconds": 0}, log=""),
+        ]
+        response = graph.call_tool(state)
+        assert response["error"] == "Mocked error"
+        outputs = [step[1].content for step in response["intermediate_steps"]]
+        assert outputs == ["Exception: Mocked error", "Slow output"]
+
+    def test_call_tool_error_keeps_state_updates(self):
+        graph = FormAgentExecutor(
+            tools=[MockFormTool(), MockToolError()],
+        )
+        state = AgentState()
+        state["agent_outcome"] = [
+            AgentAction(tool="MockFormToolStart", tool_input={}, log=""),
+            AgentAction(tool="MockToolError", tool_input={}, log=""),
+        ]
+        response = graph.call_tool(state)
+        assert response["error"] == "Mocked error"
+        # The form tool was activated anyway
+        assert response["active_form_tool"] is not None
+
+    def test_call_tool_error_without_message(self):
+        graph = FormAgentExecutor(
+            tools=[MockToolEmptyError()],
+        )
+        state = AgentState()
+        state["agent_outcome"] = [
+            AgentAction(tool="MockToolEmptyError", tool_input={}, log="")
+        ]
+        response = graph.call_tool(state)
+        assert response["error"] == "ValueError: "
+
+    def test_call_tool_timeout(self, monkeypatch):
+        monkeypatch.setattr(
+            "wizard_ai.conversational_engine.form_agent.form_agent_executor.TOOL_TIMEOUT", 0.1)
+        graph = FormAgentExecutor(
+            tools=[MockSlowTool()],
+        )
+        state = AgentState()
+        state["agent_outcome"] = [
+            AgentAction(tool="MockSlowTool", tool_input={
+                        "seconds": 0.5}, log="")
+        ]
+        response = graph.call_tool(state)
+        assert "took more than" in response["error"]
+        assert response["intermediate_steps"][0][1].content.startswith(
+            "TimeoutError")
+
     def test_on_tool_start_on_tool_end(self):
         on_tool_start = MagicMock()
         on_tool_end = MagicMock()
@@ -181,6 +303,27 @@ class TestFormAgentExecutor:
         on_tool_start.assert_called_once()
         on_tool_end.assert_called_once()
 
+    def test_on_tool_start_on_tool_end_from_config(self):
+        on_tool_start = MagicMock()
+        on_tool_end = MagicMock()
+        default_on_tool_start = MagicMock()
+        graph = FormAgentExecutor(
+            tools=[MockFormTool()],
+            on_tool_start=default_on_tool_start,
+        )
+        state = AgentState(
+            agent_outcome=[AgentAction(
+                tool="MockFormToolStart", tool_input={}, log="")]
+        )
+        config = {"configurable": {
+            "on_tool_start": on_tool_start,
+            "on_tool_end": on_tool_end
+        }}
+        graph.call_tool(state, config=config)
+        on_tool_start.assert_called_once()
+        on_tool_end.assert_called_once()
+        default_on_tool_start.assert_not_called()
+
     def test_call_agent_more_intermediate_steps(self):
 
         graph = MockFormAgentExecutorOkModel(
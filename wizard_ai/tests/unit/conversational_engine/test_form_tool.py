@@ -1,7 +1,9 @@
 from wizard_ai.conversational_engine import (AgentState, BaseTool, FormReset,
-                                             FormTool, FormToolState, filter_active_tools)
+                                             FormTool, FormToolState, filter_active_tools,
+                                             make_optional_model)
 
-from .mocks import MockBaseTool, MockFormTool
+from .mocks import (MockBaseTool, MockFormTool, MockFormToolWithFields,
+                    _DummyPayloadWithFields)
 
 
 def test_filter_active_tools_no_active_form_tool():
@@ -44,3 +46,40 @@ def test_filter_active_tools_with_active_form_tool():
     assert isinstance(filtered_tools[1], BaseTool)
     assert filtered_tools[2] == active_form_tool
     assert isinstance(filtered_tools[3], FormReset)
+
+
+def test_activate_returns_a_copy():
+    form_tool = MockFormTool()
+
+    outcome = form_tool.activate()
+
+    active_form_tool = outcome.state_update["active_form_tool"]
+    assert active_form_tool is not form_tool
+    assert active_form_tool.state == FormToolState.ACTIVE
+    assert active_form_tool.name == "MockFormToolUpdate"
+    # The shared tool is left untouched
+    assert form_tool.state == FormToolState.INACTIVE
+    assert form_tool.name == "MockFormToolStart"
+
+
+def test_activated_copy_can_be_invoked():
+    form_tool = MockFormToolWithFields()
+
+    active_form_tool = form_tool.invoke({}).state_update["active_form_tool"]
+    outcome = active_form_tool.invoke({"age": 30})
+
+    assert active_form_tool.form.age == 30
+    assert outcome.state_update["active_form_tool"] is active_form_tool
+
+
+def test_make_optional_model_is_memoized():
+    optional_model = make_optional_model(_DummyPayloadWithFields)
+
+    assert make_optional_model(_DummyPayloadWithFields) is optional_model
+    assert optional_model().age is None
+
+    form_tools = [MockFormToolWithFields(), MockFormToolWithFields()]
+    for form_tool in form_tools:
+        form_tool.enter_active_state()
+    assert form_tools[0].args_schema is optional_model
+    assert form_tools[1].args_schema is optional_model
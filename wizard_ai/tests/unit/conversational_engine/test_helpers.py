@@ -1,4 +1,5 @@
 from typing import TypedDict
+from unittest.mock import patch
 
 import pytest
 from langgraph.graph import StateGraph
@@ -45,3 +46,33 @@ class TestHelpers:
         expected_output = "Title\nParagraph"
         result = HtmlProcessor.clear_html(html)
         assert result == expected_output, "HTML was not cleared correctly"
+
+    def test_clear_html_main_content(self):
+        paragraph = "This is the content of the article. " * 10
+        html = f"""
+        <html>
+        <head><title>Page</title></head>
+        <body>
+        <nav><a href="/">Home</a></nav>
+        <!-- comment -->
+        <article><h1>Title</h1><p>{paragraph}</p><script>var x = 1;</script></article>
+        <footer>Privacy</footer>
+        </body>
+        </html>
+        """
+        with patch.object(HtmlProcessor, "extract_readability_text") as readability_mock:
+            result = HtmlProcessor.clear_html(html)
+
+        assert result == f"Title\n{paragraph.strip()}"
+        readability_mock.assert_not_called()
+
+    def test_clear_html_fallback_and_limits(self):
+        with patch.object(HtmlProcessor, "extract_readability_text", return_value="Longer readability text") as readability_mock:
+            assert HtmlProcessor.clear_html("<p>Short</p>") == "Longer readability text"
+            assert HtmlProcessor.clear_html("  ") == ""
+
+        readability_mock.assert_called_once_with("<p>Short</p>")
+
+        with patch("wizard_ai.helpers.HTML_MAX_INPUT_SIZE", 10), \
+                patch("wizard_ai.helpers.HTML_MIN_TEXT_LENGTH", 0):
+            assert HtmlProcessor.clear_html("<p>0123456789</p>") == "0123456"
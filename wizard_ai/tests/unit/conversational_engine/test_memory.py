@@ -0,0 +1,325 @@
+import asyncio
+import json
+import pickle
+from unittest.mock import MagicMock, patch
+
+from langchain_core.messages import AIMessage, SystemMessage
+
+from wizard_ai.conversational_engine.form_agent.form_tool import FormToolState
+from wizard_ai.conversational_engine.form_agent.memory import (
+    StoredAgentState, delete_stored_agent_state, get_stored_agent_state,
+    store_agent_state)
+from wizard_ai.conversational_engine.form_agent.summary_memory import (
+    FOLD_HISTORY_SCRIPT, RELEASE_LOCK_SCRIPT, summarize_history)
+
+from .mocks import MockBaseTool, MockFormToolWithFields
+
+
+class MockRedis:
+    """In-memory implementation of the Redis commands used by the memory."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.lists = {}
+        self.strings = {}
+        self.commands = []
+
+    def pipeline(self):
+        return MockPipeline(self)
+
+    def hget(self, name, key):
+        return self.hashes.get(name, {}).get(key)
+
+    def hset(self, name, key, value):
+        self.hashes.setdefault(name, {})[key] = value.encode()
+
+    def hdel(self, name, *keys):
+        for key in keys:
+            self.hashes.get(name, {}).pop(key, None)
+
+    def set(self, name, value, nx=False, ex=None):
+        if nx and name in self.strings:
+            return None
+        self.strings[name] = value
+        return True
+
+    def rpush(self, name, *values):
+        self.lists.setdefault(name, []).extend(
+            value.encode() for value in values)
+
+    def ltrim(self, name, start, end):
+        values = self.lists.get(name, [])
+        self.lists[name] = values[start:end + 1 if end != -1 else None]
+
+    def lrange(self, name, start, end):
+        values = self.lists.get(name, [])
+        return values[start:end + 1 if end != -1 else None]
+
+    def get(self, name):
+        return self.strings.get(name)
+
+    def delete(self, name):
+        self.lists.pop(name, None)
+        self.strings.pop(name, None)
+
+    def register_script(self, script):
+        return MockScript(self, script)
+
+
+class MockScript:
+    """Python implementation of the Lua scripts of the summary memory."""
+
+    def __init__(self, redis_client, script):
+        self.redis_client = redis_client
+        self.script = script
+
+    def __call__(self, keys, args):
+        self.redis_client.commands.append(("evalsha", (keys, args)))
+        if self.script == FOLD_HISTORY_SCRIPT:
+            summary_field, summary, *folded = args
+            if self.redis_client.lrange(keys[1], 0, len(folded) - 1) != folded:
+                return 0
+            self.redis_client.hset(keys[0], summary_field, summary)
+            self.redis_client.ltrim(keys[1], len(folded), -1)
+            return 1
+        if self.script == RELEASE_LOCK_SCRIPT:
+            if self.redis_client.get(keys[0]) != args[0]:
+                return 0
+            self.redis_client.delete(keys[0])
+            return 1
+        raise NotImplementedError(self.script)
+
+
+class MockPipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.queued = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.queued.append((name, args))
+        return queue
+
+    def execute(self):
+        self.redis_client.commands.extend(self.queued)
+        return [getattr(self.redis_client, name)(*args) for name, args in self.queued]
+
+
+class MockAsyncRedis(MockRedis):
+    """Async client on the data of a MockRedis."""
+
+    def __init__(self, redis_client: MockRedis):
+        self.hashes = redis_client.hashes
+        self.lists = redis_client.lists
+        self.strings = redis_client.strings
+        self.commands = redis_client.commands
+
+    def pipeline(self):
+        return MockAsyncPipeline(self)
+
+
+class MockAsyncPipeline(MockPipeline):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def execute(self):
+        return super().execute()
+
+
+def save_turn(stored_agent_state, message, answer):
+    stored_agent_state.memory.save_context(
+        inputs={"messages": message},
+        outputs={"output": answer}
+    )
+
+
+def test_store_and_get_agent_state():
+    redis_client = MockRedis()
+    tools = [MockBaseTool(), MockFormToolWithFields()]
+
+    stored_agent_state = get_stored_agent_state(redis_client, "chat_id", tools)
+    save_turn(stored_agent_state, "Hello", "Hi! How can I help you?")
+    active_form_tool = tools[1].activate().state_update["active_form_tool"]
+    active_form_tool.update(age=30)
+    stored_agent_state.active_form_tool = active_form_tool
+    store_agent_state(redis_client, "chat_id", stored_agent_state)
+
+    assert json.loads(redis_client.hget("chat_id", "AGENT_STATE")) == {
+        "version": 2,
+        "active_form_tool": {
+            "name": "MockFormToolWithFields",
+            "state": "ACTIVE",
+            "form": {"name": None, "age": 30}
+        }
+    }
+    assert [json.loads(message) for message in redis_client.lists["chat_id:HISTORY"]] == [
+        {"role": "human", "content": "Hello"},
+        {"role": "ai", "content": "Hi! How can I help you?"}
+    ]
+
+    stored_agent_state = get_stored_agent_state(redis_client, "chat_id", tools)
+
+    assert [message.content for message in stored_agent_state.memory.buffer] == [
+        "Hello", "Hi! How can I help you?"]
+    restored_form_tool = stored_agent_state.active_form_tool
+    assert restored_form_tool is not tools[1]
+    assert restored_form_tool.state == FormToolState.ACTIVE
+    assert restored_form_tool.name == "MockFormToolWithFieldsUpdate"
+    assert restored_form_tool.form.age == 30
+    assert restored_form_tool.get_next_field_to_collect() == "name"
+    assert tools[1].state == FormToolState.INACTIVE
+
+
+def test_store_agent_state_appends_only_new_messages():
+    redis_client = MockRedis()
+
+    with patch("wizard_ai.conversational_engine.form_agent.memory.HISTORY_LENGTH", 2):
+        for turn in range(3):
+            stored_agent_state = get_stored_agent_state(redis_client, "chat_id")
+            redis_client.commands = []
+            save_turn(stored_agent_state, f"message {turn}", f"answer {turn}")
+            store_agent_state(redis_client, "chat_id", stored_agent_state)
+
+        stored_agent_state = get_stored_agent_state(redis_client, "chat_id")
+
+    pushed = [args[1:] for name, args in redis_client.commands if name == "rpush"]
+    assert len(pushed) == 1
+    assert [json.loads(message)["content"] for message in pushed[0]] == [
+        "message 2", "answer 2"]
+    assert [message.content for message in stored_agent_state.memory.buffer] == [
+        "message 1", "answer 1", "message 2", "answer 2"]
+
+
+def test_get_stored_agent_state_unknown_form_tool():
+    redis_client = MockRedis()
+    stored_agent_state = StoredAgentState(
+        active_form_tool=MockFormToolWithFields().activate(
+        ).state_update["active_form_tool"]
+    )
+    store_agent_state(redis_client, "chat_id", stored_agent_state)
+
+    stored_agent_state = get_stored_agent_state(
+        redis_client, "chat_id", [MockBaseTool()])
+
+    assert stored_agent_state.active_form_tool is None
+
+
+def test_get_stored_agent_state_other_format():
+    redis_client = MockRedis()
+    redis_client.hset("chat_id", "AGENT_STATE", json.dumps({"version": 1}))
+    redis_client.hashes["other_chat_id"] = {
+        "AGENT_STATE": pickle.dumps({"legacy": "state"})}
+
+    for chat_id in ["chat_id", "other_chat_id"]:
+        stored_agent_state = get_stored_agent_state(redis_client, chat_id)
+
+        assert stored_agent_state.memory.buffer == []
+        assert stored_agent_state.active_form_tool is None
+
+
+def test_delete_stored_agent_state():
+    redis_client = MockRedis()
+    stored_agent_state = StoredAgentState()
+    save_turn(stored_agent_state, "Hello", "Hi! How can I help you?")
+    store_agent_state(redis_client, "chat_id", stored_agent_state)
+    redis_client.hset("chat_id", "SUMMARY", "The user said hello.")
+
+    asyncio.run(delete_stored_agent_state(
+        MockAsyncRedis(redis_client), "chat_id"))
+
+    assert redis_client.hget("chat_id", "AGENT_STATE") is None
+    assert "chat_id:HISTORY" not in redis_client.lists
+    assert redis_client.hget("chat_id", "SUMMARY") is None
+
+
+def test_summarize_history_folds_older_turns():
+    redis_client = MockRedis()
+    stored_agent_state = get_stored_agent_state(redis_client, "chat_id")
+    for turn in range(6):
+        save_turn(stored_agent_state, f"message {turn}", f"answer {turn}")
+    store_agent_state(redis_client, "chat_id", stored_agent_state)
+    llm = MagicMock()
+    llm.invoke.return_value = AIMessage(content="The user sent 3 messages.")
+
+    with patch("wizard_ai.conversational_engine.form_agent.summary_memory.SUMMARY_RECENT_TURNS", 3):
+        assert summarize_history(redis_client, "chat_id", llm)
+        # The recent turns are not enough for another batch
+        assert not summarize_history(redis_client, "chat_id", llm)
+
+    prompt = llm.invoke.call_args[0][0][0].content
+    assert "User: message 0" in prompt
+    assert "Assistant: answer 2" in prompt
+    assert "message 3" not in prompt
+    assert "chat_id:SUMMARY_LOCK" not in redis_client.strings
+
+    stored_agent_state = get_stored_agent_state(redis_client, "chat_id")
+    assert stored_agent_state.summary == "The user sent 3 messages."
+    chat_history = stored_agent_state.get_chat_history()
+    assert isinstance(chat_history[0], SystemMessage)
+    assert "The user sent 3 messages." in chat_history[0].content
+    assert [message.content for message in chat_history[1:]] == [
+        "message 3", "answer 3", "message 4", "answer 4", "message 5", "answer 5"]
+
+
+def test_summarize_history_locked():
+    redis_client = MockRedis()
+    stored_agent_state = get_stored_agent_state(redis_client, "chat_id")
+    for turn in range(10):
+        save_turn(stored_agent_state, f"message {turn}", f"answer {turn}")
+    store_agent_state(redis_client, "chat_id", stored_agent_state)
+    redis_client.set("chat_id:SUMMARY_LOCK", "1")
+    llm = MagicMock()
+
+    assert not summarize_history(redis_client, "chat_id", llm)
+    llm.invoke.assert_not_called()
+
+
+def test_summarize_history_keeps_messages_trimmed_concurrently():
+    redis_client = MockRedis()
+    stored_agent_state = get_stored_agent_state(redis_client, "chat_id")
+    for turn in range(6):
+        save_turn(stored_agent_state, f"message {turn}", f"answer {turn}")
+    store_agent_state(redis_client, "chat_id", stored_agent_state)
+
+    def trim_history(messages):
+        # Another message of the chat trims the head during the LLM call
+        redis_client.ltrim("chat_id:HISTORY", 2, -1)
+        return AIMessage(content="The user sent 3 messages.")
+    llm = MagicMock()
+    llm.invoke.side_effect = trim_history
+
+    with patch("wizard_ai.conversational_engine.form_agent.summary_memory.SUMMARY_RECENT_TURNS", 3):
+        assert not summarize_history(redis_client, "chat_id", llm)
+
+    assert redis_client.hget("chat_id", "SUMMARY") is None
+    assert len(redis_client.lists["chat_id:HISTORY"]) == 10
+    assert "chat_id:SUMMARY_LOCK" not in redis_client.strings
+
+
+def test_summarize_history_keeps_lock_of_other_worker():
+    redis_client = MockRedis()
+    stored_agent_state = get_stored_agent_state(redis_client, "chat_id")
+    for turn in range(6):
+        save_turn(stored_agent_state, f"message {turn}", f"answer {turn}")
+    store_agent_state(redis_client, "chat_id", stored_agent_state)
+
+    def expire_lock(messages):
+        # The lock expires during the LLM call and another worker takes it
+        redis_client.strings["chat_id:SUMMARY_LOCK"] = "other worker"
+        return AIMessage(content="The user sent 3 messages.")
+    llm = MagicMock()
+    llm.invoke.side_effect = expire_lock
+
+    with patch("wizard_ai.conversational_engine.form_agent.summary_memory.SUMMARY_RECENT_TURNS", 3):
+        assert summarize_history(redis_client, "chat_id", llm)
+
+    assert redis_client.strings["chat_id:SUMMARY_LOCK"] == "other worker"
@@ -1,8 +1,13 @@
+from unittest.mock import MagicMock
+
+from langchain_core.messages import AIMessage, AIMessageChunk
 from langchain_core.prompts.chat import ChatPromptTemplate
 
 from wizard_ai.conversational_engine.form_agent import (AgentState,
                                                           FormAgentExecutor,
-                                                          ModelFactory)
+                                                          ModelFactory,
+                                                          call_llm,
+                                                          get_openai_tool)
 
 from .mocks import *
 
@@ -41,3 +46,58 @@ class TestModelFactory:
         })
         model = ModelFactory.build_model(state=state)
         assert isinstance(model.steps[1], ChatPromptTemplate)
+
+    def test_build_llm_is_cached_by_tool_choice(self):
+        assert ModelFactory.build_llm() is ModelFactory.build_llm()
+        assert ModelFactory.build_llm("MockFormToolUpdate") is ModelFactory.build_llm(
+            "MockFormToolUpdate")
+        assert ModelFactory.build_llm() is not ModelFactory.build_llm(
+            "MockFormToolUpdate")
+
+    def test_get_openai_tool_is_cached_by_state(self):
+        form_tool = MockFormTool()
+        inactive_schema = get_openai_tool(form_tool)
+        assert get_openai_tool(MockFormTool()) is inactive_schema
+        assert inactive_schema["function"]["name"] == "MockFormToolStart"
+
+        form_tool.enter_active_state()
+        active_schema = get_openai_tool(form_tool)
+        assert active_schema is not inactive_schema
+        assert active_schema["function"]["name"] == "MockFormToolUpdate"
+
+
+def test_call_llm_streams_text_and_merges_tool_calls():
+    llm = MagicMock()
+    llm.stream.return_value = [
+        AIMessageChunk(content="Let me "),
+        AIMessageChunk(content="check."),
+        AIMessageChunk(content="", additional_kwargs={"tool_calls": [
+            {"index": 0, "id": "call_1", "type": "function",
+             "function": {"name": "GoogleSearch", "arguments": ""}}]}),
+        AIMessageChunk(content="", additional_kwargs={"tool_calls": [
+            {"index": 0, "function": {"arguments": '{"query": '}}]}),
+        AIMessageChunk(content="", additional_kwargs={"tool_calls": [
+            {"index": 0, "function": {"arguments": '"weather"}'}}]}),
+    ]
+    on_text_delta = MagicMock()
+
+    message = call_llm(llm, [], {"configurable": {"on_text_delta": on_text_delta}})
+
+    assert message.content == "Let me check."
+    assert message.additional_kwargs["tool_calls"] == [{
+        "id": "call_1",
+        "type": "function",
+        "function": {"name": "GoogleSearch", "arguments": '{"query": "weather"}'}
+    }]
+    assert [call.args[1] for call in on_text_delta.call_args_list] == [
+        "Let me ", "check."]
+    # Both pieces belong to the same LLM call
+    assert len({call.args[0] for call in on_text_delta.call_args_list}) == 1
+
+
+def test_call_llm_without_streaming():
+    llm = MagicMock()
+    llm.invoke.return_value = AIMessage(content="Hello")
+
+    assert call_llm(llm, [], {}).content == "Hello"
+    llm.stream.assert_not_called()
@@ -0,0 +1,109 @@
+from langchain.agents.output_parsers.openai_tools import \
+    OpenAIToolAgentAction
+from langchain_core.messages import (AIMessage, FunctionMessage, HumanMessage,
+                                     ToolMessage)
+
+from wizard_ai.conversational_engine.form_agent import (
+    DEFAULT_PROMPT_TOKEN_BUDGET, LLM_MODEL, assemble_prompt_inputs,
+    fit_prompt_to_budget, get_token_counter, group_intermediate_steps)
+from wizard_ai.conversational_engine.form_agent.model_factory import \
+    DEFAULT_PROMPT_TEMPLATE
+
+
+def build_step(tool_call_id: str, output: str, ai_message: AIMessage = None):
+    ai_message = ai_message or AIMessage(content="", additional_kwargs={"tool_calls": [{
+        "id": tool_call_id,
+        "type": "function",
+        "function": {"name": "GoogleSearch", "arguments": "{}"}
+    }]})
+    action = OpenAIToolAgentAction(
+        tool="GoogleSearch",
+        tool_input={},
+        log="",
+        message_log=[ai_message],
+        tool_call_id=tool_call_id
+    )
+    return action, FunctionMessage(content=output, name="GoogleSearch")
+
+
+def build_inputs(chat_history=[], intermediate_steps=[]):
+    return {
+        "input": "Hello",
+        "chat_history": chat_history,
+        "intermediate_steps": intermediate_steps
+    }
+
+
+def test_fit_prompt_to_budget_keeps_everything_within_budget():
+    history = [HumanMessage(content="Hi"), AIMessage(content="Hello!")]
+    steps = [build_step("call_1", "Sunny")]
+    inputs, report = fit_prompt_to_budget(
+        build_inputs(history, steps), DEFAULT_PROMPT_TEMPLATE, [], LLM_MODEL)
+
+    assert inputs["chat_history"] == history
+    assert inputs["intermediate_steps"] == steps
+    assert isinstance(inputs["agent_scratchpad"][-1], ToolMessage)
+    assert report["trimmed_history_messages"] == 0
+    assert report["trimmed_intermediate_steps"] == 0
+    assert 0 < report["prompt_tokens"] < DEFAULT_PROMPT_TOKEN_BUDGET
+
+
+def test_fit_prompt_to_budget_drops_oldest_history_first():
+    history = []
+    for idx in range(20):
+        history += [HumanMessage(content=f"Question {idx} " + "word " * 50),
+                    AIMessage(content=f"Answer {idx} " + "word " * 50)]
+    inputs, report = fit_prompt_to_budget(
+        build_inputs(history), DEFAULT_PROMPT_TEMPLATE, [], LLM_MODEL, budget=1000)
+
+    kept = inputs["chat_history"]
+    assert 0 < len(kept) < len(history)
+    assert kept == history[-len(kept):]
+    assert isinstance(kept[0], HumanMessage)
+    assert report["trimmed_history_messages"] == len(history) - len(kept)
+    assert report["prompt_tokens"] <= 1000
+
+
+def test_fit_prompt_to_budget_keeps_parallel_tool_calls_together():
+    parallel_message = AIMessage(content="", additional_kwargs={"tool_calls": [
+        {"id": f"call_{idx}", "type": "function",
+         "function": {"name": "GoogleSearch", "arguments": "{}"}}
+        for idx in (2, 3)
+    ]})
+    steps = [
+        build_step("call_1", "old output " * 200),
+        build_step("call_2", "output", parallel_message),
+        build_step("call_3", "output", parallel_message)
+    ]
+    assert len(group_intermediate_steps(steps)) == 2
+
+    inputs, report = fit_prompt_to_budget(
+        build_inputs(intermediate_steps=steps), DEFAULT_PROMPT_TEMPLATE, [],
+        LLM_MODEL, budget=400)
+
+    assert inputs["intermediate_steps"] == steps[1:]
+    assert report["trimmed_intermediate_steps"] == 1
+
+
+def test_fit_prompt_to_budget_truncates_newest_large_output():
+    steps = [build_step("call_1", "very long email " * 5000)]
+    inputs, report = fit_prompt_to_budget(
+        build_inputs(intermediate_steps=steps), DEFAULT_PROMPT_TEMPLATE, [],
+        LLM_MODEL, budget=1000)
+
+    output = inputs["intermediate_steps"][0][1].content
+    assert output.endswith("(truncated)")
+    assert get_token_counter(LLM_MODEL).count_text(output) < 1000
+    assert report["truncated_tool_outputs"] == 1
+
+
+def test_assemble_prompt_inputs_records_metrics():
+    metrics = {}
+    config = {"configurable": {"metrics": metrics}}
+    for _ in range(2):
+        assemble_prompt_inputs(
+            build_inputs(), DEFAULT_PROMPT_TEMPLATE, [], config)
+
+    assert metrics["llm_calls"] == 2
+    assert metrics["max_prompt_tokens"] > 0
+    assert metrics["trimmed_history_messages"] == 0
@@ -0,0 +1,55 @@
+import pytest
+from langchain_core.tools import ToolException
+
+from wizard_ai.conversational_engine.tools.python_sandbox import PythonSandbox
+
+
+@pytest.fixture(scope="module")
+def sandbox():
+    sandbox = PythonSandbox(
+        size=1,
+        timeout=3,
+        cpu_time=1,
+        memory_limit=64 * 1024 * 1024,
+        max_result_size=10,
+        max_tasks=3
+    )
+    yield sandbox
+    sandbox.close()
+
+
+def get_worker_pid(sandbox: PythonSandbox) -> int:
+    return int(sandbox.run("import os\nresult = os.getpid()"))
+
+
+def test_run(sandbox):
+    assert sandbox.run("a = 5\nb = 3\nresult = a + b") == "8"
+    assert sandbox.run("result = 'a' * 100") == "aaaaaaaaaa... (truncated)"
+
+
+def test_run_errors(sandbox):
+    with pytest.raises(ToolException, match="variable called result"):
+        sandbox.run("a = 1")
+
+    with pytest.raises(ToolException, match="ZeroDivisionError"):
+        sandbox.run("result = 1 / 0")
+
+    with pytest.raises(ToolException, match="MemoryError"):
+        sandbox.run("result = bytearray(512 * 1024 * 1024)")
+
+
+def test_run_limits_replace_the_worker(sandbox):
+    pid = get_worker_pid(sandbox)
+    with pytest.raises(ToolException, match="CPU time or memory"):
+        sandbox.run("while True:\n    pass")
+    assert get_worker_pid(sandbox) != pid
+
+    pid = get_worker_pid(sandbox)
+    with pytest.raises(ToolException, match="more than 3 seconds"):
+        sandbox.run("import time\ntime.sleep(10)")
+    new_pid = get_worker_pid(sandbox)
+    assert new_pid != pid
+
+    # Recycled after max_tasks snippets
+    assert [get_worker_pid(sandbox) for _ in range(2)] == [new_pid, new_pid]
+    assert get_worker_pid(sandbox) != new_pid
@@ -0,0 +1,63 @@
+import concurrent.futures
+import json
+from unittest.mock import MagicMock
+
+from wizard_ai.conversational_engine.text_stream_handler import \
+    TextStreamHandler
+
+
+def get_published(rabbitmq_producer: MagicMock) -> list:
+    return [
+        json.loads(call.kwargs["message"])
+        for call in rabbitmq_producer.publish_threadsafe.call_args_list
+    ]
+
+
+def create_producer() -> MagicMock:
+    rabbitmq_producer = MagicMock()
+    future = concurrent.futures.Future()
+    future.set_result(None)
+    rabbitmq_producer.publish_threadsafe.return_value = future
+    return rabbitmq_producer
+
+
+def test_text_stream_handler_coalesces_deltas():
+    rabbitmq_producer = create_producer()
+    handler = TextStreamHandler(
+        chat_id="chat_id",
+        rabbitmq_producer=rabbitmq_producer,
+        queue="queue",
+        interval=60
+    )
+
+    # The first delta is published immediately, the others are buffered
+    for delta in ["Hello", " wor", "ld"]:
+        handler.on_text_delta("stream_1", delta)
+    # A new LLM call flushes the previous stream
+    handler.on_text_delta("stream_2", "Bye")
+    handler.flush()
+
+    assert [
+        (message["stream_id"], message["sequence"], message["content"])
+        for message in get_published(rabbitmq_producer)
+    ] == [
+        ("stream_1", 0, "Hello"),
+        ("stream_1", 1, " world"),
+        ("stream_2", 0, "Bye"),
+    ]
+    assert all(
+        message["type"] == "TEXT_DELTA" and message["chat_id"] == "chat_id"
+        for message in get_published(rabbitmq_producer)
+    )
+    # The deltas don't wait for the broker confirm
+    assert all(
+        call.kwargs["wait"] is False
+        for call in rabbitmq_producer.publish_threadsafe.call_args_list
+    )
+    assert handler.pending_publishes == []
+
+
+def test_text_stream_handler_without_producer():
+    handler = TextStreamHandler(chat_id="chat_id")
+    handler.on_text_delta("stream_1", "Hello")
+    handler.flush()
@@ -8,4 +8,6 @@ from .google import (CreateCalendarEventPayload, GetCalendarEventsPayload,
 from .google_search import GoogleSearchClient, GoogleSearchClientPayload
 from .rabbitmq import (RabbitMQConsumer, RabbitMQProducer, RabbitMQProducerDep,
                        get_rabbitmq_consumer, get_rabbitmq_producer)
-from .redis import RedisClientDep, get_redis_client
+from .redis import (AsyncRedisClientDep, RedisClientDep,
+                    get_async_redis_client, get_redis_client)
+from .web_crawler import WebCrawler, get_web_crawler
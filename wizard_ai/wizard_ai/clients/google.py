@@ -1,13 +1,19 @@
 import base64
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from email.message import EmailMessage
 from textwrap import dedent
 from typing import Any, List, Optional
 
+import google_auth_httplib2
+import httplib2
 from dateutil.parser import parse
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import Resource, build
+from googleapiclient.http import HttpRequest
 from pydantic import BaseModel, Field, field_validator
 
 from wizard_ai.helpers import HtmlProcessor
@@ -15,6 +21,12 @@ from wizard_ai.helpers import HtmlProcessor
 REDIS_HOST = os.environ.get('REDIS_HOST')
 REDIS_PASSWORD = os.environ.get('REDIS_PASSWORD')
 GET_FULL_CONTENT = True
+# Maximum number of Google API service objects kept in memory
+GOOGLE_SERVICE_CACHE_SIZE = int(os.environ.get('GOOGLE_SERVICE_CACHE_SIZE', 128))
+# Maximum number of Gmail messages fetched in parallel
+GMAIL_FETCH_WORKERS = int(os.environ.get('GMAIL_FETCH_WORKERS', 8))
+# Headers shown for each email
+EMAIL_HEADERS = ['From', 'Date', 'Subject']
 
 class CreateCalendarEventPayload(BaseModel):
 
@@ -73,6 +85,85 @@ class SendEmailPayload(BaseModel):
     #         raise ValueError("Invalid email address")
 
 
+class GoogleServiceCache:
+    """
+    LRU cache of Google API service objects, by API and credentials.
+
+    Services are built from the discovery documents bundled with googleapiclient
+    (static discovery), and building them is still expensive, so they are reused
+    across the tool calls of the same user.
+    """
+
+    def __init__(self, max_size: int = GOOGLE_SERVICE_CACHE_SIZE):
+        self.max_size = max_size
+        self.services = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(
+        self,
+        service_name: str,
+        version: str,
+        credentials: Credentials
+    ) -> Resource:
+        # Credentials are loaded from Redis for every call, so they are
+        # identified by their tokens rather than by the object
+        key = (
+            service_name,
+            version,
+            credentials.client_id,
+            credentials.refresh_token or credentials.token
+        )
+        with self.lock:
+            service = self.services.get(key)
+            if service is not None:
+                self.services.move_to_end(key)
+                return service
+
+        service = build(
+            service_name,
+            version,
+            credentials=credentials,
+            static_discovery=True,
+            cache_discovery=False,
+            requestBuilder=self.__get_request_builder(credentials)
+        )
+
+        with self.lock:
+            self.services[key] = service
+            self.services.move_to_end(key)
+            while len(self.services) > self.max_size:
+                self.services.popitem(last=False)
+        return service
+
+    def clear(self):
+        with self.lock:
+            self.services.clear()
+
+    @staticmethod
+    def __get_request_builder(credentials: Credentials):
+        # httplib2.Http is not thread-safe and a cached service can be used by
+        # several threads, so each thread sends the requests with its own Http
+        # (and keeps its connections alive across calls)
+        thread_local = threading.local()
+
+        def build_request(http, *args, **kwargs):
+            if not hasattr(thread_local, "http"):
+                thread_local.http = google_auth_httplib2.AuthorizedHttp(
+                    credentials, http=httplib2.Http())
+            return HttpRequest(thread_local.http, *args, **kwargs)
+        return build_request
+
+
+google_service_cache = GoogleServiceCache()
+
+# Shared by all the chats, so the number of concurrent Gmail requests is bounded.
+# Its threads keep their own connections (see GoogleServiceCache) across calls.
+gmail_fetch_executor = ThreadPoolExecutor(
+    max_workers=GMAIL_FETCH_WORKERS,
+    thread_name_prefix="gmail-fetch"
+)
+
+
 class GoogleClient:
 
     def __init__(
@@ -81,11 +172,14 @@ class GoogleClient:
     ):
         self.credentials = credentials
 
+    def __get_service(self, service_name: str, version: str) -> Resource:
+        return google_service_cache.get(service_name, version, self.credentials)
+
     def create_calendar_event(
         self,
         data: CreateCalendarEventPayload
     ):
-        service = build('calendar', 'v3', credentials=self.credentials)
+        service = self.__get_service('calendar', 'v3')
 
         event = {
             'summary': data.summary,
@@ -100,7 +194,7 @@ class GoogleClient:
         self,
         data: GetCalendarEventsPayload
     ) -> List[Any]:
-        service = build('calendar', 'v3', credentials=self.credentials)
+        service = self.__get_service('calendar', 'v3')
 
         # Google API need the timezone. For simplicity we set UTC
         data.start = data.start.replace(tzinfo=timezone.utc)
@@ -145,57 +239,64 @@ class GoogleClient:
         self,
         payload: GetEmailsPayload
     ):
-        service = build('gmail', 'v1', credentials=self.credentials)
+        service = self.__get_service('gmail', 'v1')
 
         messages_list = service.users().messages().list(
             userId='me', maxResults=payload.number_of_emails).execute()
         messages = messages_list.get('messages', [])
 
-        result = []
+        # The messages are fetched in parallel instead of one request after the other.
+        # map keeps the order of the list (most recent first)
+        return list(gmail_fetch_executor.map(
+            lambda message: self.__get_email(service, message['id']),
+            messages
+        ))
 
-        for message in messages:
+    def __get_email(self, service: Resource, message_id: str) -> dict:
+        if GET_FULL_CONTENT:
+            msg = service.users().messages().get(
+                userId="me", id=message_id, format="full").execute()
+        else:
+            # Only the headers and the snippet are needed, skip the body
             msg = service.users().messages().get(
-                userId="me", id=message['id']).execute()
-
-            # Extracting sender, time, and content from the message
-            sender = next((header['value'] for header in msg['payload']
-                          ['headers'] if header['name'] == 'From'), None)
-            time = next((header['value'] for header in msg['payload']
-                        ['headers'] if header['name'] == 'Date'), None)
-            subject = next((header['value'] for header in msg['payload']
-                           ['headers'] if header['name'] == 'Subject'), None)
-
-            full_content = ''
-            
-            if GET_FULL_CONTENT:
-                # Check if the email is in multipart format
-                if 'multipart' in msg['payload']['mimeType']:
-                    parts = msg['payload']['parts']
-                    full_content = ''
-                    for part in parts:
-                        if 'body' in part and 'data' in part['body']:
-                            data = part['body']['data']
-                            decoded_data = base64.urlsafe_b64decode(
-                                data.encode('UTF-8')).decode('UTF-8')
-                            full_content += decoded_data
-                else:
-                    # If the email is in plain text format
-                    full_content = base64.urlsafe_b64decode(
-                        msg['payload']['body']['data'].encode('UTF-8')).decode('UTF-8')
-
-                # Clear the full content
-                full_content = HtmlProcessor.clear_html(full_content)
+                userId="me",
+                id=message_id,
+                format="metadata",
+                metadataHeaders=EMAIL_HEADERS
+            ).execute()
+
+        # Extracting sender, time, and content from the message
+        headers = {}
+        for header in msg['payload']['headers']:
+            headers.setdefault(header['name'], header['value'])
+
+        if GET_FULL_CONTENT:
+            # Check if the email is in multipart format
+            if 'multipart' in msg['payload']['mimeType']:
+                parts = msg['payload']['parts']
+                full_content = ''
+                for part in parts:
+                    if 'body' in part and 'data' in part['body']:
+                        data = part['body']['data']
+                        decoded_data = base64.urlsafe_b64decode(
+                            data.encode('UTF-8')).decode('UTF-8')
+                        full_content += decoded_data
             else:
-                full_content = msg['snippet']
-
-            result.append({
-                "sender": sender,
-                "time": time,
-                "subject": subject,
-                "content": full_content
-            })
-
-        return result
+                # If the email is in plain text format
+                full_content = base64.urlsafe_b64decode(
+                    msg['payload']['body']['data'].encode('UTF-8')).decode('UTF-8')
+
+            # Clear the full content
+            full_content = HtmlProcessor.clear_html(full_content)
+        else:
+            full_content = msg['snippet']
+
+        return {
+            "sender": headers.get('From'),
+            "time": headers.get('Date'),
+            "subject": headers.get('Subject'),
+            "content": full_content
+        }
 
     def get_emails_html(
         self,
@@ -229,7 +330,7 @@ class GoogleClient:
         self,
         payload: SendEmailPayload
     ):
-        service = build('gmail', 'v1', credentials=self.credentials)
+        service = self.__get_service('gmail', 'v1')
 
         profile = service.users().getProfile(userId="me").execute()
         message = self.__create_message(
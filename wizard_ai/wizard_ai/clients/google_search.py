@@ -1,15 +1,27 @@
 import logging
+import os
+from collections import deque
 from textwrap import dedent
-from typing import Dict, List
+from typing import Any, Dict, List
 
 import requests
 from parsel import Selector
 from pydantic import BaseModel, Field
 
+from wizard_ai.constants import RedisKeys
 from wizard_ai.helpers import HtmlProcessor
 
+from .redis import get_redis_client
+from .search_cache import (PAGE_CONTENT_CACHE_SIZE, PAGE_CONTENT_CACHE_TTL,
+                           SEARCH_CACHE_REDIS, SEARCH_RESULTS_CACHE_SIZE,
+                           SEARCH_RESULTS_CACHE_TTL, TTLCache, normalize_query)
+from .web_crawler import WebCrawler, get_web_crawler
+
 logger = logging.getLogger(__name__)
 
+# Timeout of the request to Google, in seconds
+SEARCH_REQUEST_TIMEOUT = float(os.environ.get('SEARCH_REQUEST_TIMEOUT', 5))
+
 
 class GoogleSearchClientPayload(BaseModel):
     query: str = Field(
@@ -22,7 +34,12 @@ class GoogleSearchClientPayload(BaseModel):
 
 
 class GoogleSearchClient:
-    def __init__(self):
+    def __init__(
+        self,
+        web_crawler: WebCrawler = None,
+        search_results_cache: TTLCache = None,
+        page_content_cache: TTLCache = None
+    ):
         self.headers = {
             'authority': 'www.google.com',
             'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
@@ -47,7 +64,25 @@ class GoogleSearchClient:
             'upgrade-insecure-requests': '1',
             'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36 Edg/109.0.1518.78',
         }
-        self.previous_searches = []
+        # The client is shared by all the chats, so only the last searches are kept
+        self.previous_searches = deque(maxlen=100)
+        # Downloads the pages of the results list
+        self.web_crawler = web_crawler or get_web_crawler()
+
+        # Two levels of cache: query -> scraped search results, url -> page content
+        redis_client = get_redis_client() if SEARCH_CACHE_REDIS else None
+        self.search_results_cache = search_results_cache or TTLCache(
+            name=RedisKeys.SEARCH_RESULTS.value,
+            ttl=SEARCH_RESULTS_CACHE_TTL,
+            max_size=SEARCH_RESULTS_CACHE_SIZE,
+            redis_client=redis_client
+        )
+        self.page_content_cache = page_content_cache or TTLCache(
+            name=RedisKeys.PAGE_CONTENT.value,
+            ttl=PAGE_CONTENT_CACHE_TTL,
+            max_size=PAGE_CONTENT_CACHE_SIZE,
+            redis_client=redis_client
+        )
 
     def search(
         self,
@@ -56,22 +91,31 @@ class GoogleSearchClient:
         if not payload.query:
             raise ValueError("Query cannot be empty")
 
-        logging.info(f"Searching the internet with query: {payload.query}")
-        params = {'q': payload.query}
+        query_key = normalize_query(payload.query)
+        search_results = self.search_results_cache.get(query_key)
+        if search_results is not None:
+            logging.info(f"Found cached results for query: {payload.query}")
+        else:
+            logging.info(f"Searching the internet with query: {payload.query}")
+            params = {'q': payload.query}
+
+            response = self.make_request(
+                'https://www.google.com/search', params=params)
+            if not response:
+                return None
 
-        response = self.make_request(
-            'https://www.google.com/search', params=params)
+            search_results = self.scrape_search_results(Selector(response.text))
+            self.search_results_cache.set(query_key, search_results)
 
-        if response:
-            selector = Selector(response.text)
-            result = self.parse_search_results(selector, payload=payload)
-            self.previous_searches.append(payload.query)
-            return result
+        result = self.__build_result(search_results, payload=payload)
+        self.previous_searches.append(payload.query)
+        return result
 
     def make_request(self, url, params=None):
         params = params or {}
         try:
-            response = requests.get(url, params=params, headers=self.headers)
+            response = requests.get(
+                url, params=params, headers=self.headers, timeout=SEARCH_REQUEST_TIMEOUT)
             response.raise_for_status()
             return response
         except requests.exceptions.RequestException as e:
@@ -81,7 +125,15 @@ class GoogleSearchClient:
         self,
         selector: Selector,
         payload: GoogleSearchClientPayload
-    ) -> List[Dict[str, str]]:
+    ) -> str:
+        return self.__build_result(
+            self.scrape_search_results(selector), payload=payload)
+
+    def scrape_search_results(self, selector: Selector) -> Dict[str, Any]:
+        """
+        Extracts the data of the search results page, in a JSON serializable dict
+        that is cached by query.
+        """
         # Add parser for other data...
 
         financial_data = None
@@ -98,16 +150,29 @@ class GoogleSearchClient:
         except BaseException as e:
             logger.info(f"No info box found")
 
+        results_list = self._scrape_results_list(selector)
+        if results_list:
+            logging.info(f"Found results from websites: {results_list}")
+
+        return {
+            "financial_data": financial_data,
+            "info_box": info_box,
+            "results_list": results_list
+        }
+
+    def __build_result(
+        self,
+        search_results: Dict[str, Any],
+        payload: GoogleSearchClientPayload
+    ) -> str:
+        financial_data = search_results["financial_data"]
+        info_box = search_results["info_box"]
+
         if self._enable_expanded_results(query=payload.query):
-            results_list = self._scrape_results_list(selector)
-            texts = []
-            for result in results_list:
-                if len(texts) < payload.num_expanded_results:
-                    text = self.get_main_content_from_url(result["url"])
-                    if text:
-                        texts.append(text)
-            if results_list:
-                logging.info(f"Found results from websites: {results_list}")
+            texts = self.__get_pages_content(
+                urls=[result["url"] for result in search_results["results_list"]],
+                max_results=payload.num_expanded_results
+            )
         else:
             texts = []
             logging.info(
@@ -123,6 +188,27 @@ class GoogleSearchClient:
             {"".join(texts)}
         """)
 
+    def __get_pages_content(self, urls: List[str], max_results: int) -> List[str]:
+        """
+        Returns the main content of the first max_results pages that can be read,
+        taking them from the cache when possible.
+        """
+        contents = self.page_content_cache.get_many(urls)
+        missing_results = max_results - len(contents)
+        if missing_results > 0:
+            # The pages are downloaded concurrently, keeping the first ones that are ready
+            crawled = self.web_crawler.crawl_threadsafe(
+                urls=[url for url in urls if url not in contents],
+                max_results=missing_results,
+                extract=HtmlProcessor.clear_html,
+                headers=self.__get_crawl_headers()
+            )
+            for url, content in crawled.items():
+                self.page_content_cache.set(url, content)
+            contents.update(crawled)
+
+        return [contents[url] for url in urls if url in contents][:max_results]
+
     def __scrape_financial_data(
             self, selector: Selector) -> List[Dict[str, str]]:
         """
@@ -224,23 +310,12 @@ class GoogleSearchClient:
 
         return parsed
 
-    def get_main_content_from_url(
-        self,
-        url: str
-    ):
-
-        try:
-            response = self.make_request(url)
-        except requests.exceptions.MissingSchema as e:
-            logging.info(f"Cannot get content from {url}")
-
-        try:
-            if response:
-                text_content = HtmlProcessor.clear_html(response.text)
-                logging.info(f"Found content from {url}")
-                return text_content
-        except requests.exceptions.RequestException as e:
-            logging.exception(f"Error getting main content from {url}: {e}")
+    def __get_crawl_headers(self) -> Dict[str, str]:
+        # The other headers are the ones of a browser, but the authority is Google's
+        return {
+            key: value for key, value in self.headers.items()
+            if key != 'authority'
+        }
 
     def _get_xpath_with_alternatives(
         self,
@@ -1,36 +1,73 @@
 import asyncio
 import json
 import logging
-from typing import Coroutine
+from contextlib import asynccontextmanager
+from typing import Callable, Coroutine, Dict, Hashable
 
 import aio_pika
 
-from .constants import (RABBITMQ_HOST, RABBITMQ_PASSWORD, RABBITMQ_PORT,
-                        RABBITMQ_USER)
+from .constants import (RABBITMQ_CONSUMER_CONCURRENCY, RABBITMQ_HOST,
+                        RABBITMQ_PASSWORD, RABBITMQ_PORT, RABBITMQ_USER)
 
 logger = logging.getLogger(__name__)
 
 
 class RabbitMQConsumer:
+    """
+    Consumes the messages of a queue, calling on_message_callback for each of them.
+
+    :param concurrency_key: function that returns the key of a message body.
+        Messages with the same key are processed strictly in order, while messages
+        with different keys are processed concurrently.
+        If not set, all the messages share the same key and are processed one at a time.
+    :param max_concurrency: maximum number of messages processed at the same time.
+        It is also used as the prefetch count of the channel.
+    """
+
     def __init__(
         self,
         on_message_callback: Coroutine[dict, None, None],
-        queue_name: str
+        queue_name: str,
+        concurrency_key: Callable[[dict], Hashable] = None,
+        max_concurrency: int = RABBITMQ_CONSUMER_CONCURRENCY
     ):
         self.queue_name = queue_name
         self.on_message_callback = on_message_callback
+        self.concurrency_key = concurrency_key
+        self.max_concurrency = max_concurrency
         self.connection = None
-        self.lock = asyncio.Lock()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.locks: Dict[Hashable, asyncio.Lock] = {}
+        self.lock_users: Dict[Hashable, int] = {}
+
+    @asynccontextmanager
+    async def key_lock(self, key: Hashable):
+        """
+        Holds the lock of a key. asyncio.Lock wakes up its waiters in FIFO order,
+        so messages with the same key keep the order in which they were delivered.
+        Locks are removed as soon as no message is using them.
+        """
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        self.lock_users[key] = self.lock_users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self.lock_users[key] -= 1
+            if not self.lock_users[key]:
+                del self.lock_users[key]
+                del self.locks[key]
 
     async def on_message(self, message):
         async with message.process():
-            async with self.lock:
-                body = json.loads(message.body.decode())
-                logging.debug(f" [x] Received {body}")
-                await self.on_message_callback(body)
-                # Your processing logic here
-                # For example, you can call an async function:
-                # await process_message(body)
+            body = json.loads(message.body.decode())
+            logging.debug(f" [x] Received {body}")
+            key = self.concurrency_key(body) if self.concurrency_key else None
+            # The key lock is acquired first, so that messages waiting for
+            # their turn don't take a slot from other keys
+            async with self.key_lock(key):
+                async with self.semaphore:
+                    await self.on_message_callback(body)
 
     async def setup_consumer(self):
         self.connection = await aio_pika.connect_robust(
@@ -41,6 +78,7 @@ class RabbitMQConsumer:
             reconnect_interval=15
         )
         channel = await self.connection.channel()
+        await channel.set_qos(prefetch_count=self.max_concurrency)
         queue = await channel.declare_queue(self.queue_name, durable=True)
         await queue.consume(self.on_message)
 
@@ -50,9 +88,13 @@ class RabbitMQConsumer:
 
 def get_rabbitmq_consumer(
     on_message_callback: Coroutine[dict, None, None],
-    queue_name: str
+    queue_name: str,
+    concurrency_key: Callable[[dict], Hashable] = None,
+    max_concurrency: int = RABBITMQ_CONSUMER_CONCURRENCY
 ):
     return RabbitMQConsumer(
         on_message_callback=on_message_callback,
-        queue_name=queue_name
+        queue_name=queue_name,
+        concurrency_key=concurrency_key,
+        max_concurrency=max_concurrency
     )
@@ -1,46 +1,214 @@
+import asyncio
+import concurrent.futures
 import logging
-from typing import Annotated
+from functools import lru_cache
+from typing import Annotated, List, Set, Tuple
 
-import pika
+import aio_pika
+from aio_pika.abc import AbstractChannel
+from aio_pika.pool import Pool
 
-from .constants import RABBITMQ_HOST, RABBITMQ_PASSWORD, RABBITMQ_PORT, RABBITMQ_USER
+from .constants import (RABBITMQ_CHANNEL_POOL_SIZE, RABBITMQ_HOST,
+                        RABBITMQ_PASSWORD, RABBITMQ_PORT,
+                        RABBITMQ_PUBLISH_BATCH_INTERVAL,
+                        RABBITMQ_PUBLISH_BATCH_SIZE, RABBITMQ_PUBLISH_TIMEOUT,
+                        RABBITMQ_USER)
 
 logger = logging.getLogger(__name__)
 
 
 class RabbitMQProducer:
+    """
+    Long-lived publisher, meant to be shared by the whole process.
 
-    def __init__(self, host, port, user, password):
+    It keeps a single robust connection, which reconnects automatically, and a pool
+    of channels with publisher confirms. Each queue is declared only once.
+
+    :param batch_interval: if greater than 0, messages are buffered and published
+        together every batch_interval seconds (or as soon as batch_size messages are
+        buffered), waiting for all of their confirms at once.
+
+    publish must be awaited on the event loop the producer is connected to.
+    Code running in other threads (e.g. the agent worker pool) must use publish_threadsafe.
+    """
+
+    def __init__(
+        self,
+        host,
+        port,
+        user,
+        password,
+        channel_pool_size: int = RABBITMQ_CHANNEL_POOL_SIZE,
+        batch_size: int = RABBITMQ_PUBLISH_BATCH_SIZE,
+        batch_interval: float = RABBITMQ_PUBLISH_BATCH_INTERVAL
+    ):
         self.host = host
         self.port = port
         self.user = user
         self.password = password
+        self.channel_pool_size = channel_pool_size
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
 
+        self.loop = None
         self.connection = None
-        self.channel = None
+        self.channel_pool = None
+        self.declared_queues: Set[str] = set()
+        self.batch: List[Tuple[str, str, asyncio.Future]] = []
+        self.batch_flusher = None
+        self.connect_lock = None
 
-    def connect(self):
-        connection_params = pika.ConnectionParameters(
-            host=self.host,
-            port=self.port,
-            credentials=pika.PlainCredentials(self.user, self.password)
-        )
-        self.connection = pika.BlockingConnection(connection_params)
-        self.channel = self.connection.channel()
+    async def connect(self):
+        if self.connection:
+            return
+
+        if not self.connect_lock:
+            self.connect_lock = asyncio.Lock()
+
+        async with self.connect_lock:
+            if self.connection:
+                return
 
-    def publish(
+            connection = await aio_pika.connect_robust(
+                host=self.host,
+                port=self.port,
+                login=self.user,
+                password=self.password,
+                reconnect_interval=15
+            )
+            self.loop = asyncio.get_running_loop()
+            self.channel_pool = Pool(
+                self.__get_channel,
+                max_size=self.channel_pool_size
+            )
+            self.connection = connection
+
+    async def __get_channel(self) -> AbstractChannel:
+        return await self.connection.channel(publisher_confirms=True)
+
+    async def close(self):
+        # Publish the buffered messages before closing
+        if self.batch_flusher:
+            await self.batch_flusher
+        if self.batch:
+            await self.flush()
+        if self.channel_pool:
+            await self.channel_pool.close()
+        if self.connection:
+            await self.connection.close()
+
+        self.connection = None
+        self.channel_pool = None
+        self.declared_queues = set()
+
+    async def publish(
         self,
         queue: str,
         message: str
     ):
-        # TODO: we are connecting at every message, there must be a better
-        # way...
-        self.connect()
-        self.channel.queue_declare(queue=queue, durable=True)
-        self.channel.basic_publish(
-            exchange='', routing_key=queue, body=message)
+        await self.connect()
+
+        if self.batch_interval <= 0:
+            async with self.channel_pool.acquire() as channel:
+                await self.__declare_queue(channel, queue)
+                await self.__publish(channel, queue, message)
+            return
+
+        future = self.loop.create_future()
+        self.batch.append((queue, message, future))
+        if len(self.batch) >= self.batch_size:
+            if self.batch_flusher:
+                self.batch_flusher.cancel()
+            self.batch_flusher = asyncio.create_task(self.flush())
+        elif not self.batch_flusher:
+            self.batch_flusher = asyncio.create_task(
+                self.flush(delay=self.batch_interval))
+        await future
+
+    async def flush(self, delay: float = 0):
+        """
+        Publishes the buffered messages on a single channel.
+        The channel writes them in order, and their confirms are awaited together.
+        """
+        if delay:
+            await asyncio.sleep(delay)
+
+        batch, self.batch = self.batch, []
+        self.batch_flusher = None
+        if not batch:
+            return
+
+        try:
+            async with self.channel_pool.acquire() as channel:
+                for queue in dict.fromkeys(queue for queue, _, _ in batch):
+                    await self.__declare_queue(channel, queue)
+                results = await asyncio.gather(
+                    *[self.__publish(channel, queue, message)
+                      for queue, message, _ in batch],
+                    return_exceptions=True
+                )
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(None)
+
+    def publish_threadsafe(
+        self,
+        queue: str,
+        message: str,
+        timeout: float = RABBITMQ_PUBLISH_TIMEOUT,
+        wait: bool = True
+    ):
+        """
+        Publishes a message from a thread that is not running the event loop,
+        blocking until the broker confirms it.
+        If not wait, the message is handed to the event loop without waiting for
+        the confirm, and the concurrent.futures.Future of the publish is returned.
+        A failed publish is then only logged.
+        """
+        if not self.loop:
+            raise RuntimeError(
+                "The producer must be connected before publishing from other threads")
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self.loop:
+            raise RuntimeError(
+                "publish_threadsafe cannot be called from the event loop, await publish instead")
+
+        future = asyncio.run_coroutine_threadsafe(
+            self.publish(queue, message), self.loop)
+        if not wait:
+            future.add_done_callback(log_publish_error)
+            return future
+        return future.result(timeout)
+
+    async def __declare_queue(self, channel: AbstractChannel, queue: str):
+        if queue not in self.declared_queues:
+            await channel.declare_queue(queue, durable=True)
+            self.declared_queues.add(queue)
+
+    async def __publish(self, channel: AbstractChannel, queue: str, message: str):
+        await channel.default_exchange.publish(
+            aio_pika.Message(body=message.encode()),
+            routing_key=queue
+        )
+
+
+def log_publish_error(future: concurrent.futures.Future):
+    if not future.cancelled() and future.exception():
+        logger.error(f"Error publishing a message: {future.exception()!r}")
 
 
+@lru_cache(maxsize=None)
 def get_rabbitmq_producer():
     client = RabbitMQProducer(
         host=RABBITMQ_HOST,
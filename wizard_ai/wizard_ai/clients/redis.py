@@ -1,22 +1,71 @@
 import os
+from functools import lru_cache
 from typing import Annotated
 
 import redis
+import redis.asyncio
 
 REDIS_HOST = os.environ.get('REDIS_HOST')
 REDIS_PASSWORD = os.environ.get('REDIS_PASSWORD')
 
+# Connection pool settings, shared by the sync and the async client.
+# When all the connections are in use, callers wait up to REDIS_POOL_TIMEOUT
+# seconds for a free one, then fail with ConnectionError.
+# The sync pool is used at the same time by all the worker pools using the sync
+# client (AGENT_WORKERS, TOOL_WORKERS, SUMMARY_WORKERS and the FastAPI
+# threadpool), so REDIS_MAX_CONNECTIONS must be at least the sum of their sizes.
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 100))
+REDIS_POOL_TIMEOUT = float(os.environ.get('REDIS_POOL_TIMEOUT', 5))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 5))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(
+    os.environ.get('REDIS_SOCKET_CONNECT_TIMEOUT', 5))
+REDIS_HEALTH_CHECK_INTERVAL = int(
+    os.environ.get('REDIS_HEALTH_CHECK_INTERVAL', 30))
 
-def get_redis_client():
+
+def get_connection_pool_kwargs() -> dict:
+    return {
+        "host": REDIS_HOST,
+        "password": REDIS_PASSWORD,
+        "max_connections": REDIS_MAX_CONNECTIONS,
+        "timeout": REDIS_POOL_TIMEOUT,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_SOCKET_CONNECT_TIMEOUT,
+        "socket_keepalive": True,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+    }
+
+
+@lru_cache(maxsize=None)
+def get_redis_client() -> redis.Redis:
+    """
+    Process-wide sync client, for the code running outside of the event loop
+    (the agent worker threads, the tools and the sync FastAPI endpoints).
+    It is thread-safe and reuses the connections of its pool.
+    """
     return redis.Redis(
-        host=REDIS_HOST,
-        password=REDIS_PASSWORD
+        connection_pool=redis.BlockingConnectionPool(
+            **get_connection_pool_kwargs())
+    )
+
+
+@lru_cache(maxsize=None)
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """
+    Process-wide async client, for the code running on the event loop.
+    """
+    return redis.asyncio.Redis(
+        connection_pool=redis.asyncio.BlockingConnectionPool(
+            **get_connection_pool_kwargs())
     )
 
 
 RedisClientDep = None
+AsyncRedisClientDep = None
 try:
     from fastapi import Depends
     RedisClientDep = Annotated[redis.Redis, Depends(get_redis_client)]
+    AsyncRedisClientDep = Annotated[redis.asyncio.Redis, Depends(
+        get_async_redis_client)]
 except ImportError:
     pass
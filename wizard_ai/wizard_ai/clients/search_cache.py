@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Query -> parsed search results. Short, as they contain prices, exchange rates, ...
+SEARCH_RESULTS_CACHE_TTL = int(os.environ.get('SEARCH_RESULTS_CACHE_TTL', 300))
+SEARCH_RESULTS_CACHE_SIZE = int(os.environ.get('SEARCH_RESULTS_CACHE_SIZE', 256))
+# Url -> main content of the page
+PAGE_CONTENT_CACHE_TTL = int(os.environ.get('PAGE_CONTENT_CACHE_TTL', 3600))
+PAGE_CONTENT_CACHE_SIZE = int(os.environ.get('PAGE_CONTENT_CACHE_SIZE', 512))
+# If set, the caches are also stored in Redis, so that they are shared by the replicas
+SEARCH_CACHE_REDIS = os.environ.get(
+    'SEARCH_CACHE_REDIS', 'false').lower() in ('1', 'true', 'yes')
+
+
+class TTLCache:
+    """
+    In-process LRU cache whose entries expire after ttl seconds,
+    optionally backed by Redis.
+
+    The values must be JSON serializable. Redis is used as a second level:
+    the entries missing in memory are looked up in Redis and kept in memory
+    for the rest of their TTL. Redis errors are logged and treated as misses.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: int,
+        max_size: int,
+        redis_client: Optional[redis.Redis] = None
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.redis_client = redis_client
+        # key -> (expiration time, value)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    return value
+                del self.entries[key]
+
+        if self.redis_client is None:
+            return None
+
+        try:
+            with self.redis_client.pipeline() as pipeline:
+                pipeline.get(self.__get_redis_key(key))
+                pipeline.ttl(self.__get_redis_key(key))
+                serialized, ttl = pipeline.execute()
+        except redis.RedisError:
+            logger.exception(f"Error reading the {self.name} cache from Redis")
+            return None
+
+        if serialized is None:
+            return None
+        value = json.loads(serialized)
+        if ttl > 0:
+            self.__set_local(key, value, ttl)
+        return value
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Returns the values found in the cache, by key."""
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def set(self, key: str, value: Any):
+        self.__set_local(key, value, self.ttl)
+
+        if self.redis_client is None:
+            return
+
+        try:
+            self.redis_client.set(
+                self.__get_redis_key(key),
+                json.dumps(value, separators=(",", ":")),
+                ex=self.ttl
+            )
+        except redis.RedisError:
+            logger.exception(f"Error writing the {self.name} cache to Redis")
+
+    def clear(self):
+        """Clears the in-process entries."""
+        with self.lock:
+            self.entries.clear()
+
+    def __set_local(self, key: str, value: Any, ttl: float):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def __get_redis_key(self, key: str) -> str:
+        # Queries and urls can be long, so they are hashed
+        return f"{self.name}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def normalize_query(query: str) -> str:
+    """Queries differing only by case and spaces share the same cache entry."""
+    return " ".join(query.lower().split())
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Maximum time to download a single page, in seconds
+CRAWL_REQUEST_TIMEOUT = float(os.environ.get('CRAWL_REQUEST_TIMEOUT', 5))
+# Maximum time of a whole crawl, in seconds: the pages not ready by then are dropped
+CRAWL_TIMEOUT = float(os.environ.get('CRAWL_TIMEOUT', 8))
+CRAWL_MAX_CONNECTIONS = int(os.environ.get('CRAWL_MAX_CONNECTIONS', 20))
+# Pages bigger than this are not parsed
+CRAWL_MAX_PAGE_SIZE = int(os.environ.get('CRAWL_MAX_PAGE_SIZE', 2 * 1024 * 1024))
+
+
+class WebCrawler:
+    """
+    Downloads web pages concurrently, meant to be shared by the whole process.
+
+    The pages are downloaded by a pooled httpx.AsyncClient running on the crawler's
+    own event loop (in a daemon thread), so the sync tools running in the agent
+    worker threads can use it through crawl_threadsafe.
+
+    :param transport: optional httpx transport, e.g. to mock the requests in tests
+    """
+
+    def __init__(
+        self,
+        request_timeout: float = CRAWL_REQUEST_TIMEOUT,
+        timeout: float = CRAWL_TIMEOUT,
+        max_connections: int = CRAWL_MAX_CONNECTIONS,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.request_timeout = request_timeout
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.transport = transport
+        self.loop = None
+        self.client = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.loop:
+                return
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=self.loop.run_forever,
+                name="web-crawler",
+                daemon=True
+            ).start()
+            asyncio.run_coroutine_threadsafe(
+                self.__create_client(), self.loop).result()
+
+    def close(self):
+        with self.lock:
+            if not self.loop:
+                return
+            asyncio.run_coroutine_threadsafe(
+                self.client.aclose(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop = None
+            self.client = None
+
+    async def __create_client(self):
+        self.client = httpx.AsyncClient(
+            timeout=self.request_timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ),
+            follow_redirects=True,
+            transport=self.transport
+        )
+
+    async def crawl(
+        self,
+        urls: List[str],
+        max_results: int,
+        extract: Callable[[str], Optional[str]],
+        headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, str]:
+        """
+        Downloads all the urls concurrently and extracts their content with extract,
+        keeping the first max_results pages that are extracted successfully.
+        The other downloads are cancelled, as well as the ones still running
+        after self.timeout seconds.
+        Returns the contents by url, in the order of urls.
+        """
+        urls = [url for url in urls if url.startswith(("http://", "https://"))]
+        if not urls or max_results <= 0:
+            return {}
+
+        tasks = {
+            asyncio.create_task(self.__get_content(url, extract, headers)): idx
+            for idx, url in enumerate(urls)
+        }
+        loop = asyncio.get_running_loop()
+        results = {}
+        pending = set(tasks)
+        deadline = loop.time() + self.timeout
+        try:
+            while pending and len(results) < max_results:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    logger.info(
+                        f"Crawl timed out, dropping {len(pending)} pages")
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    content = task.result()
+                    if content and len(results) < max_results:
+                        results[tasks[task]] = content
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return {urls[idx]: results[idx] for idx in sorted(results)}
+
+    def crawl_threadsafe(
+        self,
+        urls: List[str],
+        max_results: int,
+        extract: Callable[[str], Optional[str]],
+        headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, str]:
+        """
+        Runs crawl from a thread that is not running the crawler's event loop.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(
+            self.crawl(urls, max_results, extract, headers), self.loop
+        ).result()
+
+    async def __get_content(
+        self,
+        url: str,
+        extract: Callable[[str], Optional[str]],
+        headers: Optional[Dict[str, str]]
+    ) -> Optional[str]:
+        try:
+            # The body is streamed, so that the download of a page too big is aborted
+            async with self.client.stream("GET", url, headers=headers) as response:
+                response.raise_for_status()
+                if int(response.headers.get("content-length") or 0) > CRAWL_MAX_PAGE_SIZE:
+                    logger.info(f"Skipping {url}, page too big")
+                    return None
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body += chunk
+                    if len(body) > CRAWL_MAX_PAGE_SIZE:
+                        logger.info(f"Skipping {url}, page too big")
+                        return None
+            try:
+                text = body.decode(
+                    response.charset_encoding or "utf-8", errors="replace")
+            except LookupError:
+                # Unknown charset
+                text = body.decode("utf-8", errors="replace")
+        except httpx.HTTPError as e:
+            logger.info(f"Cannot get content from {url}: {e!r}")
+            return None
+
+        try:
+            # Parsing is CPU bound, keep it off the event loop
+            content = await asyncio.get_running_loop().run_in_executor(
+                None, extract, text)
+        except Exception as e:
+            logger.exception(f"Error getting main content from {url}: {e}")
+            return None
+
+        if content:
+            logger.info(f"Found content from {url}")
+        return content
+
+
+@lru_cache(maxsize=None)
+def get_web_crawler() -> WebCrawler:
+    return WebCrawler()
@@ -4,5 +4,10 @@ from enum import Enum
 
 class RedisKeys(Enum):
     AGENT_STATE = "AGENT_STATE"
+    HISTORY = "HISTORY"
+    SUMMARY = "SUMMARY"
+    SUMMARY_LOCK = "SUMMARY_LOCK"
     GOOGLE_CREDENTIALS = "GOOGLE_CREDENTIALS"
     GOOGLE_STATE_TOKEN = "GOOGLE_STATE_TOKEN"
+    SEARCH_RESULTS = "SEARCH_RESULTS"
+    PAGE_CONTENT = "PAGE_CONTENT"
@@ -2,8 +2,9 @@ import logging
 
 from fastapi import APIRouter, HTTPException
 
-from wizard_ai.clients import RedisClientDep
-from wizard_ai.constants import RedisKeys
+from wizard_ai.clients import AsyncRedisClientDep
+from wizard_ai.conversational_engine.form_agent import \
+    delete_stored_agent_state
 
 logger = logging.getLogger(__name__)
 
@@ -12,22 +13,19 @@ conversations_router = APIRouter(prefix="/conversations")
 
 
 @conversations_router.delete("/")
-def delete_conversations(redis_client: RedisClientDep):
+async def delete_conversations(redis_client: AsyncRedisClientDep):
     """Delete all conversations"""
-    redis_client.flushdb()
+    await redis_client.flushdb()
     return {"content": None}
 
 
 @conversations_router.delete("/{chat_id}")
-async def chat(chat_id: str, redis_client: RedisClientDep):
+async def chat(chat_id: str, redis_client: AsyncRedisClientDep):
     """Delete a conversation"""
 
-    if not redis_client.exists(chat_id):
+    if not await redis_client.exists(chat_id):
         raise HTTPException(status_code=404, detail="Item not found")
 
-    redis_client.hdel(
-        chat_id,
-        RedisKeys.AGENT_STATE.value
-    )
+    await delete_stored_agent_state(redis_client, chat_id)
     logger.info(f"Deleted conversation {chat_id}")
     return {"content": "Conversation deleted"}
@@ -142,8 +142,9 @@ def callback(
         pickle.dumps(credentials)
     )
 
-    # Publish a message to the RabbitMQ queue
-    rabbitmq_client.publish(
+    # Publish a message to the RabbitMQ queue. The endpoint runs in the
+    # FastAPI thread pool, so the thread-safe publish is used
+    rabbitmq_client.publish_threadsafe(
         queue=MessageQueues.WIZARD_AI_OUT.value,
         message=json.dumps({
             "type": MessageType.TEXT.value,
@@ -1,5 +1,11 @@
 from .form_tool import *
+from .field_extractors import *
 from .form_agent_executor import *
 from .model_factory import *
+from .prompt_budget import *
 from .form_tool_executor import *
-from .memory import get_stored_agent_state, store_agent_state
+from .tool_registry import *
+from .memory import (delete_stored_agent_state, get_stored_agent_state,
+                     store_agent_state)
+from .summary_memory import (MEMORY_MODE, SUMMARY_WORKERS,
+                             summarize_history)
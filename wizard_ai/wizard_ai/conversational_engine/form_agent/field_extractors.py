@@ -0,0 +1,339 @@
+import json
+import os
+import re
+import typing
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Literal, Optional, Sequence, Union
+
+from dateutil import parser as date_parser
+from langchain.agents.output_parsers.openai_tools import \
+    OpenAIToolAgentAction
+from langchain_core.agents import AgentFinish
+from langchain_core.messages import AIMessage
+from pydantic.fields import FieldInfo
+
+from wizard_ai.conversational_engine.form_agent.form_tool import (
+    AgentState, FormTool, FormToolConfirmPayload, FormToolState)
+
+# If set, the unambiguous replies to a form question fill the form without calling the LLM
+LOCAL_FIELD_EXTRACTION = os.environ.get(
+    "LOCAL_FIELD_EXTRACTION", "true").lower() in ("1", "true", "yes")
+
+# Log of the actions built by the local extractors, instead of the LLM
+LOCAL_EXTRACTION_LOG = "Value extracted from the user reply without the LLM"
+
+# Returned by the extractors when the reply is not a value of the field, or is ambiguous
+NOT_EXTRACTED = object()
+
+YES_WORDS = {"yes", "y", "yeah", "yep", "sure", "ok", "okay", "correct", "confirm", "true"}
+NO_WORDS = {"no", "n", "nope", "false"}
+ARTICLES = {"a", "an", "the", "some"}
+WEEKDAYS = ["monday", "tuesday", "wednesday",
+            "thursday", "friday", "saturday", "sunday"]
+RELATIVE_DAYS = {"today": 0, "tomorrow": 1,
+                 "the day after tomorrow": 2, "yesterday": -1}
+
+EMAIL_REGEX = re.compile(r"[\w.+-]+@[\w-]+(\.[\w-]+)+")
+INT_REGEX = re.compile(r"[+-]?\d+")
+TIME_REGEX = re.compile(
+    r"(?:at\s+)?(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<period>am|pm)?")
+# "next friday" is left to the LLM: it can mean this friday or the one after
+RELATIVE_DATE_REGEX = re.compile(
+    r"(?P<day>the day after tomorrow|today|tomorrow|yesterday|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday)"
+    r"(?:\s+(?P<time>.+))?")
+ISO_DATE_REGEX = re.compile(r"\d{4}-\d{2}-\d{2}\b")
+# Day and month both <= 12 and different, e.g. 03/04: the order is ambiguous
+AMBIGUOUS_NUMERIC_DATE_REGEX = re.compile(
+    r"\b(0?[1-9]|1[0-2])[/.-](0?[1-9]|1[0-2])\b")
+
+
+class FieldExtractor(ABC):
+    """
+    Parses the reply of the user to the question about a form field.
+    Extractors are strict: they return NOT_EXTRACTED unless the whole reply is a
+    value of the field, so that anything else (several values, corrections,
+    questions) is left to the LLM.
+    """
+
+    @abstractmethod
+    def extract(
+        self,
+        reply: str,
+        field_name: str,
+        field_info: FieldInfo
+    ) -> Any:
+        pass
+
+
+class IntExtractor(FieldExtractor):
+    def extract(self, reply, field_name, field_info):
+        if get_field_type(field_info) is not int:
+            return NOT_EXTRACTED
+        text = normalize_reply(reply)
+        if not INT_REGEX.fullmatch(text):
+            return NOT_EXTRACTED
+        return int(text)
+
+
+class BoolExtractor(FieldExtractor):
+    def extract(self, reply, field_name, field_info):
+        if get_field_type(field_info) is not bool:
+            return NOT_EXTRACTED
+        text = normalize_reply(reply)
+        if text in YES_WORDS:
+            return True
+        if text in NO_WORDS:
+            return False
+        return NOT_EXTRACTED
+
+
+class LiteralExtractor(FieldExtractor):
+    def extract(self, reply, field_name, field_info):
+        field_type = get_field_type(field_info)
+        if typing.get_origin(field_type) is not Literal:
+            return NOT_EXTRACTED
+        words = [word for word in normalize_reply(
+            reply).split() if word not in ARTICLES]
+        text = " ".join(words)
+        for choice in typing.get_args(field_type):
+            if isinstance(choice, str) and text in (choice.lower(), f"{choice.lower()}s"):
+                return choice
+        return NOT_EXTRACTED
+
+
+class EmailExtractor(FieldExtractor):
+    """Fills the str fields that expect an email address, by name or description."""
+
+    def extract(self, reply, field_name, field_info):
+        if get_field_type(field_info) is not str:
+            return NOT_EXTRACTED
+        description = (field_info.description or "").lower()
+        if "email" not in field_name.lower() and "email" not in description:
+            return NOT_EXTRACTED
+        text = reply.strip().rstrip(".")
+        if not EMAIL_REGEX.fullmatch(text):
+            return NOT_EXTRACTED
+        return text
+
+
+class DateTimeExtractor(FieldExtractor):
+    """
+    Understands relative expressions ("tomorrow at 3pm", "friday 10:30")
+    and dates with a day and a month ("2024-03-20 15:00", "20 March").
+    Dates whose day and month could be swapped are ambiguous, and so are the
+    replies without a day or a month ("2024", "May").
+    """
+
+    def __init__(self, now: Optional[callable] = None):
+        self.now = now or datetime.now
+
+    def extract(self, reply, field_name, field_info):
+        if get_field_type(field_info) is not datetime:
+            return NOT_EXTRACTED
+        text = normalize_reply(reply)
+        value = self.__extract_relative(text)
+        if value is NOT_EXTRACTED:
+            value = self.__extract_absolute(text)
+        if value is NOT_EXTRACTED:
+            return NOT_EXTRACTED
+        return value.isoformat()
+
+    def __extract_relative(self, text: str) -> Any:
+        match = RELATIVE_DATE_REGEX.fullmatch(text)
+        if not match:
+            return NOT_EXTRACTED
+
+        today = self.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        day = match.group("day")
+        if day in RELATIVE_DAYS:
+            date = today + timedelta(days=RELATIVE_DAYS[day])
+        else:
+            weekday = WEEKDAYS.index(day)
+            days_ahead = (weekday - today.weekday()) % 7 or 7
+            date = today + timedelta(days=days_ahead)
+
+        if not match.group("time"):
+            return date
+        time = parse_time(match.group("time"))
+        if time is NOT_EXTRACTED:
+            return NOT_EXTRACTED
+        return date.replace(hour=time[0], minute=time[1])
+
+    def __extract_absolute(self, text: str) -> Any:
+        iso_date = bool(ISO_DATE_REGEX.match(text))
+        if not iso_date:
+            if AMBIGUOUS_NUMERIC_DATE_REGEX.search(text):
+                return NOT_EXTRACTED
+            # A date needs a year or a month name: "5" or "3pm" alone are not dates
+            if not re.search(r"\d{4}|[a-z]{3,}", text):
+                return NOT_EXTRACTED
+        today = self.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        try:
+            # dateutil fills the missing parts from the default: if two defaults
+            # give different days, the reply doesn't have a day and a month
+            values = [
+                date_parser.parse(
+                    text, default=default, dayfirst=not iso_date)
+                for default in (today.replace(month=1, day=1),
+                                today.replace(month=12, day=28))
+            ]
+        except (ValueError, OverflowError):
+            return NOT_EXTRACTED
+        if values[0] != values[1]:
+            return NOT_EXTRACTED
+        return values[0]
+
+
+DEFAULT_FIELD_EXTRACTORS: Sequence[FieldExtractor] = (
+    IntExtractor(),
+    BoolExtractor(),
+    LiteralExtractor(),
+    EmailExtractor(),
+    DateTimeExtractor()
+)
+
+
+def normalize_reply(reply: str) -> str:
+    return " ".join(reply.lower().strip().rstrip(".!").split())
+
+
+def parse_time(text: str) -> Any:
+    """Returns (hour, minute) or NOT_EXTRACTED."""
+    if text in ("noon", "at noon"):
+        return 12, 0
+    if text in ("midnight", "at midnight"):
+        return 0, 0
+    match = TIME_REGEX.fullmatch(text)
+    if not match:
+        return NOT_EXTRACTED
+    hour = int(match.group("hour"))
+    minute = int(match.group("minute") or 0)
+    period = match.group("period")
+    if period:
+        if not 1 <= hour <= 12:
+            return NOT_EXTRACTED
+        hour = hour % 12 + (12 if period == "pm" else 0)
+    elif not match.group("minute"):
+        # "tomorrow 3": morning or afternoon?
+        return NOT_EXTRACTED
+    if hour > 23 or minute > 59:
+        return NOT_EXTRACTED
+    return hour, minute
+
+
+def get_field_type(field_info: FieldInfo) -> Any:
+    """The type of the field, without Optional."""
+    field_type = field_info.annotation
+    if typing.get_origin(field_type) is Union:
+        args = [arg for arg in typing.get_args(
+            field_type) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return field_type
+
+
+def get_field_to_collect(form_tool: FormTool) -> Optional[tuple]:
+    """Returns (field name, field info) of the value the user was asked for."""
+    if form_tool.state == FormToolState.FILLED:
+        return "confirm", FormToolConfirmPayload.model_fields["confirm"]
+    if form_tool.state != FormToolState.ACTIVE:
+        return None
+    field_name = form_tool.get_next_field_to_collect()
+    field_info = form_tool.args_schema_.model_fields.get(
+        field_name) if field_name else None
+    if field_info is None:
+        return None
+    return field_name, field_info
+
+
+def extract_form_action(
+    state: AgentState,
+    extractors: Sequence[FieldExtractor] = DEFAULT_FIELD_EXTRACTORS
+) -> Optional[OpenAIToolAgentAction]:
+    """
+    Returns the action filling the field the user was asked for, if the user
+    input is an unambiguous value of it. Only the first agent step of a turn,
+    without errors, is handled.
+    """
+    form_tool = state.get("active_form_tool")
+    if not form_tool or state.get("intermediate_steps") or state.get("error") or not state.get("input"):
+        return None
+
+    field = get_field_to_collect(form_tool)
+    if field is None:
+        return None
+    field_name, field_info = field
+
+    for extractor in extractors:
+        value = extractor.extract(state["input"], field_name, field_info)
+        if value is NOT_EXTRACTED:
+            continue
+        # get_next_field_to_collect treats the falsy values (0, False) as missing,
+        # so the same question would be asked again: the LLM handles them
+        if not value and field_name != "confirm":
+            return None
+        return build_tool_call_action(form_tool.name, {field_name: value})
+    return None
+
+
+def build_tool_call_action(tool: str, tool_input: dict) -> OpenAIToolAgentAction:
+    """
+    Builds the action as if the LLM had called the tool, so that if the LLM takes
+    over later in the turn, the scratchpad shows the tool call and its output.
+    """
+    tool_call_id = f"call_{uuid.uuid4().hex}"
+    message = AIMessage(content="", additional_kwargs={"tool_calls": [{
+        "id": tool_call_id,
+        "type": "function",
+        "function": {"name": tool, "arguments": json.dumps(tool_input)}
+    }]})
+    return OpenAIToolAgentAction(
+        tool=tool,
+        tool_input=tool_input,
+        log=LOCAL_EXTRACTION_LOG,
+        message_log=[message],
+        tool_call_id=tool_call_id
+    )
+
+
+def build_form_question(state: AgentState) -> Optional[AgentFinish]:
+    """
+    After a local extraction, asks the next question of the form without the LLM.
+    Returns None if the extraction failed or the form is not waiting for a field
+    anymore (e.g. the user didn't confirm), so that the LLM takes over.
+    """
+    steps = state.get("intermediate_steps") or []
+    form_tool = state.get("active_form_tool")
+    if (len(steps) != 1 or steps[0][0].log != LOCAL_EXTRACTION_LOG
+            or state.get("error") or not form_tool):
+        return None
+
+    if form_tool.state == FormToolState.FILLED:
+        information = "\n".join(
+            f"- {name}: {value}"
+            for name, value in form_tool.form.model_dump().items()
+            if value and not name.endswith("_")
+        )
+        question = f"Please confirm the information:\n{information}\nIs it correct?"
+    elif form_tool.state == FormToolState.ACTIVE and steps[0][0].tool_input.get("confirm") is not False:
+        field = get_field_to_collect(form_tool)
+        if field is None:
+            return None
+        field_name, field_info = field
+        question = f"Please provide the {describe_field(field_name, field_info)}."
+    else:
+        return None
+
+    return AgentFinish(return_values={"output": question}, log=LOCAL_EXTRACTION_LOG)
+
+
+def describe_field(field_name: str, field_info: FieldInfo) -> str:
+    description = field_info.description or field_name.replace("_", " ")
+    description = description[0].lower() + description[1:]
+    field_type = get_field_type(field_info)
+    if typing.get_origin(field_type) is Literal:
+        description += f" (one of {', '.join(map(str, typing.get_args(field_type)))})"
+    return description
@@ -1,41 +1,80 @@
+import concurrent.futures
+import contextvars
 import logging
+import os
 import pprint
+import time
 import traceback
-from typing import Any, Sequence, Type
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Sequence, Tuple, Type
 
 from langchain.tools import BaseTool
 from langchain_core.agents import AgentAction, AgentFinish
 from langchain_core.exceptions import OutputParserException
 from langchain_core.language_models.chat_models import *
 from langchain_core.messages import FunctionMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, StateGraph
 
+from wizard_ai.conversational_engine.form_agent.field_extractors import (
+    DEFAULT_FIELD_EXTRACTORS, LOCAL_FIELD_EXTRACTION, FieldExtractor,
+    build_form_question, extract_form_action)
 from wizard_ai.conversational_engine.form_agent.form_tool import (
     AgentState, FormReset, FormTool, FormToolOutcome)
 from wizard_ai.conversational_engine.form_agent.form_tool_executor import \
     FormToolExecutor
 from wizard_ai.conversational_engine.form_agent.model_factory import \
     ModelFactory
+from wizard_ai.conversational_engine.form_agent.tool_registry import \
+    ToolRegistry
 
 logger = logging.getLogger(__name__)
 pp = pprint.PrettyPrinter(indent=4)
 
+# Maximum number of non-form tool calls executed at the same time, across all the chats
+TOOL_WORKERS = int(os.environ.get("TOOL_WORKERS", 16))
+# Maximum time of the non-form tool calls of an agent outcome, in seconds.
+# A call that takes longer fails with a TimeoutError, but its thread runs to the end
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", 60))
+
+tool_executor_pool = ThreadPoolExecutor(
+    max_workers=TOOL_WORKERS,
+    thread_name_prefix="tool"
+)
 
-class FormAgentExecutor(StateGraph):
 
-    MAX_INTERMEDIATE_STEPS = 5
+class FormAgentExecutor(StateGraph):
+    """
+    The graph is compiled once and can be shared by all the chats.
+    Per-chat data is passed when running it: the active form tool in the state,
+    the chat_id and the tool callbacks in config["configurable"], e.g.
+
+        graph.app.stream(inputs, config={"configurable": {
+            "chat_id": chat_id,
+            "on_tool_start": on_tool_start,
+            "on_tool_end": on_tool_end
+        }})
+
+    The callbacks passed to the constructor are used when the config doesn't set them.
+    If the config sets on_text_delta, the text generated by the LLM is streamed to it
+    (see call_llm). If it sets a metrics dict, the prompt sizes are reported
+    in it (see assemble_prompt_inputs).
+    """
 
     def __init__(
         self,
         tools: Sequence[Type[Any]] = [],
         on_tool_start: callable = None,
         on_tool_end: callable = None,
+        field_extractors: Sequence[FieldExtractor] = DEFAULT_FIELD_EXTRACTORS if LOCAL_FIELD_EXTRACTION else (),
     ) -> None:
         super().__init__(AgentState)
 
         self._on_tool_start = on_tool_start
         self._on_tool_end = on_tool_end
         self._tools = tools
+        self.field_extractors = field_extractors
+        self.tool_registry = ToolRegistry(tools)
         self.__build_graph()
 
     def __build_graph(self):
@@ -66,15 +105,20 @@ class FormAgentExecutor(StateGraph):
         self.set_entry_point("agent")
         self.app = self.compile()
 
+    @property
+    def tools(self) -> Sequence[BaseTool]:
+        """All the registered tools, with the form tools in their inactive state."""
+        return self._tools
+
     def get_tools(self, state: AgentState):
-        return filter_active_tools(self._tools[:], state)
+        return self.tool_registry.get_tool_set(state).tools
 
     def get_tool_by_name(self, name: str, agent_state: AgentState):
-        return next((tool for tool in self.get_tools(
-            agent_state) if tool.name == name), None)
+        return self.tool_registry.get_tool_set(
+            agent_state).tools_by_name.get(name)
 
     def get_tool_executor(self, state: AgentState):
-        return FormToolExecutor(self.get_tools(state))
+        return self.tool_registry.get_tool_set(state).executor
 
     def should_continue_after_agent(self, state: AgentState):
         if state.get("error"):
@@ -98,16 +142,38 @@ class FormAgentExecutor(StateGraph):
             tools=self.get_tools(state)
         )
 
+    def get_local_agent_outcome(self, state: AgentState):
+        """
+        While a form is filled, an unambiguous reply (a number, a date, yes/no, ...)
+        updates the form and the next question is asked without calling the LLM.
+        Returns None when the LLM is needed.
+        """
+        if not self.field_extractors:
+            return None
+        action = extract_form_action(state, self.field_extractors)
+        if action:
+            return [action]
+        return build_form_question(state)
+
     # Define the function that calls the model
-    def call_agent(self, state: AgentState):
-        try:
-            # Cap the number of intermediate steps in a prompt to 5
-            if len(state.get("intermediate_steps")
-                   ) > self.MAX_INTERMEDIATE_STEPS:
-                state["intermediate_steps"] = state.get(
-                    "intermediate_steps")[-self.MAX_INTERMEDIATE_STEPS:]
+    def call_agent(self, state: AgentState, config: RunnableConfig = None):
+        agent_outcome = self.get_local_agent_outcome(state)
+        if agent_outcome is not None:
+            metrics = get_configurable(config).get("metrics")
+            if metrics is not None:
+                metrics["local_agent_steps"] = metrics.get(
+                    "local_agent_steps", 0) + 1
+            return {
+                "agent_outcome": agent_outcome,
+                "tool_choice": None,
+                "tool_outcome": None,
+                "error": None
+            }
 
-            agent_outcome = self.build_model(state=state).invoke(state)
+        try:
+            # The intermediate steps and the chat history in the prompt are
+            # capped by the token budget of the model (see fit_prompt_to_budget)
+            agent_outcome = self.build_model(state=state).invoke(state, config)
 
             updates = {
                 "agent_outcome": agent_outcome,
@@ -122,55 +188,130 @@ class FormAgentExecutor(StateGraph):
             updates = {"error": str(e)}
             return updates
 
-    def on_tool_start(self, tool: BaseTool, tool_input: dict):
-        if self._on_tool_start:
-            self._on_tool_start(tool, tool_input)
-
-    def on_tool_end(self, tool: BaseTool, tool_output: Any):
-        if self._on_tool_end:
-            self._on_tool_end(tool, tool_output)
-
-    def call_tool(self, state: AgentState):
-        try:
-            actions = state.get("agent_outcome")
-            intermediate_steps = []
-
-            for action in actions:
-                tool = self.get_tool_by_name(action.tool, state)
-
-                self.on_tool_start(tool=tool, tool_input=action.tool_input)
-                tool_outcome = self.get_tool_executor(state).invoke(action)
-                self.on_tool_end(tool=tool, tool_output=tool_outcome.output)
-
-                intermediate_steps.append(
-                    (
-                        action,
-                        FunctionMessage(
-                            content=str(tool_outcome.output),
-                            name=action.tool
-                        )
-                    )
+    def on_tool_start(
+        self,
+        tool: BaseTool,
+        tool_input: dict,
+        config: RunnableConfig = None
+    ):
+        on_tool_start = get_configurable(config).get(
+            "on_tool_start", self._on_tool_start)
+        if on_tool_start:
+            on_tool_start(tool, tool_input)
+
+    def on_tool_end(
+        self,
+        tool: BaseTool,
+        tool_output: Any,
+        config: RunnableConfig = None
+    ):
+        on_tool_end = get_configurable(config).get(
+            "on_tool_end", self._on_tool_end)
+        if on_tool_end:
+            on_tool_end(tool, tool_output)
+
+    def call_tool(self, state: AgentState, config: RunnableConfig = None):
+        """
+        Executes the actions of the agent outcome.
+        The actions of the non-form tools are independent, so they run concurrently
+        in tool_executor_pool, while the form tool actions, which update the form
+        in the state, run one at a time in this thread.
+        The intermediate steps are in the order of the actions, and an error of an
+        action doesn't prevent the others from running.
+        """
+        actions = state.get("agent_outcome")
+        tool_executor = self.get_tool_executor(state)
+
+        futures = {}
+        deadline = time.monotonic() + TOOL_TIMEOUT
+        for idx, action in enumerate(actions):
+            if is_concurrent_tool(self.get_tool_by_name(action.tool, state)):
+                # The context holds the runnable config, which the tools read
+                futures[idx] = tool_executor_pool.submit(
+                    contextvars.copy_context().run,
+                    self.run_action, tool_executor, action, state, config
                 )
 
-            updates = {
-                **tool_outcome.state_update,
-                "intermediate_steps": intermediate_steps,
-                "tool_outcome": tool_outcome, # this isn't really correct with multiple tools
-                "agent_outcome": None,
-                "error": None
-            }
+        outcomes = []
+        for idx, action in enumerate(actions):
+            try:
+                if idx in futures:
+                    try:
+                        tool_outcome = futures[idx].result(
+                            timeout=max(deadline - time.monotonic(), 0))
+                    except concurrent.futures.TimeoutError:
+                        futures[idx].cancel()
+                        raise TimeoutError(
+                            f"{action.tool} took more than {TOOL_TIMEOUT:g} seconds")
+                else:
+                    tool_outcome = self.run_action(
+                        tool_executor, action, state, config)
+                outcomes.append((action, tool_outcome, None))
+            except Exception as e:
+                traceback.print_exc()
+                outcomes.append((action, None, e))
+
+        return self.merge_tool_outcomes(outcomes)
+
+    def run_action(
+        self,
+        tool_executor: FormToolExecutor,
+        action: AgentAction,
+        state: AgentState,
+        config: RunnableConfig = None
+    ) -> FormToolOutcome:
+        tool = self.get_tool_by_name(action.tool, state)
+        self.on_tool_start(
+            tool=tool, tool_input=action.tool_input, config=config)
+        if tool is not None and tool is state.get("active_form_tool"):
+            # The executor is shared by the chats, it doesn't hold their form tools
+            tool_outcome = tool_executor.run_tool(tool, action.tool_input)
+        else:
+            tool_outcome = tool_executor.invoke(action)
+        self.on_tool_end(
+            tool=tool, tool_output=tool_outcome.output, config=config)
+        return tool_outcome
 
-        except Exception as e:
-            traceback.print_exc()
-            updates = {
-                "intermediate_steps": [(action, FunctionMessage(
-                    content=f"{type(e).__name__}: {str(e)}",
-                    name=action.tool
-                ))],
-                "error": str(e)
+    def merge_tool_outcomes(
+        self,
+        outcomes: List[Tuple[AgentAction, Optional[FormToolOutcome], Optional[Exception]]]
+    ) -> dict:
+        """
+        Merges the outcomes of the actions, in their order: the state updates are
+        applied one after the other, the last outcome is the tool_outcome and the
+        first error, if any, is the error.
+        The state updates of the successful actions are kept even if another
+        action failed: e.g. a finalized form must not stay active, or the agent
+        could finalize it again.
+        """
+        state_update = {}
+        intermediate_steps = []
+        tool_outcome = None
+        error = None
+        for action, outcome, exception in outcomes:
+            if exception is not None:
+                content = f"{type(exception).__name__}: {str(exception)}"
+                error = error or str(exception) or content
+            else:
+                content = str(outcome.output)
+                state_update.update(outcome.state_update or {})
+                tool_outcome = outcome
+            intermediate_steps.append(
+                (action, FunctionMessage(content=content, name=action.tool)))
+
+        if error:
+            return {
+                **state_update,
+                "intermediate_steps": intermediate_steps,
+                "error": error
             }
-        finally:
-            return updates
+        return {
+            **state_update,
+            "intermediate_steps": intermediate_steps,
+            "tool_outcome": tool_outcome,
+            "agent_outcome": None,
+            "error": None
+        }
 
     def parse_output(self, graph_output: dict) -> str:
         """
@@ -189,21 +330,11 @@ class FormAgentExecutor(StateGraph):
 
         return output
 
-def filter_active_tools(
-    tools: Sequence[BaseTool],
-    context: AgentState
-):
-    """
-    Form tools are replaced by their activators if they are not active.
-    """
-    if context.get("active_form_tool"):
-        # If a form_tool is active, it is the only form tool available
-        base_tools = [
-            tool for tool in tools if not isinstance(
-                tool, FormTool)]
-        tools = [
-            *base_tools,
-            context.get("active_form_tool"),
-            FormReset(context=context)
-        ]
-    return tools
\ No newline at end of file
+
+def is_concurrent_tool(tool: Optional[BaseTool]) -> bool:
+    """The form tools change the state of the chat, so they are never run concurrently."""
+    return tool is not None and not isinstance(tool, (FormTool, FormReset))
+
+
+def get_configurable(config: RunnableConfig = None) -> dict:
+    return (config or {}).get("configurable") or {}
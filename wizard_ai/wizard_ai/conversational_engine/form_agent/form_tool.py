@@ -2,6 +2,7 @@ import json
 import operator
 from abc import ABC, abstractmethod
 from enum import Enum
+from functools import lru_cache
 from typing import (Annotated, Any, Dict, Optional, Type, TypedDict,
                     Union)
 
@@ -54,9 +55,12 @@ class FormToolOutcome(BaseModel):
         self.state_update = kwargs
 
 
+@lru_cache(maxsize=None)
 def make_optional_model(original_model: BaseModel) -> BaseModel:
     """
     Takes a Pydantic model and returns a new model with all attributes optional.
+    The optional model is built once per original model and then reused,
+    as creating pydantic classes is expensive.
     """
     optional_attributes = {
         attr_name: (
@@ -96,6 +100,16 @@ class FormTool(StructuredTool, ABC):
         self.description_ = None
         self.init_state()
 
+    def copy(self, *, update: Optional[Dict[str, Any]] = None, **kwargs) -> "FormTool":
+        # The callbacks of BaseTool are excluded from serialization, so pydantic
+        # doesn't copy them either, but they are needed to run the tool
+        update = {
+            "callbacks": self.callbacks,
+            "callback_manager": self.callback_manager,
+            **(update or {})
+        }
+        return super().copy(update=update, **kwargs)
+
     def init_state(self):
         state_initializer = {
             None: self.enter_inactive_state,
@@ -127,6 +141,8 @@ class FormTool(StructuredTool, ABC):
             self.form = self.args_schema()
         elif isinstance(self.form, str):
             self.form = self.args_schema(**json.loads(self.form))
+        elif isinstance(self.form, dict):
+            self.form = self.args_schema(**self.form)
 
     def enter_filled_state(self):
         self.state = FormToolState.FILLED
@@ -137,6 +153,8 @@ class FormTool(StructuredTool, ABC):
             self.form = self.args_schema()
         elif isinstance(self.form, str):
             self.form = self.args_schema(**json.loads(self.form))
+        elif isinstance(self.form, dict):
+            self.form = self.args_schema(**self.form)
         self.args_schema = FormToolConfirmPayload
 
     def activate(
@@ -145,11 +163,14 @@ class FormTool(StructuredTool, ABC):
         run_manager: Optional[CallbackManagerForToolRun] = None,
         **kwargs
     ) -> FormToolOutcome:
-        self.enter_active_state()
+        # The inactive tool is shared by all the chats, so the form is filled
+        # on a copy owned by the chat
+        form_tool = self.copy()
+        form_tool.enter_active_state()
         return FormToolOutcome(
-            output=f"Starting form {self.name}. If the user as already provided some information, call {self.name}.",
-            active_form_tool=self,
-            tool_choice=self.name
+            output=f"Starting form {form_tool.name}. If the user as already provided some information, call {form_tool.name}.",
+            active_form_tool=form_tool,
+            tool_choice=form_tool.name
         )
 
     def update(
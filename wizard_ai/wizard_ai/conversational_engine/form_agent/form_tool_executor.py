@@ -19,11 +19,22 @@ class FormToolExecutor(ToolExecutor):
             )
         else:
             tool = self.tool_map[tool_invocation.tool]
-            output = tool.invoke(
-                tool_invocation.tool_input,
-                agent_state=agent_state)
-            output = self._parse_tool_outcome(output, tool)
-            return output
+            return self.run_tool(tool, tool_invocation.tool_input, agent_state)
+
+    def run_tool(
+        self,
+        tool: BaseTool,
+        tool_input: Union[str, dict],
+        agent_state: AgentState = None
+    ) -> FormToolOutcome:
+        """
+        Runs a tool, even if it is not in the tool map: the active form tool of a
+        chat is not, as the executor is shared by all the chats.
+        """
+        output = tool.invoke(
+            tool_input,
+            agent_state=agent_state)
+        return self._parse_tool_outcome(output, tool)
 
     def _parse_tool_outcome(
         self,
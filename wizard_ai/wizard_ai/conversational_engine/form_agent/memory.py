@@ -1,28 +1,61 @@
+import json
 import logging
 import os
-import pickle
-from typing import Dict, Optional, Union
+from typing import Dict, Optional, Sequence, Union
 
 import redis
+import redis.asyncio
 from langchain.memory import ConversationBufferWindowMemory
 from langchain.memory.chat_memory import BaseChatMemory
+from langchain_core.messages import (AIMessage, BaseMessage, HumanMessage,
+                                     SystemMessage)
+from langchain_core.tools import BaseTool
+from pydantic import ValidationError
 
 from wizard_ai.constants import RedisKeys
-from wizard_ai.conversational_engine.form_agent.form_tool import AgentState, FormTool
+from wizard_ai.conversational_engine.form_agent.form_tool import (
+    FormTool, FormToolState)
 
 logger = logging.getLogger(__name__)
 
-HISTORY_LENGTH = os.getenv("HISTORY_LENGTH", 20)
+# Number of human/AI message pairs kept in the conversation history
+HISTORY_LENGTH = int(os.getenv("HISTORY_LENGTH", 20))
+
+# Version of the serialized agent state. It must be increased when the format changes:
+# states stored with a different version are discarded
+STORED_AGENT_STATE_VERSION = 2
+
+MESSAGE_CLASSES = {
+    "human": HumanMessage,
+    "ai": AIMessage,
+    "system": SystemMessage
+}
 
 
 class StoredAgentState:
+    """
+    The state of a chat is stored in Redis in two parts:
+    - the conversation history, as a list capped to the last HISTORY_LENGTH pairs
+      of messages (key "{chat_id}:HISTORY"), which is only appended to
+    - the active form tool, as a small JSON in the AGENT_STATE field of the chat hash
+
+    With the summary memory (see summary_memory), the older messages of the history
+    are folded into a summary, in the SUMMARY field of the chat hash.
+    """
+
     memory: Optional[BaseChatMemory]
     active_form_tool: Optional[Union[Dict, FormTool]]
+    # Number of messages of the memory that are already stored in Redis
+    stored_messages: int
+    # Summary of the messages removed from the history
+    summary: Optional[str]
 
     def __init__(
         self,
         memory: Optional[BaseChatMemory] = None,
-        active_form_tool: Union[Dict, FormTool] = None
+        active_form_tool: Union[Dict, FormTool] = None,
+        stored_messages: int = 0,
+        summary: Optional[str] = None
     ) -> None:
 
         if memory is None:
@@ -37,53 +70,183 @@ class StoredAgentState:
 
         self.memory = memory
         self.active_form_tool = active_form_tool
-
-    def to_pickle(self):
+        self.stored_messages = stored_messages
+        self.summary = summary
+
+    def get_new_messages(self) -> list[BaseMessage]:
+        """Returns the messages added to the memory since it was loaded."""
+        return self.memory.chat_memory.messages[self.stored_messages:]
+
+    def get_chat_history(self) -> list[BaseMessage]:
+        """The messages in the memory window, preceded by the summary of the older ones."""
+        chat_history = [*self.memory.buffer]
+        if self.summary:
+            chat_history.insert(0, SystemMessage(
+                content=f"Summary of the earlier conversation:\n{self.summary}"))
+        return chat_history
+
+    def to_json(self) -> str:
+        """
+        Serializes the active form tool in a compact JSON, e.g.
+
+            {
+                "version": 2,
+                "active_form_tool": {"name": "GmailSender", "state": "ACTIVE", "form": {...}}
+            }
+        """
+        active_form_tool = None
         if self.active_form_tool:
-            self.active_form_tool.form = self.active_form_tool.form.model_dump_json()
-            self.active_form_tool.args_schema = self.active_form_tool.args_schema_
-            self.active_form_tool.args_schema_ = None
-        return pickle.dumps(self)
+            active_form_tool = {
+                "name": self.active_form_tool.name_,
+                "state": self.active_form_tool.state.value,
+                "form": self.active_form_tool.form.model_dump(mode="json")
+            }
+
+        return json.dumps({
+            "version": STORED_AGENT_STATE_VERSION,
+            "active_form_tool": active_form_tool
+        }, separators=(",", ":"))
 
     @staticmethod
-    def from_pickle(pickled: str):
-        stored_agent_state = pickle.loads(pickled)
-        if stored_agent_state.active_form_tool:
-            stored_agent_state.active_form_tool.args_schema_ = stored_agent_state.active_form_tool.args_schema
-            stored_agent_state.active_form_tool.init_state()
+    def from_json(
+        serialized: Union[str, bytes],
+        tools: Sequence[BaseTool] = []
+    ) -> "StoredAgentState":
+        """
+        Loads a state serialized with to_json.
+        The active form tool is rebuilt from the form tool with the same name in tools.
+        """
+        data = json.loads(serialized)
+
+        stored_agent_state = StoredAgentState()
+        if data.get("version") != STORED_AGENT_STATE_VERSION:
+            logger.warning(
+                f"Discarding agent state with version {data.get('version')}")
+            return stored_agent_state
+
+        if data.get("active_form_tool"):
+            stored_agent_state.active_form_tool = restore_form_tool(
+                data["active_form_tool"], tools)
         return stored_agent_state
 
 
+def message_to_json(message: BaseMessage) -> str:
+    return json.dumps(
+        {"role": message.type, "content": message.content},
+        separators=(",", ":")
+    )
+
+
+def message_from_json(serialized: Union[str, bytes]) -> Optional[BaseMessage]:
+    message = json.loads(serialized)
+    message_class = MESSAGE_CLASSES.get(message["role"])
+    return message_class(content=message["content"]) if message_class else None
+
+
+def get_history_key(chat_id: str) -> str:
+    return f"{chat_id}:{RedisKeys.HISTORY.value}"
+
+
+def decode(value: Union[str, bytes, None]) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def restore_form_tool(
+    data: dict,
+    tools: Sequence[BaseTool]
+) -> Optional[FormTool]:
+    """
+    Rebuilds the active form tool of a chat from its name, state and form values.
+    Returns None if the tool doesn't exist anymore or the form is not valid.
+    """
+    form_tool = next((
+        tool for tool in tools
+        if isinstance(tool, FormTool) and tool.name_ == data["name"]
+    ), None)
+    if form_tool is None:
+        logger.warning(f"Form tool {data['name']} not found, discarding it")
+        return None
+
+    # The registered tools are shared, the chat gets its own copy
+    form_tool = form_tool.copy()
+    form_tool.form = data["form"]
+    form_tool.state = FormToolState(data["state"])
+    try:
+        form_tool.init_state()
+    except ValidationError:
+        logger.exception(f"Invalid form for {data['name']}, discarding it")
+        return None
+    return form_tool
+
+
 def get_stored_agent_state(
     redis_client: redis.Redis,
-    chat_id: str
+    chat_id: str,
+    tools: Sequence[BaseTool] = []
 ) -> StoredAgentState:
-    stored_agent_state = redis_client.hget(
-        chat_id,
-        RedisKeys.AGENT_STATE.value
-    )
-
-    if stored_agent_state is not None:
-        stored_agent_state: StoredAgentState = StoredAgentState.from_pickle(
-            stored_agent_state)
-        logger.info("Loaded agent state from redis")
-    else:
-        stored_agent_state = StoredAgentState()
+    """
+    Loads the active form tool, the messages in the memory window and the summary.
+    """
+    with redis_client.pipeline() as pipeline:
+        pipeline.hget(chat_id, RedisKeys.AGENT_STATE.value)
+        pipeline.lrange(get_history_key(chat_id), -HISTORY_LENGTH * 2, -1)
+        pipeline.hget(chat_id, RedisKeys.SUMMARY.value)
+        serialized_agent_state, history, summary = pipeline.execute()
+
+    stored_agent_state = StoredAgentState()
+    if serialized_agent_state is not None:
+        try:
+            stored_agent_state = StoredAgentState.from_json(
+                serialized_agent_state, tools)
+            logger.info("Loaded agent state from redis")
+        except ValueError:
+            # e.g. states pickled by previous versions
+            logger.warning("Discarding agent state stored in an unknown format")
+
+    messages = [message_from_json(message) for message in history]
+    stored_agent_state.memory.chat_memory.messages = [
+        message for message in messages if message]
+    stored_agent_state.stored_messages = len(
+        stored_agent_state.memory.chat_memory.messages)
+    stored_agent_state.summary = decode(summary)
     return stored_agent_state
 
 
 def store_agent_state(
     redis_client: redis.Redis,
     chat_id: str,
-    agent_state: AgentState
+    agent_state: StoredAgentState
 ):
-    stored_agent_state = StoredAgentState(
-        memory=agent_state.memory,
-        active_form_tool=agent_state.active_form_tool
-    )
+    """
+    Appends the new messages to the history, trimming it to the memory window,
+    and overwrites the active form tool.
+    """
+    new_messages = agent_state.get_new_messages()
+    history_key = get_history_key(chat_id)
+
+    with redis_client.pipeline() as pipeline:
+        if new_messages:
+            pipeline.rpush(
+                history_key,
+                *[message_to_json(message) for message in new_messages]
+            )
+            pipeline.ltrim(history_key, -HISTORY_LENGTH * 2, -1)
+        pipeline.hset(
+            chat_id,
+            RedisKeys.AGENT_STATE.value,
+            agent_state.to_json()
+        )
+        pipeline.execute()
 
-    redis_client.hset(
-        chat_id,
-        RedisKeys.AGENT_STATE.value,
-        stored_agent_state.to_pickle()
-    )
+    agent_state.stored_messages += len(new_messages)
+
+
+async def delete_stored_agent_state(
+    redis_client: redis.asyncio.Redis,
+    chat_id: str
+):
+    async with redis_client.pipeline() as pipeline:
+        pipeline.hdel(chat_id, RedisKeys.AGENT_STATE.value,
+                      RedisKeys.SUMMARY.value)
+        pipeline.delete(get_history_key(chat_id))
+        await pipeline.execute()
@@ -2,25 +2,35 @@ import logging
 import os
 import pprint
 import re
+import uuid
 from datetime import datetime
+from functools import lru_cache
 from textwrap import dedent
 
-from langchain.agents import create_openai_tools_agent
+from langchain.agents.output_parsers.openai_tools import \
+    OpenAIToolsAgentOutputParser
 from langchain.tools import BaseTool
 from langchain_core.language_models.chat_models import *
+from langchain_core.messages import AIMessage, BaseMessage
 from langchain_core.prompts.chat import (ChatPromptTemplate,
                                          HumanMessagePromptTemplate,
                                          MessagesPlaceholder,
                                          SystemMessagePromptTemplate)
 from langchain_core.prompts.prompt import PromptTemplate
+from langchain_core.runnables import (Runnable, RunnableConfig,
+                                      RunnableLambda)
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_openai import ChatOpenAI
 
 from wizard_ai.conversational_engine.form_agent.form_tool import AgentState
+from wizard_ai.conversational_engine.form_agent.prompt_budget import (
+    fit_prompt_to_budget, record_prompt_report)
 
 logger = logging.getLogger(__name__)
 pp = pprint.PrettyPrinter(indent=4)
 
 LLM_MODEL = os.environ.get("LLM_MODEL", "gpt-3.5-turbo-0125")
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", 64))
 
 BASE_SYSTEM_MESSAGE_PROMPT = dedent(f"""
     You are a personal assistant trying to help the user. You always answer in English. The current datetime is {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}.
@@ -89,6 +99,50 @@ def ask_for_confirmation_prompt_template(
     ).strip())
 
 
+@lru_cache(maxsize=LLM_CACHE_SIZE)
+def get_llm(
+    model: str = LLM_MODEL,
+    tool_choice: str = None
+) -> ChatOpenAI:
+    """
+    Returns a ChatOpenAI client for the model and the forced tool.
+    Clients are cached, so that their HTTP connection pool is reused across the agent calls.
+    """
+    params = {
+        "model": model,
+        "temperature": 0,
+        "verbose": True
+    }
+    if tool_choice:
+        params["tool_choice"] = {
+            "type": "function",
+            "function": {
+                "name": tool_choice
+            }
+        }
+
+    return ChatOpenAI(**params)
+
+
+# OpenAI tool schemas, by tool name, description and args_schema
+_openai_tools_cache: Dict[tuple, dict] = {}
+
+
+def get_openai_tool(tool: BaseTool) -> dict:
+    """
+    Converts a tool to the OpenAI tool schema.
+    The schema of a tool only changes with its form state, which sets its name,
+    description and args_schema (the optional models are memoized),
+    so the conversion, JSON schema included, is done once per tool and state.
+    """
+    key = (tool.name, tool.description, tool.args_schema)
+    openai_tool = _openai_tools_cache.get(key)
+    if openai_tool is None:
+        openai_tool = convert_to_openai_tool(tool)
+        _openai_tools_cache[key] = openai_tool
+    return openai_tool
+
+
 class ModelFactory:
 
     @staticmethod
@@ -107,20 +161,7 @@ class ModelFactory:
     def build_llm(
         tool_choice: str = None
     ):
-        params = {
-            "model": LLM_MODEL,
-            "temperature": 0,
-            "verbose": True
-        }
-        if tool_choice:
-            params["tool_choice"] = {
-                "type": "function",
-                "function": {
-                    "name": tool_choice
-                }
-            }
-
-        return ChatOpenAI(**params)
+        return get_llm(LLM_MODEL, tool_choice)
 
     def build_default_model(
         state: AgentState,
@@ -173,8 +214,84 @@ class ModelFactory:
         prompt: ChatPromptTemplate,
         tools: List[BaseTool] = []
     ):
-        return create_openai_tools_agent(
-            ModelFactory.build_llm(state.get("tool_choice")),
-            tools,
-            prompt=prompt
+        # Same agent as create_openai_tools_agent, with cached llm and tool schemas
+        openai_tools = [get_openai_tool(tool) for tool in tools]
+        llm_with_tools = ModelFactory.build_llm(state.get("tool_choice")).bind(
+            tools=openai_tools
+        )
+        return (
+            RunnableLambda(
+                lambda inputs, config: assemble_prompt_inputs(
+                    inputs, prompt, openai_tools, config))
+            | prompt
+            | RunnableLambda(
+                lambda messages, config: call_llm(llm_with_tools, messages, config))
+            | OpenAIToolsAgentOutputParser()
         )
+
+
+def assemble_prompt_inputs(
+    inputs: Dict[str, Any],
+    prompt: ChatPromptTemplate,
+    openai_tools: List[dict],
+    config: RunnableConfig = None
+) -> Dict[str, Any]:
+    """
+    Fits the chat history and the intermediate steps in the token budget of the model
+    (see fit_prompt_to_budget). If config["configurable"] sets a metrics dict,
+    the prompt tokens and the trimmed items are added to it.
+    """
+    inputs, report = fit_prompt_to_budget(
+        inputs, prompt, openai_tools, LLM_MODEL)
+    metrics = ((config or {}).get("configurable") or {}).get("metrics")
+    if metrics is not None:
+        record_prompt_report(metrics, report)
+    return inputs
+
+
+def call_llm(
+    llm: Runnable,
+    messages: Any,
+    config: RunnableConfig = None
+) -> BaseMessage:
+    """
+    Calls the LLM. If config["configurable"] sets on_text_delta, the answer is
+    streamed and on_text_delta(stream_id, delta) is called for each piece of its
+    text, with a stream_id identifying the LLM call.
+    """
+    on_text_delta = ((config or {}).get("configurable") or {}).get("on_text_delta")
+    if not on_text_delta:
+        return llm.invoke(messages, config)
+
+    stream_id = uuid.uuid4().hex
+    content = ""
+    tool_calls = {}
+    for chunk in llm.stream(messages, config):
+        if chunk.content:
+            content += chunk.content
+            on_text_delta(stream_id, chunk.content)
+        for tool_call_chunk in chunk.additional_kwargs.get("tool_calls") or []:
+            merge_tool_call_chunk(tool_calls, tool_call_chunk)
+
+    additional_kwargs = {}
+    if tool_calls:
+        additional_kwargs["tool_calls"] = [
+            tool_calls[index] for index in sorted(tool_calls)]
+    return AIMessage(content=content, additional_kwargs=additional_kwargs)
+
+
+def merge_tool_call_chunk(tool_calls: Dict[int, dict], chunk: dict):
+    """
+    The streamed tool calls are split in chunks with the same index: the first one
+    has the id and the name, the others the pieces of the arguments.
+    """
+    tool_call = tool_calls.setdefault(chunk.get("index", 0), {
+        "id": None,
+        "type": "function",
+        "function": {"name": "", "arguments": ""}
+    })
+    if chunk.get("id"):
+        tool_call["id"] = chunk["id"]
+    function = chunk.get("function") or {}
+    tool_call["function"]["name"] += function.get("name") or ""
+    tool_call["function"]["arguments"] += function.get("arguments") or ""
@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import tiktoken
+from langchain.agents.format_scratchpad.openai_tools import \
+    format_to_openai_tool_messages
+from langchain.agents.output_parsers.openai_tools import \
+    OpenAIToolAgentAction
+from langchain_core.agents import AgentAction
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.prompts.chat import ChatPromptTemplate
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of tokens of a prompt, tool schemas included, by model.
+# The rest of the context window is left to the answer.
+# Can be overridden with a JSON object, e.g. PROMPT_TOKEN_BUDGETS='{"gpt-3.5-turbo-0125": 8000}'
+PROMPT_TOKEN_BUDGETS = {
+    "gpt-3.5-turbo-0125": 14000,
+    "gpt-3.5-turbo": 14000,
+    "gpt-4": 6000,
+    "gpt-4-turbo": 100000,
+    "gpt-4-turbo-preview": 100000,
+    "gpt-4-0125-preview": 100000,
+    **json.loads(os.environ.get("PROMPT_TOKEN_BUDGETS", "{}"))
+}
+# Budget of the models missing in PROMPT_TOKEN_BUDGETS
+DEFAULT_PROMPT_TOKEN_BUDGET = int(
+    os.environ.get("DEFAULT_PROMPT_TOKEN_BUDGET", 6000))
+# Maximum number of intermediate steps in a prompt, whatever their size
+MAX_INTERMEDIATE_STEPS = int(os.environ.get("MAX_INTERMEDIATE_STEPS", 5))
+# Number of texts (messages, tool schemas) whose token count is cached, by model
+TOKEN_COUNT_CACHE_SIZE = int(os.environ.get("TOKEN_COUNT_CACHE_SIZE", 4096))
+
+# Tokens added by the chat format to every message (role and separators)
+MESSAGE_TOKEN_OVERHEAD = 4
+# A truncated tool output keeps at least this number of tokens
+MIN_OBSERVATION_TOKENS = 100
+TRUNCATION_MARKER = "\n... (truncated)"
+
+
+class TokenCounter:
+    """
+    Counts the tokens of texts and messages with the tiktoken encoding of a model.
+    The counts are cached, as the same messages (system prompts, history, tool outputs)
+    are counted again at every LLM call of a turn.
+
+    tiktoken downloads the encodings on first use: if that fails, the tokens are
+    estimated as 4 characters each.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        try:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                logger.warning(
+                    f"tiktoken doesn't know the model {model}, its tokens are counted with cl100k_base")
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(
+                f"Cannot load the tiktoken encoding of {model} ({e!r}): the tokens are "
+                f"estimated as 4 characters each, so the prompt budgets are approximate")
+            self.encoding = None
+        self.count_text = lru_cache(maxsize=TOKEN_COUNT_CACHE_SIZE)(
+            self.__count_text)
+
+    def __count_text(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def count_message(self, message: BaseMessage) -> int:
+        content = message.content
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        tokens = MESSAGE_TOKEN_OVERHEAD + self.count_text(content)
+        if message.additional_kwargs:
+            # The tool calls of the AI messages
+            tokens += self.count_text(json.dumps(
+                message.additional_kwargs, sort_keys=True))
+        return tokens
+
+    def count_messages(self, messages: Sequence[BaseMessage]) -> int:
+        return sum(self.count_message(message) for message in messages)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.count_text(text) <= max_tokens:
+            return text
+        if self.encoding is None:
+            return text[:max_tokens * 4] + TRUNCATION_MARKER
+        tokens = self.encoding.encode(text, disallowed_special=())
+        return self.encoding.decode(tokens[:max_tokens]) + TRUNCATION_MARKER
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model: str) -> TokenCounter:
+    return TokenCounter(model)
+
+
+def get_prompt_token_budget(model: str) -> int:
+    return PROMPT_TOKEN_BUDGETS.get(model, DEFAULT_PROMPT_TOKEN_BUDGET)
+
+
+def group_intermediate_steps(
+    intermediate_steps: Sequence[Tuple[AgentAction, Any]]
+) -> List[List[Tuple[AgentAction, Any]]]:
+    """
+    Groups the steps whose actions come from the same AI message (parallel tool calls).
+    A group is kept or dropped as a whole: a tool output without the AI message
+    calling it, or the other way round, is refused by the OpenAI API.
+    """
+    groups = []
+    for step in intermediate_steps:
+        action = step[0]
+        if (groups and isinstance(action, OpenAIToolAgentAction)
+                and isinstance(groups[-1][-1][0], OpenAIToolAgentAction)
+                and action.message_log == groups[-1][-1][0].message_log):
+            groups[-1].append(step)
+        else:
+            groups.append([step])
+    return groups
+
+
+def truncate_observations(
+    group: List[Tuple[AgentAction, Any]],
+    max_tokens: int,
+    counter: TokenCounter
+) -> Tuple[List[Tuple[AgentAction, Any]], int]:
+    """
+    Truncates the tool outputs of group so that each one takes at most
+    max_tokens / len(group) tokens. Returns the group and the number of truncated outputs.
+    """
+    max_observation_tokens = max(
+        max_tokens // len(group), MIN_OBSERVATION_TOKENS)
+    truncated_group = []
+    truncated = 0
+    for action, observation in group:
+        content = getattr(observation, "content", observation)
+        if isinstance(content, str) and counter.count_text(content) > max_observation_tokens:
+            content = counter.truncate(content, max_observation_tokens)
+            observation = observation.copy(update={"content": content}) \
+                if isinstance(observation, BaseMessage) else content
+            truncated += 1
+        truncated_group.append((action, observation))
+    return truncated_group, truncated
+
+
+def fit_prompt_to_budget(
+    inputs: Dict[str, Any],
+    prompt: ChatPromptTemplate,
+    openai_tools: Sequence[dict],
+    model: str,
+    budget: Optional[int] = None,
+    max_intermediate_steps: int = MAX_INTERMEDIATE_STEPS
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Selects the intermediate steps and the chat history to put in the prompt,
+    so that it fits in the token budget of the model. By priority:
+    - the system prompts (form instructions included), the input and the tool schemas,
+      which are always kept
+    - the intermediate steps, newest first. The newest ones are always kept,
+      with their tool outputs truncated if they don't fit
+    - the chat history, newest first
+
+    Returns the inputs of prompt, agent_scratchpad included, and a report of the
+    prompt tokens and of what was trimmed.
+    """
+    counter = get_token_counter(model)
+    budget = budget or get_prompt_token_budget(model)
+
+    fixed_messages = prompt.format_messages(
+        **{**inputs, "chat_history": [], "agent_scratchpad": []})
+    used_tokens = counter.count_messages(fixed_messages) + sum(
+        counter.count_text(json.dumps(tool, sort_keys=True))
+        for tool in openai_tools
+    )
+
+    report = {
+        "trimmed_intermediate_steps": 0,
+        "truncated_tool_outputs": 0,
+        "trimmed_history_messages": 0
+    }
+
+    groups = group_intermediate_steps(inputs.get("intermediate_steps") or [])
+    kept_steps = []
+    for idx in range(len(groups) - 1, -1, -1):
+        group = groups[idx]
+        tokens = counter.count_messages(format_to_openai_tool_messages(group))
+        if used_tokens + tokens > budget or len(kept_steps) + len(group) > max_intermediate_steps:
+            if kept_steps:
+                report["trimmed_intermediate_steps"] += sum(
+                    len(group) for group in groups[:idx + 1])
+                break
+            group, truncated = truncate_observations(
+                group, budget - used_tokens, counter)
+            report["truncated_tool_outputs"] += truncated
+            tokens = counter.count_messages(
+                format_to_openai_tool_messages(group))
+        kept_steps = group + kept_steps
+        used_tokens += tokens
+
+    chat_history = inputs.get("chat_history") or []
+    kept_history = []
+    for message in reversed(chat_history):
+        tokens = counter.count_message(message)
+        if used_tokens + tokens > budget:
+            break
+        kept_history.insert(0, message)
+        used_tokens += tokens
+    # An answer without its question would be misleading
+    if kept_history and len(kept_history) < len(chat_history) and isinstance(kept_history[0], AIMessage):
+        used_tokens -= counter.count_message(kept_history.pop(0))
+    report["trimmed_history_messages"] = len(chat_history) - len(kept_history)
+    report["prompt_tokens"] = used_tokens
+
+    if used_tokens > budget:
+        logger.warning(
+            f"The prompt takes {used_tokens} tokens, over the budget of {budget}")
+
+    return {
+        **inputs,
+        "chat_history": kept_history,
+        "intermediate_steps": kept_steps,
+        "agent_scratchpad": format_to_openai_tool_messages(kept_steps)
+    }, report
+
+
+def record_prompt_report(metrics: Dict[str, int], report: Dict[str, int]):
+    """Adds the report of a prompt to the metrics of the turn."""
+    metrics["llm_calls"] = metrics.get("llm_calls", 0) + 1
+    metrics["max_prompt_tokens"] = max(
+        metrics.get("max_prompt_tokens", 0), report["prompt_tokens"])
+    for key in ("trimmed_intermediate_steps", "truncated_tool_outputs", "trimmed_history_messages"):
+        metrics[key] = metrics.get(key, 0) + report[key]
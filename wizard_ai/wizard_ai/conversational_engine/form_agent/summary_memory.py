@@ -0,0 +1,158 @@
+import logging
+import os
+import uuid
+from textwrap import dedent
+from typing import List, Optional
+
+import redis
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from wizard_ai.constants import RedisKeys
+from wizard_ai.conversational_engine.form_agent.memory import (
+    decode, get_history_key, message_from_json)
+from wizard_ai.conversational_engine.form_agent.model_factory import (
+    LLM_MODEL, get_llm)
+
+logger = logging.getLogger(__name__)
+
+# "window": the last HISTORY_LENGTH turns are sent verbatim, the older ones are lost.
+# "summary": the last SUMMARY_RECENT_TURNS turns are sent verbatim, the older ones
+# are folded into a running summary after each answer
+MEMORY_MODE = os.getenv("MEMORY_MODE", "window")
+SUMMARY_RECENT_TURNS = int(os.getenv("SUMMARY_RECENT_TURNS", 3))
+# The older turns are folded when there are at least this many, to batch the LLM calls
+SUMMARY_BATCH_TURNS = int(os.getenv("SUMMARY_BATCH_TURNS", 2))
+SUMMARY_MAX_WORDS = int(os.getenv("SUMMARY_MAX_WORDS", 250))
+SUMMARY_LLM_MODEL = os.getenv("SUMMARY_LLM_MODEL", LLM_MODEL)
+# Maximum number of summaries updated at the same time
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", 2))
+# A crashed summarization releases the chat after this number of seconds.
+# Must be longer than a call to SUMMARY_LLM_MODEL, or the fold can be discarded
+SUMMARY_LOCK_TIMEOUT = int(os.getenv("SUMMARY_LOCK_TIMEOUT", 120))
+
+SUMMARY_PROMPT = dedent("""
+    Progressively summarize the conversation between a user and their personal assistant,
+    adding the new lines to the current summary. Keep the facts, names, dates, decisions
+    and open requests that could be needed later in the conversation.
+    Answer with the new summary only, in at most {max_words} words.
+
+    Current summary:
+    {summary}
+
+    New lines of conversation:
+    {new_lines}
+""").strip()
+
+ROLE_NAMES = {"human": "User", "ai": "Assistant", "system": "System"}
+
+# Stores the summary and removes the folded messages, only if they are still at
+# the head of the history: a concurrent store_agent_state could have trimmed it
+# during the LLM call, and messages never summarized must not be removed.
+# KEYS: chat hash, history list. ARGV: summary field, summary, folded messages
+FOLD_HISTORY_SCRIPT = """
+local folded = #ARGV - 2
+local head = redis.call('LRANGE', KEYS[2], 0, folded - 1)
+if #head ~= folded then
+    return 0
+end
+for idx = 1, folded do
+    if head[idx] ~= ARGV[idx + 2] then
+        return 0
+    end
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('LTRIM', KEYS[2], folded, -1)
+return 1
+"""
+
+# Deletes the lock only if it is still owned by the caller: a summarization
+# slower than SUMMARY_LOCK_TIMEOUT must not release the lock of another worker.
+# KEYS: lock. ARGV: token of the owner
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def get_summary_lock_key(chat_id: str) -> str:
+    return f"{chat_id}:{RedisKeys.SUMMARY_LOCK.value}"
+
+
+def update_summary(
+    summary: Optional[str],
+    messages: List[BaseMessage],
+    llm: Optional[BaseChatModel] = None
+) -> str:
+    """Returns summary extended with messages."""
+    llm = llm or get_llm(SUMMARY_LLM_MODEL)
+    new_lines = "\n".join(
+        f"{ROLE_NAMES.get(message.type, message.type)}: {message.content}"
+        for message in messages
+    )
+    prompt = SUMMARY_PROMPT.format(
+        max_words=SUMMARY_MAX_WORDS,
+        summary=summary or "(empty)",
+        new_lines=new_lines
+    )
+    return llm.invoke([HumanMessage(content=prompt)]).content.strip()
+
+
+def summarize_history(
+    redis_client: redis.Redis,
+    chat_id: str,
+    llm: Optional[BaseChatModel] = None
+) -> bool:
+    """
+    Folds the turns of the history older than the last SUMMARY_RECENT_TURNS into the
+    summary of the chat, and removes them from the history.
+    Blocking, it's meant to run after the answer is published.
+    Returns True if the summary was updated.
+    """
+    lock_key = get_summary_lock_key(chat_id)
+    lock_token = uuid.uuid4().hex
+    try:
+        # Two messages of the same chat must not fold the same turns twice
+        if not redis_client.set(lock_key, lock_token, nx=True, ex=SUMMARY_LOCK_TIMEOUT):
+            return False
+    except redis.RedisError:
+        logger.exception(f"Cannot lock the summary of chat {chat_id}")
+        return False
+
+    try:
+        history_key = get_history_key(chat_id)
+        with redis_client.pipeline() as pipeline:
+            pipeline.hget(chat_id, RedisKeys.SUMMARY.value)
+            pipeline.lrange(history_key, 0, -1)
+            summary, history = pipeline.execute()
+
+        # Whole turns, i.e. pairs of messages, are folded
+        folded = (len(history) - SUMMARY_RECENT_TURNS * 2) // 2 * 2
+        if folded < SUMMARY_BATCH_TURNS * 2:
+            return False
+
+        messages = [message_from_json(message) for message in history[:folded]]
+        summary = update_summary(
+            decode(summary), [message for message in messages if message], llm)
+
+        fold_history = redis_client.register_script(FOLD_HISTORY_SCRIPT)
+        if not fold_history(
+            keys=[chat_id, history_key],
+            args=[RedisKeys.SUMMARY.value, summary, *history[:folded]]
+        ):
+            logger.warning(
+                f"The history of chat {chat_id} changed while summarizing, the summary is discarded")
+            return False
+        logger.info(f"Folded {folded} messages into the summary of chat {chat_id}")
+        return True
+    except Exception:
+        logger.exception(f"Error updating the summary of chat {chat_id}")
+        return False
+    finally:
+        try:
+            release_lock = redis_client.register_script(RELEASE_LOCK_SCRIPT)
+            release_lock(keys=[lock_key], args=[lock_token])
+        except redis.RedisError:
+            logger.exception(f"Cannot unlock the summary of chat {chat_id}")
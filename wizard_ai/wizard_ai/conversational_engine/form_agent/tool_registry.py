@@ -0,0 +1,72 @@
+from typing import Dict, List, Optional, Sequence
+
+from langchain.tools import BaseTool
+
+from wizard_ai.conversational_engine.form_agent.form_tool import (
+    AgentState, FormReset, FormTool)
+from wizard_ai.conversational_engine.form_agent.form_tool_executor import \
+    FormToolExecutor
+
+# FormReset doesn't hold any state, so it is shared by all the chats
+FORM_RESET = FormReset()
+
+
+class ToolSet:
+    """The tools exposed to the agent in a form state, indexed by name, and their executor."""
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        executor: Optional[FormToolExecutor] = None
+    ):
+        self.tools = list(tools)
+        self.tools_by_name: Dict[str, BaseTool] = {
+            tool.name: tool for tool in self.tools}
+        self.executor = executor or FormToolExecutor(self.tools)
+
+
+class ToolRegistry:
+    """
+    Precomputes the tools of each form state, so that the graph steps don't
+    filter the tools and build a FormToolExecutor every time.
+
+    Without an active form tool, the ToolSet is computed once. An active form
+    tool is owned by the chat, and restored as a new copy at every turn, so it
+    is added to the precomputed tools at every call, and the executor shared by
+    the chats runs it with FormToolExecutor.run_tool.
+    """
+
+    def __init__(self, tools: Sequence[BaseTool]):
+        self.tools = list(tools)
+        self.base_tools = [
+            tool for tool in self.tools if not isinstance(tool, FormTool)]
+        self.inactive_tool_set = ToolSet(self.tools)
+        self.active_executor = FormToolExecutor([*self.base_tools, FORM_RESET])
+
+    def get_tool_set(self, state: AgentState) -> ToolSet:
+        if not state.get("active_form_tool"):
+            return self.inactive_tool_set
+        return ToolSet(
+            filter_active_tools(self.base_tools, state),
+            executor=self.active_executor
+        )
+
+
+def filter_active_tools(
+    tools: Sequence[BaseTool],
+    context: AgentState
+) -> List[BaseTool]:
+    """
+    Form tools are replaced by their activators if they are not active.
+    """
+    if context.get("active_form_tool"):
+        # If a form_tool is active, it is the only form tool available
+        base_tools = [
+            tool for tool in tools if not isinstance(
+                tool, FormTool)]
+        tools = [
+            *base_tools,
+            context.get("active_form_tool"),
+            FORM_RESET
+        ]
+    return tools
@@ -1,7 +1,11 @@
 
+import asyncio
 import json
 import logging
+import os
 import pprint
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from textwrap import dedent
 from typing import Any
 
@@ -13,10 +17,15 @@ from wizard_ai.clients.rabbitmq import RabbitMQProducer
 from wizard_ai.constants import MessageQueues, MessageType
 from wizard_ai.constants.message_queues import MessageQueues
 from wizard_ai.constants.message_type import MessageType
-from wizard_ai.conversational_engine.form_agent import (FormAgentExecutor,
+from wizard_ai.conversational_engine.form_agent import (MEMORY_MODE,
+                                                        SUMMARY_WORKERS,
+                                                        FormAgentExecutor,
                                                         FormTool,
                                                         get_stored_agent_state,
-                                                        store_agent_state)
+                                                        store_agent_state,
+                                                        summarize_history)
+from wizard_ai.conversational_engine.text_stream_handler import (
+    STREAM_ANSWERS, TextStreamHandler)
 from wizard_ai.conversational_engine.tool_callback_handler import \
     ToolCallbackHandler
 from wizard_ai.conversational_engine.tools import *
@@ -26,45 +35,110 @@ pp = pprint.PrettyPrinter(indent=4)
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of agent runs executed at the same time
+AGENT_WORKERS = int(os.environ.get("AGENT_WORKERS", 10))
+
 rabbitmq_producer = get_rabbitmq_producer()
 redis_client = get_redis_client()
 
-async def process_message(data: dict) -> None:
+# The agent is synchronous (LLM calls, Redis, tools), so it runs in a bounded
+# pool of worker threads to keep the event loop free for the RabbitMQ consumer
+# and the FastAPI endpoints
+agent_executor_pool = ThreadPoolExecutor(
+    max_workers=AGENT_WORKERS,
+    thread_name_prefix="agent"
+)
+
+# The summaries of the chats (MEMORY_MODE=summary) are updated in their own pool,
+# so that they don't delay the agent runs
+summary_executor_pool = ThreadPoolExecutor(
+    max_workers=SUMMARY_WORKERS,
+    thread_name_prefix="summary"
+)
 
+
+async def process_message(data: dict) -> None:
     data: ChatPayload = ChatPayload.model_validate(data)
 
-    chat_id = data.chat_id
+    # Connect the producer on the event loop, so that the agent can publish
+    # tool events from the worker threads
+    await rabbitmq_producer.connect()
+
+    loop = asyncio.get_running_loop()
+    answer = await loop.run_in_executor(agent_executor_pool, run_agent, data)
+    await publish_answer(rabbitmq_producer, data.chat_id, answer)
+
+    if MEMORY_MODE == "summary":
+        # Not awaited: the summary is only needed by the next messages
+        loop.run_in_executor(
+            summary_executor_pool, summarize_history, redis_client, data.chat_id)
+
+
+@lru_cache(maxsize=None)
+def get_form_agent_executor() -> FormAgentExecutor:
+    """
+    The tools and the compiled graph don't hold any chat data,
+    so they are built once and shared by all the chats.
+    """
     tools = [
         GoogleSearch(),
-        GoogleCalendarCreator(chat_id=chat_id),
-        GoogleCalendarRetriever(chat_id=chat_id),
-        GmailRetriever(chat_id=chat_id),
-        GmailSender(chat_id=chat_id),
+        GoogleCalendarCreator(),
+        GoogleCalendarRetriever(),
+        GmailRetriever(),
+        GmailSender(),
         OnlinePurchase(),
         PythonCodeInterpreter()
     ]
+    return FormAgentExecutor(tools=tools)
+
 
-    stored_agent_state = get_stored_agent_state(redis_client, data.chat_id)
+def run_agent(data: ChatPayload) -> str:
+    """
+    Runs the agent on a chat message and returns the answer.
+    Blocking: must be executed outside of the event loop.
+    """
+
+    chat_id = data.chat_id
+    graph = get_form_agent_executor()
+
+    stored_agent_state = get_stored_agent_state(
+        redis_client, data.chat_id, graph.tools)
 
     inputs = {
         "input": data.content,
-        "chat_history": [*stored_agent_state.memory.buffer],
+        "chat_history": stored_agent_state.get_chat_history(),
         "intermediate_steps": [],
         "active_form_tool": stored_agent_state.active_form_tool
     }
 
     tool_callback_handler = ToolCallbackHandler(
         chat_id=chat_id,
-        tools=tools,
         rabbitmq_producer=rabbitmq_producer,
         queue=MessageQueues.WIZARD_AI_OUT.value
     )
 
-    graph = FormAgentExecutor(
-        tools=tools,
-        on_tool_start=tool_callback_handler.on_tool_start,
-        on_tool_end=tool_callback_handler.on_tool_end
-    )
+    # Filled by the agent with the prompt sizes of the turn
+    metrics = {}
+
+    config = {
+        "recursion_limit": 25,
+        "configurable": {
+            "chat_id": chat_id,
+            "on_tool_start": tool_callback_handler.on_tool_start,
+            "on_tool_end": tool_callback_handler.on_tool_end,
+            "metrics": metrics
+        }
+    }
+
+    text_stream_handler = None
+    if STREAM_ANSWERS:
+        # The text of the answer is published while it is generated
+        text_stream_handler = TextStreamHandler(
+            chat_id=chat_id,
+            rabbitmq_producer=rabbitmq_producer,
+            queue=MessageQueues.WIZARD_AI_OUT.value
+        )
+        config["configurable"]["on_text_delta"] = text_stream_handler.on_text_delta
 
     logger.info(dedent(f"""
         ---
@@ -72,11 +146,15 @@ async def process_message(data: dict) -> None:
         ---
     """))
 
-    for output in graph.app.stream(inputs, config={"recursion_limit": 25}):
+    for output in graph.app.stream(inputs, config=config):
         for key, value in output.items():
             pass
 
+    if text_stream_handler:
+        text_stream_handler.flush()
+
     answer = graph.parse_output(output)
+    logger.info(f"Turn metrics for chat {chat_id}: {metrics}")
 
     # Prepare input and memory
     stored_agent_state.memory.save_context(
@@ -86,13 +164,14 @@ async def process_message(data: dict) -> None:
     stored_agent_state.active_form_tool = value["active_form_tool"]
 
     store_agent_state(redis_client, data.chat_id, stored_agent_state)
-    publish_answer(rabbitmq_producer, data.chat_id, answer)
+    return answer
+
 
-def publish_answer(
+async def publish_answer(
         rabbitmq_client: RabbitMQProducer,
         chat_id: str,
         answer: str):
-    rabbitmq_client.publish(
+    await rabbitmq_client.publish(
         queue=MessageQueues.WIZARD_AI_OUT.value,
         message=json.dumps({
             "type": MessageType.TEXT.value,
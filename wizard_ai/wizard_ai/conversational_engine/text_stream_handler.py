@@ -0,0 +1,102 @@
+import concurrent.futures
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+from wizard_ai.clients.rabbitmq import RabbitMQProducer
+from wizard_ai.clients.rabbitmq.constants import RABBITMQ_PUBLISH_TIMEOUT
+from wizard_ai.constants.message_queues import MessageQueues
+from wizard_ai.constants.message_type import MessageType
+
+# If set, the text of the answers is published while it is generated
+STREAM_ANSWERS = os.environ.get(
+    "STREAM_ANSWERS", "false").lower() in ("1", "true", "yes")
+# The tokens are published together at most every TEXT_STREAM_INTERVAL seconds
+TEXT_STREAM_INTERVAL = float(os.environ.get("TEXT_STREAM_INTERVAL", 0.3))
+
+
+class TextStreamHandler:
+    """
+    Publishes the text generated by the LLM for a chat as TEXT_DELTA messages, e.g.
+
+        {"chat_id": ..., "type": "TEXT_DELTA", "stream_id": ..., "sequence": 0, "content": "Hello"}
+
+    Each LLM call has its own stream_id, and the deltas of a stream are numbered,
+    so that the consumer can rebuild the text even if they are delivered out of order.
+    The tokens are coalesced, to publish at most one message every interval seconds.
+    The final answer is still published as a TEXT message.
+
+    The callbacks are called by the agent worker threads, so they use the thread-safe
+    publish. The deltas don't wait for the broker confirm, not to slow down the
+    consumption of the LLM stream: flush waits for all of them, so that the final
+    answer can't overtake them.
+    """
+
+    def __init__(
+        self,
+        chat_id: str,
+        rabbitmq_producer: RabbitMQProducer = None,
+        queue: MessageQueues = None,
+        interval: float = TEXT_STREAM_INTERVAL
+    ) -> None:
+        self.chat_id = chat_id
+        self.rabbitmq_client = rabbitmq_producer
+        self.queue = queue
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.stream_id: Optional[str] = None
+        self.sequence = 0
+        self.buffer = ""
+        self.last_publish_time = 0
+        self.pending_publishes: List[concurrent.futures.Future] = []
+
+    def on_text_delta(self, stream_id: str, delta: str) -> None:
+        """Run for each piece of text generated by the LLM."""
+        if not self.rabbitmq_client:
+            return
+
+        with self.lock:
+            if stream_id != self.stream_id:
+                self.__flush()
+                self.stream_id = stream_id
+                self.sequence = 0
+            self.buffer += delta
+            if time.monotonic() - self.last_publish_time >= self.interval:
+                self.__flush()
+
+    def flush(self) -> None:
+        """
+        Publishes the buffered text, to be called when the agent run ends.
+        Blocks until the broker confirms all the deltas of the run.
+        """
+        if not self.rabbitmq_client:
+            return
+
+        with self.lock:
+            self.__flush()
+            pending_publishes, self.pending_publishes = self.pending_publishes, []
+        # The errors are logged by the producer
+        concurrent.futures.wait(
+            pending_publishes, timeout=RABBITMQ_PUBLISH_TIMEOUT)
+
+    def __flush(self):
+        if not self.buffer:
+            return
+
+        future = self.rabbitmq_client.publish_threadsafe(
+            queue=self.queue,
+            message=json.dumps({
+                "chat_id": self.chat_id,
+                "type": MessageType.TEXT_DELTA.value,
+                "stream_id": self.stream_id,
+                "sequence": self.sequence,
+                "content": self.buffer
+            }),
+            wait=False
+        )
+        self.pending_publishes.append(future)
+        self.sequence += 1
+        self.buffer = ""
+        self.last_publish_time = time.monotonic()
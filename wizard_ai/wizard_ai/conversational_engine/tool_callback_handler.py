@@ -11,6 +11,10 @@ from wizard_ai.conversational_engine.form_agent import FormTool
 
 
 class ToolCallbackHandler:
+    """
+    Publishes the tool events of a chat to the given queue.
+    The callbacks are called by the agent worker threads, so they use the thread-safe publish.
+    """
 
     def __init__(
         self,
@@ -38,7 +42,7 @@ class ToolCallbackHandler:
         except BaseException:
             tool_start_message = f"{tool.name}: {tool_input}"
 
-        self.rabbitmq_client.publish(
+        self.rabbitmq_client.publish_threadsafe(
             queue=self.queue,
             message=json.dumps({
                 "chat_id": self.chat_id,
@@ -57,7 +61,7 @@ class ToolCallbackHandler:
         if not self.rabbitmq_client:
             return
 
-        self.rabbitmq_client.publish(
+        self.rabbitmq_client.publish_threadsafe(
             queue=self.queue,
             message=json.dumps({
                 "chat_id": self.chat_id,
@@ -1,15 +1,14 @@
-import pickle
 import textwrap
 from datetime import datetime
 from typing import Optional, Type
 
 from pydantic import BaseModel
 
-from wizard_ai.clients import (GetCalendarEventsPayload, GoogleClient,
-                               get_redis_client)
-from wizard_ai.constants import RedisKeys
+from wizard_ai.clients import GetCalendarEventsPayload, GoogleClient
 from wizard_ai.conversational_engine.form_agent.form_tool import (
     FormTool, FormToolState)
+from wizard_ai.conversational_engine.tools.google.credentials import \
+    get_google_credentials
 
 
 class GoogleCalendarRetriever(FormTool):
@@ -27,11 +26,8 @@ class GoogleCalendarRetriever(FormTool):
         start: datetime,
         end: datetime
     ) -> str:
-        credentials = get_redis_client().hget(
-            self.chat_id,
-            RedisKeys.GOOGLE_CREDENTIALS.value
-        )
-        google_client = GoogleClient(pickle.loads(credentials))
+        credentials = get_google_credentials(self.chat_id)
+        google_client = GoogleClient(credentials)
         payload = GetCalendarEventsPayload(
             start=start,
             end=end,
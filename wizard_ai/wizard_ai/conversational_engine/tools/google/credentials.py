@@ -0,0 +1,26 @@
+import pickle
+from typing import Optional
+
+from google.oauth2.credentials import Credentials
+from langchain_core.runnables.config import ensure_config
+
+from wizard_ai.clients import get_redis_client
+from wizard_ai.constants import RedisKeys
+
+
+def get_google_credentials(chat_id: Optional[str] = None) -> Credentials:
+    """
+    Loads the Google credentials of a chat from Redis.
+    The tools are shared by all the chats, so if chat_id is not set it is read
+    from the configurable of the graph run that is invoking the tool.
+    """
+    if not chat_id:
+        chat_id = ensure_config().get("configurable", {}).get("chat_id")
+
+    credentials = get_redis_client().hget(
+        chat_id,
+        RedisKeys.GOOGLE_CREDENTIALS.value
+    )
+    if not credentials:
+        raise ValueError("No Google credentials found. User must login first.")
+    return pickle.loads(credentials)
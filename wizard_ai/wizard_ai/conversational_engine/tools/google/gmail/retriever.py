@@ -1,12 +1,12 @@
-import pickle
 from typing import Optional, Type
 
 from langchain.tools import BaseTool
 from langchain_core.callbacks import CallbackManagerForToolRun
 from pydantic import BaseModel
 
-from wizard_ai.clients import GetEmailsPayload, GoogleClient, get_redis_client
-from wizard_ai.constants import RedisKeys
+from wizard_ai.clients import GetEmailsPayload, GoogleClient
+from wizard_ai.conversational_engine.tools.google.credentials import \
+    get_google_credentials
 
 
 class GmailRetriever(BaseTool):
@@ -25,13 +25,7 @@ class GmailRetriever(BaseTool):
     ) -> str:
         """Use the tool."""
 
-        credentials = get_redis_client().hget(
-            self.chat_id,
-            RedisKeys.GOOGLE_CREDENTIALS.value
-        )
-        if not credentials:
-            raise ValueError("No Google credentials found. User must login first.")
-        credentials = pickle.loads(credentials)
+        credentials = get_google_credentials(self.chat_id)
 
         google_client = GoogleClient(credentials)
         payload = GetEmailsPayload(
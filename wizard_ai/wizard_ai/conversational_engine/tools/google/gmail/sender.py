@@ -1,13 +1,12 @@
-import pickle
 import textwrap
 from typing import Dict, Optional, Type, Union
 
 from pydantic import BaseModel
 
-from wizard_ai.clients import GoogleClient, SendEmailPayload, get_redis_client
-from wizard_ai.constants import RedisKeys
-from wizard_ai.constants.redis_keys import RedisKeys
+from wizard_ai.clients import GoogleClient, SendEmailPayload
 from wizard_ai.conversational_engine.form_agent import FormTool, FormToolState
+from wizard_ai.conversational_engine.tools.google.credentials import \
+    get_google_credentials
 
 
 class GmailSender(FormTool):
@@ -26,13 +25,7 @@ class GmailSender(FormTool):
     ) -> str:
         """Use the tool."""
 
-        credentials = get_redis_client().hget(
-            self.chat_id,
-            RedisKeys.GOOGLE_CREDENTIALS.value
-        )
-        if not credentials:
-            raise ValueError("No Google credentials found. User must login first.")
-        credentials = pickle.loads(credentials)
+        credentials = get_google_credentials(self.chat_id)
 
         google_client = GoogleClient(credentials)
         payload = SendEmailPayload(
@@ -4,6 +4,8 @@ from langchain.tools.base import BaseTool
 from langchain_core.callbacks import CallbackManagerForToolRun
 from pydantic import BaseModel, Field
 
+from .python_sandbox import get_python_sandbox
+
 
 class PythonInput(BaseModel):
     code: str = Field(
@@ -29,16 +31,8 @@ class PythonCodeInterpreter(BaseTool):
         code: str,
         run_manager: Optional[CallbackManagerForToolRun] = None
     ) -> str:
-
-        local_vars = {}
-        exec(code, {}, local_vars)
-        result_value = local_vars.get('result')
-
-        if not result_value:
-            raise ValueError(
-                "The last operation of the code provided must store the output of the code in a variable called result.")
-
-        return str(result_value)
+        # The code runs in a separate process, with time and memory limits
+        return get_python_sandbox().run(code)
 
     def get_tool_start_message(self, input: dict) -> str:
         payload = PythonInput(**input)
@@ -0,0 +1,169 @@
+import logging
+import multiprocessing
+import os
+import queue
+import runpy
+import threading
+from functools import lru_cache
+from multiprocessing.connection import Connection
+
+from langchain_core.tools import ToolException
+
+from . import sandbox_worker
+
+logger = logging.getLogger(__name__)
+
+# Number of worker processes, i.e. of snippets executed at the same time
+PYTHON_SANDBOX_WORKERS = int(os.getenv("PYTHON_SANDBOX_WORKERS", 2))
+# Wall-clock limit of a snippet, in seconds. Also the maximum wait for a free worker
+PYTHON_SANDBOX_TIMEOUT = float(os.getenv("PYTHON_SANDBOX_TIMEOUT", 10))
+# CPU time limit of a snippet, in seconds
+PYTHON_SANDBOX_CPU_TIME = int(os.getenv("PYTHON_SANDBOX_CPU_TIME", 5))
+# Memory a snippet can allocate, in bytes
+PYTHON_SANDBOX_MEMORY_LIMIT = int(
+    os.getenv("PYTHON_SANDBOX_MEMORY_LIMIT", 256 * 1024 * 1024))
+# Longer results are truncated
+PYTHON_SANDBOX_MAX_RESULT_SIZE = int(
+    os.getenv("PYTHON_SANDBOX_MAX_RESULT_SIZE", 10_000))
+# Workers are replaced after this number of snippets, as a snippet can leave
+# garbage behind (imported modules, patched globals, ...)
+PYTHON_SANDBOX_MAX_TASKS = int(os.getenv("PYTHON_SANDBOX_MAX_TASKS", 50))
+# forkserver: the workers are forked from a clean process, not from the
+# multithreaded backend
+PYTHON_SANDBOX_START_METHOD = os.getenv(
+    "PYTHON_SANDBOX_START_METHOD", "forkserver")
+
+# Imported once by the fork server instead of by every worker
+SANDBOX_WORKER_PRELOAD = ["os", "resource", "runpy",
+                          "multiprocessing.connection"]
+
+
+class SandboxWorker:
+    def __init__(self, process: multiprocessing.Process, connection: Connection):
+        self.process = process
+        self.connection = connection
+        self.tasks = 0
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class PythonSandbox:
+    """
+    Pool of pre-forked worker processes executing Python snippets, meant to be
+    shared by the whole process.
+
+    Each snippet runs in a worker with a wall-clock timeout, a CPU time limit
+    (RLIMIT_CPU) and a memory limit (RLIMIT_AS), and its result is truncated
+    to max_result_size characters. A worker that exceeds a limit is killed and
+    replaced, so a runaway snippet only fails its own tool call.
+
+    The limits protect the backend resources, they are not a security boundary:
+    the snippets can still use the network and the file system.
+    """
+
+    def __init__(
+        self,
+        size: int = PYTHON_SANDBOX_WORKERS,
+        timeout: float = PYTHON_SANDBOX_TIMEOUT,
+        cpu_time: int = PYTHON_SANDBOX_CPU_TIME,
+        memory_limit: int = PYTHON_SANDBOX_MEMORY_LIMIT,
+        max_result_size: int = PYTHON_SANDBOX_MAX_RESULT_SIZE,
+        max_tasks: int = PYTHON_SANDBOX_MAX_TASKS,
+        start_method: str = PYTHON_SANDBOX_START_METHOD
+    ):
+        self.size = size
+        self.timeout = timeout
+        self.cpu_time = cpu_time
+        self.memory_limit = memory_limit
+        self.max_result_size = max_result_size
+        self.max_tasks = max_tasks
+        self.context = multiprocessing.get_context(start_method)
+        if start_method == "forkserver":
+            # Only the standard library: the default preload, __main__, would
+            # import the whole backend in the fork server
+            self.context.set_forkserver_preload(SANDBOX_WORKER_PRELOAD)
+        self.idle_workers = queue.Queue()
+        self.lock = threading.Lock()
+        self.started = False
+
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            for _ in range(self.size):
+                self.idle_workers.put(self.__start_worker())
+            self.started = True
+
+    def close(self):
+        with self.lock:
+            while not self.idle_workers.empty():
+                self.idle_workers.get().kill()
+            self.started = False
+
+    def run(self, code: str) -> str:
+        """
+        Executes code in a worker and returns the value of its `result` variable as str.
+        Raises ToolException if the code fails or exceeds a limit.
+        """
+        self.start()
+        try:
+            worker = self.idle_workers.get(timeout=self.timeout)
+        except queue.Empty:
+            raise ToolException(
+                "All the Python interpreters are busy, try again later.")
+
+        healthy = False
+        try:
+            worker.tasks += 1
+            worker.connection.send(code)
+            if not worker.connection.poll(self.timeout):
+                raise ToolException(
+                    f"The code was stopped because it took more than {self.timeout:g} seconds.")
+            status, output = worker.connection.recv()
+            healthy = True
+        except (EOFError, OSError):
+            # The worker was killed by the CPU time or memory limit
+            raise ToolException(
+                "The code was stopped because it used too much CPU time or memory.")
+        finally:
+            self.__release_worker(worker, healthy)
+
+        if status == "error":
+            raise ToolException(output)
+        return output
+
+    def __release_worker(self, worker: SandboxWorker, healthy: bool):
+        if healthy and worker.tasks < self.max_tasks:
+            self.idle_workers.put(worker)
+            return
+
+        worker.kill()
+        self.idle_workers.put(self.__start_worker())
+
+    def __start_worker(self) -> SandboxWorker:
+        parent_connection, child_connection = self.context.Pipe()
+        # The worker runs sandbox_worker by path: unpickling a function of the
+        # wizard_ai package would import the whole backend in every worker
+        process = self.context.Process(
+            target=runpy.run_path,
+            args=(sandbox_worker.__file__,),
+            kwargs={
+                "run_name": sandbox_worker.WORKER_RUN_NAME,
+                "init_globals": {"WORKER_ARGS": (
+                    child_connection, self.cpu_time,
+                    self.memory_limit, self.max_result_size)}
+            },
+            name="python-sandbox",
+            daemon=True
+        )
+        process.start()
+        child_connection.close()
+        return SandboxWorker(process, parent_connection)
+
+
+@lru_cache(maxsize=None)
+def get_python_sandbox() -> PythonSandbox:
+    return PythonSandbox()
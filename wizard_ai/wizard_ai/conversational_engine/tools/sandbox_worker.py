@@ -0,0 +1,83 @@
+"""
+Worker process of the PythonSandbox.
+
+The workers run this file by path (runpy.run_path), not by importing it, so that
+they don't import the wizard_ai package, whose modules start thread pools and
+clients at import time. It must only use the standard library.
+"""
+import os
+import resource
+from multiprocessing.connection import Connection
+from typing import Tuple
+
+# Name the file is run with by the PythonSandbox. The worker arguments are in WORKER_ARGS
+WORKER_RUN_NAME = "__sandbox_worker__"
+
+NO_RESULT_ERROR = "The last operation of the code provided must store the output of the code in a variable called result."
+
+
+def run_worker(
+    connection: Connection,
+    cpu_time: int,
+    memory_limit: int,
+    max_result_size: int
+):
+    """Main loop of a worker process: executes the snippets received on connection."""
+    # The snippets' output must not end up in the backend logs
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+    # The worker already uses some memory (the interpreter and the preloaded modules)
+    resource.setrlimit(
+        resource.RLIMIT_AS,
+        (get_memory_usage() + memory_limit, resource.RLIM_INFINITY)
+    )
+
+    while True:
+        try:
+            code = connection.recv()
+        except EOFError:
+            return
+
+        # RLIMIT_CPU counts the CPU time of the whole process, so the limit
+        # is moved forward for every snippet. When reached, the worker gets SIGXCPU and dies
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used_cpu_time = int(usage.ru_utime + usage.ru_stime) + 1
+        resource.setrlimit(
+            resource.RLIMIT_CPU,
+            (used_cpu_time + cpu_time, resource.RLIM_INFINITY)
+        )
+        connection.send(execute_code(code, max_result_size))
+
+
+def execute_code(code: str, max_result_size: int) -> Tuple[str, str]:
+    """Returns ("ok", result) or ("error", message)."""
+    local_vars = {}
+    try:
+        exec(code, {}, local_vars)
+        result_value = local_vars.get('result')
+        if not result_value:
+            return "error", NO_RESULT_ERROR
+        result = str(result_value)
+    except MemoryError:
+        return "error", "MemoryError: the code used too much memory."
+    except BaseException as e:
+        return "error", f"{type(e).__name__}: {e}"
+
+    if len(result) > max_result_size:
+        result = result[:max_result_size] + "... (truncated)"
+    return "ok", result
+
+
+def get_memory_usage() -> int:
+    """Virtual memory of the current process, in bytes."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[0]) * resource.getpagesize()
+    except OSError:
+        return 0
+
+
+if __name__ == WORKER_RUN_NAME:
+    run_worker(*globals()["WORKER_ARGS"])
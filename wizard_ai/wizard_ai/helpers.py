@@ -1,9 +1,19 @@
+import logging
+import os
 from collections import defaultdict
 
-from bs4 import BeautifulSoup
+import lxml.etree
+import lxml.html
 from langgraph.graph.state import StateGraph
 from readability import Document
 
+logger = logging.getLogger(__name__)
+
+# Longer HTML inputs are truncated before being parsed
+HTML_MAX_INPUT_SIZE = int(os.getenv("HTML_MAX_INPUT_SIZE", 500_000))
+# If the fast extraction finds less text than this, readability is used instead
+HTML_MIN_TEXT_LENGTH = int(os.getenv("HTML_MIN_TEXT_LENGTH", 200))
+
 
 class StateGraphDrawer:
     """
@@ -172,12 +182,84 @@ class StateGraphDrawer:
 
 
 class HtmlProcessor:
+    """
+    Extracts the readable text of web pages and emails.
+
+    The fast path parses the document once with lxml, drops the nodes that are
+    not content (scripts, styles, navigation, ...) and takes the text of the main
+    node (<article> or <main> when there is one, else <body>).
+    readability is much slower and is used only when the fast path finds too little text.
+    """
+
+    # Removed with their content
+    NON_CONTENT_TAGS = (
+        "script", "style", "noscript", "template", "svg", "iframe", "head",
+        "nav", "aside", "footer", lxml.etree.Comment
+    )
+    MAIN_CONTENT_XPATHS = ("//article", "//main", "//*[@role='main']")
+
+    @staticmethod
+    def clear_html(html: str) -> str:
+        html = html[:HTML_MAX_INPUT_SIZE]
+        if not html.strip():
+            return ""
+        text = HtmlProcessor.extract_main_text(html)
+        if len(text) < HTML_MIN_TEXT_LENGTH:
+            readability_text = HtmlProcessor.extract_readability_text(html)
+            if len(readability_text) > len(text):
+                return readability_text
+        return text
+
+    @staticmethod
+    def extract_main_text(html: str) -> str:
+        root = HtmlProcessor.__parse(html)
+        if root is None:
+            return ""
+
+        lxml.etree.strip_elements(
+            root, *HtmlProcessor.NON_CONTENT_TAGS, with_tail=False)
+
+        for xpath in HtmlProcessor.MAIN_CONTENT_XPATHS:
+            for node in root.xpath(xpath):
+                text = HtmlProcessor.__get_text(node)
+                if len(text) >= HTML_MIN_TEXT_LENGTH:
+                    return text
+        return HtmlProcessor.__get_text(root)
+
+    @staticmethod
+    def extract_readability_text(html: str) -> str:
+        try:
+            main_content = Document(html).summary()
+        except Exception:
+            logger.warning("Cannot extract the main content with readability")
+            return ""
+
+        root = HtmlProcessor.__parse(main_content)
+        if root is None:
+            return ""
+        lxml.etree.strip_elements(root, "script", "style", with_tail=False)
+        return HtmlProcessor.__get_text(root)
+
+    @staticmethod
+    def __parse(html: str):
+        try:
+            return lxml.html.document_fromstring(html)
+        except ValueError:
+            # lxml refuses str inputs with an encoding declaration
+            return HtmlProcessor.__parse_bytes(html.encode("utf-8"))
+        except lxml.etree.ParserError:
+            # Empty document
+            return None
+
+    @staticmethod
+    def __parse_bytes(html: bytes):
+        try:
+            return lxml.html.document_fromstring(html)
+        except lxml.etree.ParserError:
+            return None
 
     @staticmethod
-    def clear_html(html):
-        doc = Document(html)
-        main_content = doc.summary()
-        soup = BeautifulSoup(main_content, 'html.parser')
-        for script in soup(['script', 'style']):
-            script.decompose()
-        return soup.get_text(separator='\n', strip=True)
+    def __get_text(node) -> str:
+        # One line per text node, like BeautifulSoup's get_text(separator='\n', strip=True)
+        return "\n".join(
+            text.strip() for text in node.itertext() if text.strip())
@@ -3,7 +3,8 @@ import logging
 
 from fastapi import FastAPI
 
-from wizard_ai.clients.rabbitmq import RabbitMQConsumer
+from wizard_ai.clients import get_async_redis_client, get_web_crawler
+from wizard_ai.clients.rabbitmq import RabbitMQConsumer, get_rabbitmq_producer
 from wizard_ai.constants import MessageQueues
 from wizard_ai.controllers import (conversations_router, google_actions_router,
                                    google_login_router)
@@ -30,7 +31,30 @@ app.include_router(conversations_router)
 app.include_router(google_login_router)
 app.include_router(google_actions_router)
 
+
+@app.on_event("startup")
+async def connect_rabbitmq_producer():
+    await get_rabbitmq_producer().connect()
+
+
+@app.on_event("shutdown")
+async def close_rabbitmq_producer():
+    await get_rabbitmq_producer().close()
+
+
+@app.on_event("shutdown")
+async def close_redis_client():
+    await get_async_redis_client().aclose()
+
+
+@app.on_event("shutdown")
+async def close_web_crawler():
+    await asyncio.to_thread(get_web_crawler().close)
+
+
 asyncio.get_event_loop().create_task(RabbitMQConsumer(
     queue_name=MessageQueues.WIZARD_AI_IN.value,
-    on_message_callback=process_message
+    on_message_callback=process_message,
+    # Messages of the same chat are processed in order, different chats in parallel
+    concurrency_key=lambda body: body.get("chat_id")
 ).run_consumer())
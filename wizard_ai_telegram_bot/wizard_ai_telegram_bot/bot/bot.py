@@ -21,6 +21,9 @@ logging.basicConfig(
 class MaiAssistantTelegramBot:
 
     TOKEN = os.getenv("TELEGRAM_API_TOKEN")
+    # Number of updates processed at the same time. The handlers don't block
+    # the event loop, so the updates of different chats don't wait for each other
+    CONCURRENT_UPDATES = int(os.getenv("TELEGRAM_CONCURRENT_UPDATES", 64))
 
     def __init__(self) -> None:
         self.telegram_bot = Bot(token=self.TOKEN)
@@ -32,6 +35,8 @@ class MaiAssistantTelegramBot:
         self.application = Application.builder()\
             .bot(self.telegram_bot)\
             .post_init(self.post_init)\
+            .post_shutdown(self.post_shutdown)\
+            .concurrent_updates(self.CONCURRENT_UPDATES)\
             .build()
 
         # Add command handler to application
@@ -56,6 +61,12 @@ class MaiAssistantTelegramBot:
             ("login_to_google", "Login to Google.")
         ])
 
+    async def post_shutdown(
+        self,
+        application: Application
+    ) -> None:
+        await self.update_handler.close()
+
     def start(self) -> None:
         # Run the bot until the user presses Ctrl-C
         self.application.run_polling(close_loop=False)
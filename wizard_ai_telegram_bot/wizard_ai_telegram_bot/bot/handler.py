@@ -1,5 +1,8 @@
+import asyncio
 import json
 import logging
+import os
+import weakref
 
 from telegram import Bot, Update
 from telegram.constants import ChatAction
@@ -9,8 +12,11 @@ from wizard_ai_telegram_bot.clients import (
     MAIAssistantClient, get_rabbitmq_producer)
 from wizard_ai_telegram_bot.constants import MessageQueues, MessageType
 
-from openai import OpenAI
-import asyncio
+from .transcription import (TranscriptionQueue, TranscriptionQueueFull,
+                            get_transcriber)
+
+# Longer voice messages are not transcribed, in seconds
+VOICE_MAX_DURATION = int(os.getenv("VOICE_MAX_DURATION", 120))
 
 
 class Handler:
@@ -25,7 +31,15 @@ class Handler:
         self.bot = bot
         self.wizard_ai_client = MAIAssistantClient()
         self.rabbitmq_producer = get_rabbitmq_producer()
-        self.openai_client = OpenAI()
+        self.transcription_queue = TranscriptionQueue(get_transcriber())
+        # The updates run concurrently, so the messages of a chat are published
+        # one at a time to keep their order. A lock is dropped when no update uses it
+        self.chat_locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+    async def close(self) -> None:
+        """Closes the HTTP connection pools and stops the transcription workers."""
+        await self.wizard_ai_client.close()
+        await self.transcription_queue.close()
 
     async def reset_conversation_handler(
         self,
@@ -33,7 +47,7 @@ class Handler:
         _: ContextTypes.DEFAULT_TYPE
     ) -> None:
         """Clears the conversation history."""
-        self.wizard_ai_client.reset_conversation(
+        await self.wizard_ai_client.reset_conversation(
             chat_id=str(update.message.chat_id)
         )
         await update.message.reply_text("Conversation history cleared.")
@@ -44,7 +58,7 @@ class Handler:
         _: ContextTypes.DEFAULT_TYPE
     ) -> None:
         """Login to Google."""
-        login_url = self.wizard_ai_client.login_to_google(
+        login_url = await self.wizard_ai_client.login_to_google(
             chat_id=str(update.message.chat_id)
         )
         login_text = f"<a href='{login_url}'>Login to Google</a>"
@@ -58,20 +72,25 @@ class Handler:
         """Handles voice messages."""
         logging.info(f"Voice message received: {update}")
 
-        audio_file_id = update.message.voice.file_id
-        audio_telegram_file = await self.bot.get_file(audio_file_id)
-
-        # TODO: Use download_to_memory
-        await audio_telegram_file.download_to_drive("audio.ogg")
-
-        # Call OpenAI whisper API
-        text = self.openai_client.audio.transcriptions.create(
-            model="whisper-1",
-            file=open("audio.ogg", "rb"),
-            language="it"
-        ).text
-
-        asyncio.gather(
+        voice = update.message.voice
+        if voice.duration > VOICE_MAX_DURATION:
+            await update.message.reply_text(
+                f"Voice messages can last at most {VOICE_MAX_DURATION} seconds.")
+            return
+
+        # The audio is kept in memory, so that concurrent voice messages don't share a file
+        audio_telegram_file = await self.bot.get_file(voice.file_id)
+        audio = bytes(await audio_telegram_file.download_as_bytearray())
+
+        try:
+            text = await self.transcription_queue.transcribe(
+                audio, filename=f"{voice.file_unique_id}.ogg")
+        except TranscriptionQueueFull:
+            await update.message.reply_text(
+                "Too many voice messages right now, please try again later.")
+            return
+
+        await asyncio.gather(
             self._text_handler(text, str(update.message.chat_id)),
             update.message.reply_html(
                 text=f"<i>{text}</i>",
@@ -98,16 +117,23 @@ class Handler:
     ) -> None:
         """Utility function to handle text messages from different inputs."""
 
+        chat_lock = self.chat_locks.get(chat_id)
+        if chat_lock is None:
+            chat_lock = self.chat_locks[chat_id] = asyncio.Lock()
+
+        # The typing action is sent after publishing, so that a later message of
+        # the same chat can't be published first while this one waits for it
+        async with chat_lock:
+            await self.rabbitmq_producer.publish(
+                queue=MessageQueues.wizard_ai_IN.value,
+                message=json.dumps({
+                    "type": MessageType.TEXT.value,
+                    "chat_id": chat_id,
+                    "content": text
+                })
+            )
+
         await self.bot.send_chat_action(
             chat_id=chat_id,
             action=ChatAction.TYPING.value
         )
-
-        self.rabbitmq_producer.publish(
-            queue=MessageQueues.wizard_ai_IN.value,
-            message=json.dumps({
-                "type": MessageType.TEXT.value,
-                "chat_id": chat_id,
-                "content": text
-            })
-        )
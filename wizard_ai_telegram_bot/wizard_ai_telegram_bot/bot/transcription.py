@@ -0,0 +1,155 @@
+import asyncio
+import io
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from openai import AsyncOpenAI
+
+# Backend used to transcribe the voice messages: "openai" or "local"
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "openai")
+TRANSCRIPTION_LANGUAGE = os.getenv("TRANSCRIPTION_LANGUAGE", "it")
+# Number of voice messages transcribed at the same time
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", 4))
+# Voice messages waiting for a worker. When the queue is full, new ones are refused
+TRANSCRIPTION_QUEUE_SIZE = int(os.getenv("TRANSCRIPTION_QUEUE_SIZE", 32))
+# Model of the local backend, see faster-whisper
+LOCAL_WHISPER_MODEL = os.getenv("LOCAL_WHISPER_MODEL", "small")
+
+
+class TranscriptionQueueFull(Exception):
+    pass
+
+
+class Transcriber(ABC):
+    """Transcribes an audio file held in memory."""
+
+    @abstractmethod
+    async def transcribe(self, audio: bytes, filename: str) -> str:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class OpenAITranscriber(Transcriber):
+    """Transcribes with the hosted Whisper API."""
+
+    def __init__(self, language: str = TRANSCRIPTION_LANGUAGE) -> None:
+        self.language = language
+        self.openai_client = AsyncOpenAI()
+
+    async def transcribe(self, audio: bytes, filename: str) -> str:
+        transcription = await self.openai_client.audio.transcriptions.create(
+            model="whisper-1",
+            file=(filename, audio),
+            language=self.language
+        )
+        return transcription.text
+
+    async def close(self) -> None:
+        await self.openai_client.close()
+
+
+class LocalWhisperTranscriber(Transcriber):
+    """
+    Transcribes with a local Whisper model.
+    Requires faster-whisper, which is not installed by default.
+    """
+
+    def __init__(
+        self,
+        model: str = LOCAL_WHISPER_MODEL,
+        language: str = TRANSCRIPTION_LANGUAGE
+    ) -> None:
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise ImportError(
+                "faster-whisper is required by the local transcription backend")
+        self.language = language
+        self.model = WhisperModel(model)
+
+    async def transcribe(self, audio: bytes, filename: str) -> str:
+        # The model is CPU bound, keep it off the event loop
+        return await asyncio.to_thread(self.__transcribe, audio)
+
+    def __transcribe(self, audio: bytes) -> str:
+        segments, _ = self.model.transcribe(
+            io.BytesIO(audio), language=self.language)
+        return "".join(segment.text for segment in segments).strip()
+
+
+def get_transcriber(backend: str = TRANSCRIPTION_BACKEND) -> Transcriber:
+    transcribers = {
+        "openai": OpenAITranscriber,
+        "local": LocalWhisperTranscriber
+    }
+    if backend not in transcribers:
+        raise ValueError(f"Unknown transcription backend: {backend}")
+    return transcribers[backend]()
+
+
+class TranscriptionQueue:
+    """
+    Bounded queue of voice messages transcribed by a fixed number of async workers,
+    so that a burst of voice messages doesn't overload the transcription backend.
+    The workers are started on the first transcription, in the running event loop.
+    """
+
+    def __init__(
+        self,
+        transcriber: Transcriber,
+        workers: int = TRANSCRIPTION_WORKERS,
+        max_size: int = TRANSCRIPTION_QUEUE_SIZE
+    ) -> None:
+        self.transcriber = transcriber
+        self.workers = workers
+        self.max_size = max_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker_tasks: List[asyncio.Task] = []
+
+    async def transcribe(self, audio: bytes, filename: str) -> str:
+        """
+        Waits for the transcription of the audio.
+        Raises TranscriptionQueueFull if too many audios are waiting.
+        """
+        self.__start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((audio, filename, future))
+        except asyncio.QueueFull:
+            raise TranscriptionQueueFull()
+        return await future
+
+    async def close(self) -> None:
+        for task in self.worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self.worker_tasks, return_exceptions=True)
+        self.worker_tasks = []
+        self.queue = None
+        await self.transcriber.close()
+
+    def __start(self) -> None:
+        if self.queue is not None:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        self.worker_tasks = [
+            asyncio.create_task(self.__run_worker())
+            for _ in range(self.workers)
+        ]
+
+    async def __run_worker(self) -> None:
+        while True:
+            audio, filename, future = await self.queue.get()
+            try:
+                if not future.cancelled():
+                    future.set_result(
+                        await self.transcriber.transcribe(audio, filename))
+            except Exception as e:
+                logging.exception("Error transcribing a voice message")
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.queue.task_done()
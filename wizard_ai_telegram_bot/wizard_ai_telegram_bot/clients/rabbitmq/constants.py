@@ -9,3 +9,13 @@ RABBITMQ_USER = os.environ.get('RABBITMQ_USER')
 # automatically populates some env variables from the services)
 if isinstance(RABBITMQ_PORT, str) and ':' in RABBITMQ_PORT:
     RABBITMQ_PORT = int(RABBITMQ_PORT.split(':')[-1])
+
+# Publisher settings. Batching is disabled when the batch interval is 0.
+RABBITMQ_CHANNEL_POOL_SIZE = int(
+    os.environ.get('RABBITMQ_CHANNEL_POOL_SIZE', 4))
+RABBITMQ_PUBLISH_BATCH_SIZE = int(
+    os.environ.get('RABBITMQ_PUBLISH_BATCH_SIZE', 50))
+RABBITMQ_PUBLISH_BATCH_INTERVAL = float(
+    os.environ.get('RABBITMQ_PUBLISH_BATCH_INTERVAL', 0))
+RABBITMQ_PUBLISH_TIMEOUT = float(
+    os.environ.get('RABBITMQ_PUBLISH_TIMEOUT', 30))
@@ -1,34 +1,53 @@
 import os
 
-import requests
+import httpx
+
+# Timeout of the requests to the Wizard AI backend, in seconds
+wizard_ai_TIMEOUT = float(os.environ.get('wizard_ai_TIMEOUT', 10))
+wizard_ai_MAX_CONNECTIONS = int(os.environ.get('wizard_ai_MAX_CONNECTIONS', 20))
 
 
 class MAIAssistantClient:
+    """
+    Async client of the Wizard AI REST API, to be used from the bot's event loop.
+    The HTTP connections are pooled and reused across the requests.
+    """
 
     def __init__(self) -> None:
         self.HOST = os.environ.get('wizard_ai_URL', 'localhost:8000')
         self.REST_URL = f"http://{self.HOST}"
+        self.http_client = httpx.AsyncClient(
+            base_url=self.REST_URL,
+            timeout=wizard_ai_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=wizard_ai_MAX_CONNECTIONS,
+                max_keepalive_connections=wizard_ai_MAX_CONNECTIONS
+            )
+        )
 
-    def chat(
+    async def chat(
         self,
         chat_id: str,
         message: str
     ) -> str:
-        response = requests.post(
-            f"{self.REST_URL}/chat",
+        response = await self.http_client.post(
+            "/chat",
             json={"chat_id": chat_id, "question": message},
         )
         return response.json()
 
-    def reset_conversation(
+    async def reset_conversation(
         self,
         chat_id: str
     ) -> None:
-        requests.delete(f"{self.REST_URL}/conversations/{chat_id}")
+        await self.http_client.delete(f"/conversations/{chat_id}")
 
-    def login_to_google(
+    async def login_to_google(
         self,
         chat_id: str
     ) -> str:
-        response = requests.post(f"{self.REST_URL}/google/login/{chat_id}")
+        response = await self.http_client.post(f"/google/login/{chat_id}")
         return response.json()["content"]
+
+    async def close(self) -> None:
+        await self.http_client.aclose()
@@ -3,5 +3,6 @@ from enum import Enum
 
 class MessageType(Enum):
     TEXT = "TEXT"
+    TEXT_DELTA = "TEXT_DELTA"
     TOOL_START = "TOOL_START"
     TOOL_END = "TOOL_END"
@@ -1,12 +1,53 @@
+import asyncio
 import json
 import logging
+import os
+import time
+from typing import Dict, List, Optional
 
 from telegram import Bot
 from telegram.constants import ParseMode
+from telegram.error import TelegramError
 
 from wizard_ai_telegram_bot.clients import get_redis_client
 from wizard_ai_telegram_bot.constants import Emojis, MessageType
 
+# Minimum time between two edits of a streamed message, in seconds.
+# Telegram rate limits the edits of the messages of a chat
+TELEGRAM_EDIT_INTERVAL = float(os.getenv("TELEGRAM_EDIT_INTERVAL", 1))
+
+
+class TextStream:
+    """
+    An answer being streamed to a chat, shown as a message that is edited
+    while the text deltas arrive.
+    """
+
+    def __init__(self, stream_id: str, stale_message_ids: List[int] = None) -> None:
+        self.stream_id = stream_id
+        # Messages of the previous LLM calls of the same answer, e.g. the text
+        # generated before a tool call, deleted when the final answer arrives
+        self.stale_message_ids: List[int] = stale_message_ids or []
+        self.text = ""
+        self.message_id: Optional[int] = None
+        self.shown_text = ""
+        self.last_edit_time = 0
+        self.edit_task: Optional[asyncio.Task] = None
+        # Deltas received before the previous ones, by sequence
+        self.pending_deltas: Dict[int, str] = {}
+        self.next_sequence = 0
+
+    def add_delta(self, sequence: int, content: str) -> None:
+        self.pending_deltas[sequence] = content
+        while self.next_sequence in self.pending_deltas:
+            self.text += self.pending_deltas.pop(self.next_sequence)
+            self.next_sequence += 1
+
+    def cancel_edit(self) -> None:
+        if self.edit_task:
+            self.edit_task.cancel()
+            self.edit_task = None
+
 
 class WizardAIConsumer:
     """
@@ -19,6 +60,8 @@ class WizardAIConsumer:
     ) -> None:
         self.bot = bot
         self.redis_client = get_redis_client()
+        # Answers being streamed, by chat_id
+        self.text_streams: Dict[str, TextStream] = {}
 
     def _sanitize_text_for_telegram(
         self,
@@ -40,7 +83,8 @@ class WizardAIConsumer:
         message_processors = {
             MessageType.TOOL_START.value: self.__process_tool_start_message,
             MessageType.TOOL_END.value: self.__process_tool_end_message,
-            MessageType.TEXT.value: self.__process_text_message
+            MessageType.TEXT.value: self.__process_text_message,
+            MessageType.TEXT_DELTA.value: self.__process_text_delta_message
         }
 
         if message["type"] not in message_processors:
@@ -110,11 +154,114 @@ class WizardAIConsumer:
         self,
         message: str
     ) -> None:
-        """Processes a text message."""
+        """
+        Processes a text message.
+        If the answer was streamed, the message of the last LLM call is replaced by
+        the final text, and the messages of the previous ones are deleted.
+        """
 
         text = self._sanitize_text_for_telegram(message["content"])
+
+        text_stream = self.text_streams.pop(message["chat_id"], None)
+        if text_stream:
+            text_stream.cancel_edit()
+            for message_id in text_stream.stale_message_ids:
+                try:
+                    await self.bot.delete_message(
+                        chat_id=message["chat_id"],
+                        message_id=message_id
+                    )
+                except TelegramError as e:
+                    logging.warning(f"Cannot delete a streamed message: {e}")
+
+        if text_stream and text_stream.message_id:
+            try:
+                await self.bot.edit_message_text(
+                    chat_id=message["chat_id"],
+                    message_id=text_stream.message_id,
+                    text=text,
+                    parse_mode=ParseMode.HTML
+                )
+                return
+            except TelegramError as e:
+                if "not modified" in str(e):
+                    return
+                logging.warning(
+                    f"Cannot replace the streamed message, sending the answer: {e}")
+
         await self.bot.send_message(
             chat_id=message["chat_id"],
             text=text,
             parse_mode=ParseMode.HTML
         )
+
+    async def __process_text_delta_message(
+        self,
+        message: str
+    ) -> None:
+        """
+        Processes a piece of an answer being generated.
+        The first one is sent as a new message, which is then edited at most
+        every TELEGRAM_EDIT_INTERVAL seconds with the text received so far.
+        """
+
+        chat_id = message["chat_id"]
+        text_stream = self.text_streams.get(chat_id)
+        if not text_stream or text_stream.stream_id != message["stream_id"]:
+            stale_message_ids = []
+            if text_stream:
+                # The previous LLM call of the same answer is complete, e.g. it
+                # called a tool: its text is not part of the final answer
+                text_stream.cancel_edit()
+                stale_message_ids = text_stream.stale_message_ids
+                if text_stream.message_id is not None:
+                    stale_message_ids.append(text_stream.message_id)
+            text_stream = TextStream(message["stream_id"], stale_message_ids)
+            self.text_streams[chat_id] = text_stream
+
+        text_stream.add_delta(message["sequence"], message["content"])
+        if not text_stream.text.strip():
+            return
+
+        if text_stream.message_id is None:
+            # The text may contain partial HTML tags, so it is sent as plain text
+            # until the final answer arrives
+            sent_message = await self.bot.send_message(
+                chat_id=chat_id,
+                text=text_stream.text
+            )
+            text_stream.message_id = sent_message.message_id
+            text_stream.shown_text = text_stream.text
+            text_stream.last_edit_time = time.monotonic()
+        elif not text_stream.edit_task:
+            text_stream.edit_task = asyncio.create_task(
+                self.__edit_text_stream(chat_id, text_stream, throttle=True))
+
+    async def __edit_text_stream(
+        self,
+        chat_id: str,
+        text_stream: TextStream,
+        throttle: bool = False
+    ) -> None:
+        """Shows the text received so far, waiting for the edit interval if throttle."""
+
+        if throttle:
+            delay = text_stream.last_edit_time + TELEGRAM_EDIT_INTERVAL - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            text_stream.edit_task = None
+
+        if text_stream.message_id is None or text_stream.text == text_stream.shown_text:
+            return
+
+        text = text_stream.text
+        try:
+            await self.bot.edit_message_text(
+                chat_id=chat_id,
+                message_id=text_stream.message_id,
+                text=text
+            )
+            text_stream.shown_text = text
+        except TelegramError as e:
+            logging.warning(f"Cannot update the streamed message: {e}")
+        text_stream.last_edit_time = time.monotonic()